@@ -1,10 +1,17 @@
 # app_streamlit.py
 import datetime as dt
+import os
 import streamlit as st
 
 DEFAULT_LOGO_PATH = "data/logo_4ka_circle.png"
 TEMPLATE_PATH     = "data/TEMPLATE_saldo.XLSX"
 HELPER_PATH       = "data/pomocka k saldo (vlookup).XLSX"
+JOB_WORKERS       = 2    # súbežne generované úlohy (všetky session spolu)
+JOB_MAX_PENDING   = 8    # rozpracované + čakajúce úlohy; nad limit -> "server je vyťažený"
+# úložisko väzieb (jedno pre všetkých používateľov); po prvom nahratí je Vstup 2 nepovinný.
+# SALDO_REFS_DB="" = bez úložiska (Vstup 2 vždy povinný)
+REFS_DB_PATH      = os.environ.get("SALDO_REFS_DB",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vazby.sqlite3"))
 
 def load_file_bytes(path: str) -> bytes | None:
     try:
@@ -18,12 +25,33 @@ st.title("Saldo – generátor")
 
 # bezpečný import core
 try:
-    from saldo_core import generate_saldo_document
+    from saldo_core import STAGES, RefStore, warm_pdf_context
+    from saldo_jobs import STAGE_LABELS, JobRunner, QueueFull
 except Exception as e:
     st.error("Nepodarilo sa načítať modul `saldo_core.py`.")
     st.exception(e)
     st.stop()
 
+# --- fixné súbory raz na proces; generovanie na pozadí so zdieľanou cache (hash vstupov) ---
+# Cache má dve vrstvy: load_assets (st.cache_resource) pre template/pomôcku/logo a LRU v JobRunner
+# pre rozparsovaný ledger a hotové výstupy. JobRunner nahradil pôvodné cached_ledger/cached_outputs
+# (st.cache_resource/st.cache_data) – tie bežali v skripte, teda blokovali UI počas generovania.
+@st.cache_resource(show_spinner=False)
+def load_assets():
+    """Template, pomôcka a logo z disku + predhriaty PDF kontext (raz na proces)."""
+    logo = load_file_bytes(DEFAULT_LOGO_PATH)
+    warm_pdf_context(logo)
+    return load_file_bytes(TEMPLATE_PATH), load_file_bytes(HELPER_PATH), logo
+
+@st.cache_resource(show_spinner=False)
+def job_runner() -> JobRunner:
+    """Jeden obmedzený pool pre všetky session – server nezahltí ľubovoľný počet súbežných generovaní."""
+    store = None
+    if REFS_DB_PATH:
+        os.makedirs(os.path.dirname(REFS_DB_PATH) or ".", exist_ok=True)
+        store = RefStore(REFS_DB_PATH)
+    return JobRunner(workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ref_store=store)
+
 # --- init session defaults ---
 if "reset_counter" not in st.session_state:
     st.session_state.reset_counter = 0
@@ -31,6 +59,7 @@ if "reset_counter" not in st.session_state:
 def reset_ui():
     """Vyčistí UI (reset)"""
     st.session_state.reset_counter += 1
+    st.session_state.pop("job", None)
     st.rerun()
 
 rc = st.session_state.reset_counter  # použije sa v kľúčoch widgetov
@@ -40,16 +69,17 @@ colA, colB = st.columns(2)
 with colA:
     src1 = st.file_uploader(
         "Vstup 1 (pohyby)",
-        type=["xlsx"],
+        type=["xlsx", "csv", "parquet"],
         key=f"src1_{rc}",
-        help="Nahraj XLSX s položkami/pohybmi."
+        help="Nahraj XLSX (alebo CSV / Parquet export zo SAP) s položkami/pohybmi."
     )
 with colB:
     src2 = st.file_uploader(
         "Vstup 2 (väzby)",
-        type=["xlsx"],
+        type=["xlsx", "csv", "parquet"],
         key=f"src2_{rc}",
-        help="Nahraj XLSX, kde je 'Doplnková referencia' (stĺpec G)."
+        help="Nahraj XLSX / CSV / Parquet, kde je 'Doplnková referencia' (stĺpec G). "
+             "Väzby sa uložia – ďalšie generovanie ich použije aj bez nového nahratia."
     )
 
 st.divider()
@@ -88,7 +118,8 @@ if st.button("Generovať", use_container_width=True, key=f"gen_{rc}"):
         # validácia vstupov
         missing = []
         if not src1: missing.append("Vstup 1 (pohyby)")
-        if not src2: missing.append("Vstup 2 (väzby)")
+        store = job_runner().ref_store
+        if not src2 and not (store is not None and len(store)): missing.append("Vstup 2 (väzby)")
         if not (hdr_meno or "").strip(): missing.append("Meno zákazníka")
         if not (hdr_sap or "").strip():  missing.append("SAP ID")
         if not (hdr_ucet or "").strip(): missing.append("Zmluvný účet")
@@ -97,9 +128,8 @@ if st.button("Generovať", use_container_width=True, key=f"gen_{rc}"):
             st.error("Doplň povinné polia: " + ", ".join(missing))
             st.stop()
 
-        # načítaj fixné súbory
-        template_bytes = load_file_bytes(TEMPLATE_PATH)
-        helper_bytes   = load_file_bytes(HELPER_PATH)
+        # fixné súbory (z cache)
+        template_bytes, helper_bytes, logo_bytes = load_assets()
         if not template_bytes:
             st.error(f"Chýba template: `{TEMPLATE_PATH}`")
             st.stop()
@@ -107,58 +137,84 @@ if st.button("Generovať", use_container_width=True, key=f"gen_{rc}"):
             st.error(f"Chýba pomôcka: `{HELPER_PATH}`")
             st.stop()
 
-        logo_bytes = load_file_bytes(DEFAULT_LOGO_PATH)
         if not logo_bytes:
             st.warning(f"Logo sa nepodarilo načítať z '{DEFAULT_LOGO_PATH}'. PDF sa vytvorí bez loga.")
 
-        src1_bytes = src1.read()
-        src2_bytes = src2.read()
+        src1_bytes = src1.getvalue()
+        src2_bytes = src2.getvalue() if src2 else None
 
         safe_name = (hdr_meno or "").strip().replace(" ", "_") or "report"
         ts = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-        xls_filename = f"{safe_name}_saldo_{ts}.xlsx"
-        pdf_filename = f"{safe_name}_saldo_{ts}.pdf"
-
-        # --- XLS ---
-        xls_bytes = generate_saldo_document(
-            template_bytes, helper_bytes, src1_bytes, src2_bytes,
-            hdr_meno=(hdr_meno or "").strip(),
-            hdr_sap=(hdr_sap or "").strip(),
-            hdr_ucet=(hdr_ucet or "").strip(),
-            hdr_spol=hdr_spol,
-            theme=theme, logo_bytes=logo_bytes, output="xlsx"
-        )
 
-        # --- PDF ---
-        pdf_bytes = generate_saldo_document(
+        # --- XLS + PDF na pozadí (parsovanie len pri nových vstupoch, inak z cache) ---
+        job = job_runner().submit(
             template_bytes, helper_bytes, src1_bytes, src2_bytes,
             hdr_meno=(hdr_meno or "").strip(),
             hdr_sap=(hdr_sap or "").strip(),
             hdr_ucet=(hdr_ucet or "").strip(),
             hdr_spol=hdr_spol,
-            theme=theme, logo_bytes=logo_bytes, output="pdf"
+            theme=theme, logo_bytes=logo_bytes,
         )
+        # úloha ostáva v session – kliknutie na download (rerun) nič negeneruje znova
+        st.session_state.job = {
+            "job": job,
+            "xls_filename": f"{safe_name}_saldo_{ts}.xlsx",
+            "pdf_filename": f"{safe_name}_saldo_{ts}.pdf",
+        }
+
+    except QueueFull as e:
+        st.warning(str(e))
+    except Exception as e:
+        st.error("Pri generovaní nastala chyba.")
+        st.exception(e)
 
-        # --- Download ---
-        st.write("### Stiahnuť výstupy")
-        col_dl1, col_dl2 = st.columns(2)
-        with col_dl1:
+# --- Priebeh + download (fragment sa obnovuje, kým úloha beží; XLSX je k dispozícii pred PDF) ---
+def show_job():
+    entry = st.session_state.get("job")
+    if not entry:
+        return
+    job = entry["job"]
+    if job.error is not None:
+        st.error("Pri generovaní nastala chyba.")
+        st.exception(job.error)
+        if st.session_state.get("job_polling"):
+            # ako pri úspešnom konci – fragment prestane pollovať
+            st.session_state.job_polling = False
+            st.rerun()
+        return
+
+    label = "Hotovo" if job.finished else f"{STAGE_LABELS.get(job.stage, 'Vo fronte')}…"
+    st.progress(job.fraction, text=label)
+    if not job.finished:
+        st.caption(" → ".join(("✅ " if s in job.done else "⏳ " if s == job.stage else "") + STAGE_LABELS[s]
+                              for s in STAGES))
+
+    st.write("### Stiahnuť výstupy")
+    col_dl1, col_dl2 = st.columns(2)
+    with col_dl1:
+        if "xlsx" in job.results:
             st.download_button(
                 "⬇️ Stiahnuť XLS",
-                data=xls_bytes,
-                file_name=xls_filename,
+                data=job.results["xlsx"],
+                file_name=entry["xls_filename"],
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
-        with col_dl2:
+    with col_dl2:
+        if "pdf" in job.results:
             st.download_button(
                 "⬇️ Stiahnuť PDF",
-                data=pdf_bytes,
-                file_name=pdf_filename,
+                data=job.results["pdf"],
+                file_name=entry["pdf_filename"],
                 mime="application/pdf",
                 use_container_width=True
             )
 
-    except Exception as e:
-        st.error("Pri generovaní nastala chyba.")
-        st.exception(e)
+    if job.finished and st.session_state.get("job_polling"):
+        # posledné prekreslenie celej stránky – fragment prestane pollovať
+        st.session_state.job_polling = False
+        st.rerun()
+
+_entry = st.session_state.get("job")
+st.session_state.job_polling = bool(_entry) and not _entry["job"].finished
+st.fragment(show_job, run_every=0.5 if st.session_state.job_polling else None)()
@@ -5,8 +5,9 @@ Saldo PDF layout v2.9 (final)
 - Titul: "Náhľad na fakturačný účet – saldo" (bez bodky)
 - Hlavička zákazníka: SAP ID · Meno zákazníka · Zmluvný účet · Názov spoločnosti
   (labels jemný bold: DejaVuSans-Bold, 8.5 pt, #333333; hodnoty 9 pt)
+- Zdroj dát: hotový XLS alebo priamo ledger zo saldo_core (bez čítania buniek)
 - Tabuľka:
-  - žiadne prepočty, len zobrazovanie hodnôt z XLS
+  - žiadne prepočty, len zobrazovanie hodnôt z XLS / ledgera
   - dátumy dd-mm-yy, "číslo Faktúry" ako text (odstránené 'VBRK'), "Čiastka" s €
   - stĺpec "Zostatok" má prioritu šírky (+20 %)
   - zarovnanie: čísla vpravo, dátumy stred, ostatné vľavo
@@ -14,34 +15,108 @@ Saldo PDF layout v2.9 (final)
   - "Celkový zostatok: ..." = posledná neprázdna hodnota v stĺpci "Zostatok"
 """
 
+import datetime as _dt
+from functools import lru_cache
+from io import BytesIO
 from typing import Optional
-import pandas as pd
-from openpyxl import load_workbook
+import os
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import mm
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer, PageBreak
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
 
-def render_saldo_pdf(
-    excel_path: str,
-    logo_path: str,
-    output_pdf: str,
-    title_text: str = "Náhľad na fakturačný účet – saldo"
-) -> None:
-    """Vygeneruje PDF podľa layoutu v2.9 z už hotového XLS (bez prepočtov)."""
+# kde hľadať DejaVuSans: najprv CWD (pôvodné správanie), potom data/ v repozitári
+_FONT_DIRS = ("", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
 
-    def s(x) -> str:
-        return "" if x is None else str(x)
 
-    # Fonty (DejaVuSans má SK diakritiku)
-    pdfmetrics.registerFont(TTFont("DejaVuSans", "DejaVuSans.ttf"))
-    pdfmetrics.registerFont(TTFont("DejaVuSans-Bold", "DejaVuSans-Bold.ttf"))
-    FONT_REG = "DejaVuSans"
-    FONT_BOLD = "DejaVuSans-Bold"
+@lru_cache(maxsize=None)
+def _register_fonts() -> None:
+    """Zaregistruje DejaVuSans raz na proces (nie pri každom rendri)."""
+    registered = pdfmetrics.getRegisteredFontNames()
+    if "DejaVuSans" in registered and "DejaVuSans-Bold" in registered:
+        return
+    for d in _FONT_DIRS:
+        reg, bold = os.path.join(d, "DejaVuSans.ttf"), os.path.join(d, "DejaVuSans-Bold.ttf")
+        if os.path.exists(reg) and os.path.exists(bold):
+            break
+    else:
+        reg, bold = "DejaVuSans.ttf", "DejaVuSans-Bold.ttf"  # nech chyba povie, čo chýba
+    pdfmetrics.registerFont(TTFont("DejaVuSans", reg))
+    pdfmetrics.registerFont(TTFont("DejaVuSans-Bold", bold))
+
+
+def _logo_image(logo_path: str, size: float):
+    """Logo ako flowable; dekódovanie a zmenšenie je v cache PDF kontextu saldo_core (podľa hashu)."""
+    from saldo_core import pdf_context
+
+    with open(logo_path, "rb") as f:
+        data = pdf_context().logo(f.read())
+    return Image(BytesIO(data), width=size, height=size, kind="proportional", mask="auto")
+
+
+# poradie stĺpcov pri kreslení priamo z ledgera (rovnaké ako v TEMPLATE)
+LEDGER_HEADERS = [
+    "Číslo dokladu",
+    "Číslo Faktúry",
+    "Dátum vystavenia / Pripísania platby",
+    "Dátum účtovania",
+    "Splatnosť netto",
+    "Typ dokladu",
+    "Čiastka",
+    "Zostatok",
+]
+
+
+def _s(x) -> str:
+    return "" if x is None else str(x)
+
+
+# textové dátumy (napr. z XLS uloženého inou aplikáciou); typované dátumy sa formátujú priamo
+_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d-%m-%y", "%d-%m-%Y", "%d/%m/%Y")
+_DATE_KEYS = ("dátum", "datum", "splatnosť", "splatnost")
+
+
+def _is_date_col(name: str) -> bool:
+    low = name.lower()
+    return any(k in low for k in _DATE_KEYS)
+
+
+def _fmt_date(v) -> str:
+    """Dátum -> dd-mm-yy (None -> ""); text v známom formáte sa prevedie, iný ostane bezo zmeny."""
+    if isinstance(v, (_dt.datetime, _dt.date)):
+        return v.strftime("%d-%m-%y")
+    t = _s(v).strip()
+    if t.lower() in ("nan", "none", "nat", ""):
+        return ""
+    for fmt in _DATE_FORMATS:
+        try:
+            return _dt.datetime.strptime(t, fmt).strftime("%d-%m-%y")
+        except ValueError:
+            pass
+    return t
+
+
+def _fmt_eur(v) -> str:
+    """Suma s € (len formát, žiadne počítanie); nečíselný text vráti bezo zmeny."""
+    t = _s(v).strip()
+    if t.lower() in ("nan", "none", ""):
+        return ""
+    norm = t.replace(" ", "").replace("\xa0", "").replace(",", ".")
+    try:
+        val = float(norm)
+        return f"{val:,.2f}".replace(",", " ").replace(".", ",") + " €"
+    except Exception:
+        return t
+
+
+def _table_from_xls(excel_path: str):
+    """Hlavička, riadky (stringy) a údaje zákazníka z hotového XLS."""
+    from openpyxl import load_workbook
+    s = _s
 
     # Načítanie XLS s computed values (žiadne prepočty tu nerobíme)
     wb = load_workbook(excel_path, data_only=True)
@@ -66,14 +141,14 @@ def render_saldo_pdf(
     while header and header[-1] == "":
         header.pop()
 
-    # Dáta pod hlavičkou
+    # Dáta pod hlavičkou (dátumy z typovaných hodnôt buniek, nie parsovaním textu)
+    date_cols = {i for i, h in enumerate(header) if _is_date_col(h)}
     rows = []
     for r in range(header_idx + 1, len(vals)):
-        row_vals = [s(x) for x in vals[r][:len(header)]]
+        row_vals = [_fmt_date(x) if i in date_cols else s(x) for i, x in enumerate(vals[r][:len(header)])]
         if not any(v.strip() for v in row_vals):
             continue
         rows.append(row_vals)
-    df = pd.DataFrame(rows, columns=header)
 
     # Hlavička zákazníka z prehlavičky (riadky nad db hlavičkou)
     cust = {"SAP ID": "", "Meno zákazníka": "", "Zmluvný účet": "", "Názov spoločnosti": ""}
@@ -106,6 +181,49 @@ def render_saldo_pdf(
                     if val and not cust[std]:
                         cust[std] = val
 
+    return header, rows, cust
+
+
+def _table_from_ledger(ledger, customer: Optional[dict] = None):
+    """Hlavička, riadky (stringy) a údaje zákazníka priamo z ledgera – bez načítania XLS."""
+    rows = []
+    for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows():
+        rows.append([_s(doc), _s(inv), _fmt_date(dz), _fmt_date(du), _fmt_date(sn), _s(typ),
+                     "" if amt is None else f"{amt:.2f}", _fmt_eur(f"{bal:.2f}")])
+    cust = {"SAP ID": "", "Meno zákazníka": "", "Zmluvný účet": "", "Názov spoločnosti": ""}
+    cust.update({k: _s(v) for k, v in (customer or {}).items() if k in cust})
+    return list(LEDGER_HEADERS), rows, cust
+
+
+def render_saldo_pdf(
+    excel_path: Optional[str],
+    logo_path: str,
+    output_pdf: str,
+    title_text: str = "Náhľad na fakturačný účet – saldo",
+    ledger=None,
+    customer: Optional[dict] = None,
+    chunked: bool = False,
+) -> None:
+    """
+    Vygeneruje PDF podľa layoutu v2.9 z už hotového XLS (bez prepočtov).
+    Ak je zadaný `ledger` (saldo_core.Ledger), kreslí priamo z neho a `excel_path` sa nečíta;
+    údaje zákazníka vtedy idú z `customer` (kľúče ako v hlavičke: "SAP ID", "Meno zákazníka", ...).
+    chunked=True: tabuľka sa pošle ako postupnosť tabuliek po stranách s vopred zmeranými riadkami.
+    """
+    import pandas as pd   # len pri renderovaní – import modulu (a saldo_core) ho neplatí
+    s = _s
+
+    # Fonty (DejaVuSans má SK diakritiku)
+    _register_fonts()
+    FONT_REG = "DejaVuSans"
+    FONT_BOLD = "DejaVuSans-Bold"
+
+    if ledger is not None:
+        header, rows, cust = _table_from_ledger(ledger, customer)
+    else:
+        header, rows, cust = _table_from_xls(excel_path)
+    df = pd.DataFrame(rows, columns=header)
+
     # Čistenie údajov (bez prepočtov)
     # "číslo Faktúry" ako text, vyčisti "VBRK"
     for candidate in ["číslo Faktúry", "číslo faktúry", "cislo faktury"]:
@@ -116,34 +234,13 @@ def render_saldo_pdf(
             df[cf] = df[cf].replace({"nan": "", "None": "", "NaN": ""})
             break
 
-    # dátumy -> dd-mm-yy
-    for c in df.columns:
-        low = c.lower()
-        if any(k in low for k in ["dátum", "datum", "splatnosť", "splatnost"]):
-            parsed = pd.to_datetime(df[c], dayfirst=True, errors="coerce")
-            out = []
-            for orig, p in zip(df[c], parsed):
-                if pd.isna(p):
-                    out.append("" if str(orig).lower() in ("nan", "none", "nat", "") else str(orig))
-                else:
-                    out.append(p.strftime("%d-%m-%y"))
-            df[c] = out
+    # dátumy sú už dd-mm-yy (_fmt_date v _table_from_xls / _table_from_ledger)
 
     # "Čiastka" s € (len formát, žiadne počítanie)
     if "Čiastka" in df.columns:
-        def fmt_eur(v):
-            t = s(v).strip()
-            if t.lower() in ("nan", "none", ""):
-                return ""
-            norm = t.replace(" ", "").replace("\xa0", "").replace(",", ".")
-            try:
-                val = float(norm)
-                return f"{val:,.2f}".replace(",", " ").replace(".", ",") + " €"
-            except Exception:
-                return t
-        df["Čiastka"] = [fmt_eur(x) for x in df["Čiastka"]]
-
-    # "Zostatok": len zobraz, nič neprepočítavaj
+        df["Čiastka"] = [_fmt_eur(x) for x in df["Čiastka"]]
+
+    # "Zostatok": len zobraz, nič neprepočítavaj (z ledgera už prichádza naformátovaný s €)
     if "Zostatok" in df.columns:
         df["Zostatok"] = df["Zostatok"].apply(
             lambda v: "" if s(v).strip().lower() in ("nan", "none", "nat", "") else s(v)
@@ -166,7 +263,7 @@ def render_saldo_pdf(
 
     # určenie typov pre zarovnanie
     num_cols = set([c for c in df.columns if c in ["Čiastka", "Zostatok"]])
-    date_cols = set([c for c in df.columns if any(k in c.lower() for k in ["dátum", "datum", "splatnosť", "splatnost"])])
+    date_cols = set([c for c in df.columns if _is_date_col(c)])
 
     # tabuľkové dáta
     table_data = []
@@ -216,7 +313,7 @@ def render_saldo_pdf(
 
     # logo + titul
     logo_size_mm = 16.0
-    logo = Image(logo_path, width=logo_size_mm * mm, height=logo_size_mm * mm, kind="proportional", mask="auto")
+    logo = _logo_image(logo_path, logo_size_mm * mm)
     title_para = Paragraph(title_text, title_style)
     header_tbl = Table([[logo, title_para]], colWidths=[logo_size_mm * mm + 4 * mm, CONTENT_W - (logo_size_mm * mm + 4 * mm)])
     header_tbl.setStyle(
@@ -248,24 +345,46 @@ def render_saldo_pdf(
         story.append(Spacer(1, 8))
 
     # tabuľka
-    table = Table(table_data, colWidths=col_widths, repeatRows=1)
     header_bg = colors.HexColor("#BFEAF0")
     grid_color = colors.HexColor("#CFCFCF")
-    table.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), header_bg),
-                ("GRID", (0, 0), (-1, -1), 0.35, grid_color),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("ALIGN", (0, 0), (-1, 0), "CENTER"),
-                ("LEFTPADDING", (0, 0), (-1, -1), 3.5),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 3.5),
-                ("TOPPADDING", (0, 0), (-1, -1), 2.5),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 2.5),
-            ]
-        )
+    table_style = TableStyle(
+        [
+            ("BACKGROUND", (0, 0), (-1, 0), header_bg),
+            ("GRID", (0, 0), (-1, -1), 0.35, grid_color),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 3.5),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 3.5),
+            ("TOPPADDING", (0, 0), (-1, -1), 2.5),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2.5),
+        ]
     )
-    story.append(table)
+    if not chunked:
+        table = Table(table_data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        story.append(table)
+    else:
+        # výšky riadkov vopred -> tabuľky po stranách (žiadne splitovanie jednej veľkej Table)
+        from saldo_core import paginate_rows
+
+        frame_w = CONTENT_W - 12  # rámec SimpleDocTemplate má padding 6 pt
+        frame_h = PAGE_H - TOP - BOTTOM - 12
+        used = sum(f.wrap(frame_w, frame_h)[1] for f in story)
+
+        def row_height(row):
+            return max(p.wrap(w - 7, frame_h)[1] for p, w in zip(row, col_widths)) + 5
+
+        head_h = row_height(table_data[0])
+        heights = [row_height(r) for r in table_data[1:]]
+        for k, (a, b) in enumerate(paginate_rows(heights, head_h, frame_h - used, frame_h)):
+            if k:
+                story.append(PageBreak())
+            if a == b:
+                continue
+            chunk = Table([table_data[0]] + table_data[1 + a:1 + b], colWidths=col_widths,
+                          rowHeights=[head_h] + heights[a:b])
+            chunk.setStyle(table_style)
+            story.append(chunk)
 
     # pätička: posledná neprázdna hodnota v "Zostatok"
     last_nonempty = ""
@@ -0,0 +1,258 @@
+# saldo_batch.py
+"""
+Dávkové generovanie salda: jeden export pohybov (src1) + jeden export väzieb (src2)
+-> pár XLSX/PDF pre každý zmluvný účet do výstupného adresára.
+
+    python saldo_batch.py --src1 pohyby.xlsx --src2 vazby.xlsx --out vystup/
+    python saldo_batch.py --src1 pohyby.xlsx --src2 vazby.xlsx --out vystup/ --workbook kluc_zakaznik.xlsx
+    python saldo_batch.py --src1 pohyby.xlsx --refs-db vazby.sqlite --out vystup/   # väzby z úložiska
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from saldo_core import (ACCOUNT_COL, BALANCE_MODES, OUTPUTS, PDF_ENGINES, THEMES, XLSX_ENGINES, CsvFormat,
+                        RefStore, atomic_output, compile_template, plan_saldo_batch, render_account,
+                        warm_pdf_context, write_saldo_workbook)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(_HERE, "data", "template_saldo.xlsx")
+HELPER_PATH   = os.path.join(_HERE, "data", "pomocka_saldo.xlsx")
+LOGO_PATH     = os.path.join(_HERE, "data", "logo.png")
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+def output_name(account: str, ext: str) -> str:
+    """
+    Deterministický názov súboru pre účet (nebezpečné znaky -> '_'). Ak sa účet tým zmenil, pribudne krátky
+    hash pôvodnej hodnoty – "123/45" a "123 45" tak nezapíšu do rovnakého súboru.
+    """
+    safe = _UNSAFE.sub("_", account)
+    if safe != account or not safe:
+        safe = f"{safe or 'bez_uctu'}_{hashlib.sha256(account.encode('utf-8')).hexdigest()[:8]}"
+    return f"saldo_{safe}.{ext}"
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _write(path: str, data: bytes) -> None:
+    """Zápis cez jedinečný dočasný súbor (atomic_output), aby v adresári nezostal polovičný výstup."""
+    with atomic_output(path) as f:
+        f.write(data)
+
+# ---------- plánovač (procesy) ----------
+class BatchResult(NamedTuple):
+    """Výsledok jedného účtu: zapísané súbory alebo chyba (ostatné účty bežia ďalej)."""
+    account: str
+    files: Tuple[str, ...]
+    error: Optional[str] = None
+
+_worker = {}   # stav worker procesu – nastaví ho _worker_init raz pri štarte
+
+def _worker_init(tpl, template_bytes: bytes, logo_bytes: Optional[bytes], out_dir: str, render_kw: dict) -> None:
+    """Worker dostane skompilovaný TEMPLATE, logo a voľby raz; PDF kontext si predhreje."""
+    _worker.update(tpl=tpl, template_bytes=template_bytes, logo_bytes=logo_bytes, out_dir=out_dir, render_kw=render_kw)
+    if "pdf" in render_kw["outputs"]:
+        warm_pdf_context(logo_bytes)
+
+def _render_job(job) -> Tuple[str, ...]:
+    """Vyrobí a zapíše výstupy jedného účtu; vráti názvy súborov (bajty sa nevracajú do rodiča)."""
+    w = _worker
+    files = render_account(w["tpl"], w["template_bytes"], job, logo_bytes=w["logo_bytes"], **w["render_kw"])
+    names = []
+    for ext, data in files.items():
+        name = output_name(job.account, ext)
+        _write(os.path.join(w["out_dir"], name), data)
+        names.append(name)
+    return tuple(names)
+
+def _error(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+def run_batch(
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    out_dir: str,
+    jobs: int = 1,
+    max_inflight: Optional[int] = None,
+    logo_bytes: Optional[bytes] = None,
+    plan_kw: Optional[dict] = None,
+    **render_kw,
+) -> Iterator[BatchResult]:
+    """
+    Vygeneruje výstupy všetkých účtov do out_dir, vracia BatchResult v poradí dokončenia:
+      - jobs <= 1 beží v tomto procese, inak ProcessPoolExecutor s `jobs` workermi,
+      - naraz je rozpracovaných najviac max_inflight účtov (predvolene 2 × jobs),
+      - chyba účtu sa zapíše do BatchResult.error, ostatné účty pokračujú;
+        pri páde worker procesu sa pool vytvorí nanovo a rozpracované účty sa zopakujú (_drain),
+      - názvy súborov závisia len od účtu (output_name).
+    plan_kw ide do plan_saldo_batch, render_kw do render_account.
+    Pri jobs > 1 je predvolené pdf_workers=1 (inak by každý worker spúšťal ďalších cpu_count procesov).
+    """
+    render_kw.setdefault("outputs", OUTPUTS)
+    if jobs > 1 and render_kw.get("pdf_workers") is None:
+        render_kw["pdf_workers"] = 1
+    os.makedirs(out_dir, exist_ok=True)
+    tpl = compile_template(template_bytes)
+    plan = plan_saldo_batch(helper_bytes, src1_bytes, src2_bytes, **(plan_kw or {}))
+    initargs = (tpl, template_bytes, logo_bytes, out_dir, render_kw)
+
+    if jobs <= 1:
+        _worker_init(*initargs)
+        for job in plan:
+            try:
+                yield BatchResult(job.account, _render_job(job))
+            except Exception as e:
+                yield BatchResult(job.account, (), _error(e))
+        return
+
+    limit = max(max_inflight or 2 * jobs, 1)
+    pool = ProcessPoolExecutor(jobs, initializer=_worker_init, initargs=initargs)
+    pending = {}
+    try:
+        for job in plan:
+            while len(pending) >= limit:
+                pool, results = _drain(pool, pending, jobs, initargs)
+                yield from results
+            pending[pool.submit(_render_job, job)] = job
+        while pending:
+            pool, results = _drain(pool, pending, jobs, initargs)
+            yield from results
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def _collect(done, pending: dict, results: list, suspects: list) -> None:
+    """Hotové futures -> results; účty z rozbitého poolu (BrokenProcessPool) -> suspects."""
+    for fut in done:
+        job = pending.pop(fut)
+        try:
+            results.append(BatchResult(job.account, fut.result()))
+        except BrokenProcessPool as e:
+            suspects.append((job, e))
+        except Exception as e:
+            results.append(BatchResult(job.account, (), _error(e)))
+
+def _drain(pool, pending: dict, jobs: int, initargs):
+    """
+    Počká na aspoň jeden dokončený účet. Pád workera rozbije všetky rozpracované úlohy poolu a nevedno,
+    ktorý účet ho spôsobil: pool sa nahradí novým a podozrivé účty sa zopakujú po jednom – chybu
+    dostane len ten, ktorý pool zhodí aj sám (jediný podozrivý sa neopakuje).
+    """
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    results, suspects = [], []
+    _collect(done, pending, results, suspects)
+    if not suspects:
+        return pool, results
+    _collect(wait(pending)[0], pending, results, suspects)   # zvyšok rozbitého poolu sa dokončí hneď
+    pool.shutdown(cancel_futures=True)
+    pool = ProcessPoolExecutor(jobs, initializer=_worker_init, initargs=initargs)
+    if len(suspects) == 1:
+        job, e = suspects[0]
+        return pool, results + [BatchResult(job.account, (), _error(e))]
+    for job, _ in suspects:
+        try:
+            results.append(BatchResult(job.account, pool.submit(_render_job, job).result()))
+        except BrokenProcessPool as e:
+            results.append(BatchResult(job.account, (), _error(e)))
+            pool.shutdown(cancel_futures=True)
+            pool = ProcessPoolExecutor(jobs, initializer=_worker_init, initargs=initargs)
+        except Exception as e:
+            results.append(BatchResult(job.account, (), _error(e)))
+    return pool, results
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Saldo – dávkové generovanie podľa zmluvného účtu.")
+    p.add_argument("--src1", required=True, help="XLSX / CSV / Parquet s pohybmi (všetky účty).")
+    p.add_argument("--src2", default=None,
+                   help="XLSX / CSV / Parquet s väzbami (Doplnková referencia); s --refs-db nepovinné.")
+    p.add_argument("--refs-db", default=None,
+                   help="SQLite úložisko väzieb: --src2 sa doň pridá a väzby sa hľadajú v ňom.")
+    p.add_argument("--out", required=True, help="Výstupný adresár.")
+    p.add_argument("--template", default=TEMPLATE_PATH)
+    p.add_argument("--helper", default=HELPER_PATH)
+    p.add_argument("--logo", default=LOGO_PATH, help="PNG logo; prázdny reťazec = bez loga.")
+    p.add_argument("--spol", default="SWAN a.s.", help="Spoločnosť v hlavičke.")
+    p.add_argument("--theme", default="blue", choices=sorted(THEMES))
+    p.add_argument("--outputs", default=",".join(OUTPUTS), help="Čiarkou oddelené: xlsx,pdf.")
+    p.add_argument("--xlsx-engine", default="stream", choices=XLSX_ENGINES)
+    p.add_argument("--pdf-engine", default="canvas", choices=PDF_ENGINES)
+    p.add_argument("--pdf-workers", type=int, default=None,
+                   help="Procesy pre jedno PDF pri --pdf-engine parallel (predvolene 1 pri --jobs > 1, inak počet jadier).")
+    p.add_argument("--balance-mode", default="formula", choices=BALANCE_MODES)
+    p.add_argument("--account-col", default=ACCOUNT_COL, help="Stĺpec zo src1, podľa ktorého sa delí.")
+    p.add_argument("--name-col", default=None, help="Stĺpec zo src1 s menom zákazníka (voliteľné).")
+    p.add_argument("--sap-col", default=None, help="Stĺpec zo src1 so SAP ID (voliteľné).")
+    p.add_argument("--meno", default="", help="Meno v hlavičke, ak nie je --name-col.")
+    p.add_argument("--sap", default="", help="SAP ID v hlavičke, ak nie je --sap-col.")
+    p.add_argument("--csv-delimiter", default=None, help="Oddeľovač CSV, \\t = TAB (predvolene podľa hlavičky).")
+    p.add_argument("--csv-decimal", choices=("comma", "dot"), default=None,
+                   help="Desatinný oddeľovač CSV (predvolene čiarka pri ';' a TAB, inak bodka).")
+    p.add_argument("--csv-encoding", default=None, help="Kódovanie CSV (predvolene UTF-8, inak cp1250).")
+    p.add_argument("--workbook", default=None,
+                   help="Namiesto súborov na účet jeden XLSX (v --out) s hárkom na účet a súhrnom zostatkov.")
+    p.add_argument("--account", action="append", dest="accounts", help="Len vybrané účty (opakovateľné).")
+    p.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Počet worker procesov (1 = sériovo).")
+    p.add_argument("--max-inflight", type=int, default=None, help="Max. rozpracovaných účtov (predvolene 2 × jobs).")
+    return p
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.src2 and not args.refs_db:
+        parser.error("zadaj --src2 alebo --refs-db")
+    ref_store = RefStore(args.refs_db) if args.refs_db else None
+    try:
+        return _run(args, ref_store)
+    finally:
+        if ref_store is not None:
+            ref_store.close()
+
+def _run(args, ref_store: Optional[RefStore]) -> int:
+    outputs = tuple(o.strip() for o in args.outputs.split(",") if o.strip())
+    logo_bytes = _read(args.logo) if args.logo else None
+    os.makedirs(args.out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    plan_kw = dict(account_col=args.account_col, name_col=args.name_col, sap_col=args.sap_col,
+                   hdr_meno=args.meno, hdr_sap=args.sap, accounts=args.accounts,
+                   csv_format=CsvFormat(args.csv_delimiter and args.csv_delimiter.replace("\\t", "\t"),
+                                        None if args.csv_decimal is None else args.csv_decimal == "comma",
+                                        args.csv_encoding),
+                   ref_store=ref_store)
+    src2_bytes = _read(args.src2) if args.src2 else None
+    if args.workbook:
+        path = os.path.join(args.out, args.workbook)
+        write_saldo_workbook(path, _read(args.template), _read(args.helper), _read(args.src1), src2_bytes,
+                             hdr_spol=args.spol, logo_bytes=logo_bytes, balance_mode=args.balance_mode, **plan_kw)
+        print(f"Hotovo: {path} za {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+        return 0
+
+    ok = failed = 0
+    results = run_batch(
+        _read(args.template), _read(args.helper), _read(args.src1), src2_bytes, args.out,
+        jobs=args.jobs, max_inflight=args.max_inflight, logo_bytes=logo_bytes, plan_kw=plan_kw,
+        hdr_spol=args.spol, theme=args.theme, outputs=outputs,
+        xlsx_engine=args.xlsx_engine, balance_mode=args.balance_mode, pdf_engine=args.pdf_engine,
+        pdf_workers=args.pdf_workers,
+    )
+    for r in results:
+        if r.error:
+            failed += 1
+            print(f"{r.account}: CHYBA {r.error}", file=sys.stderr)
+        else:
+            ok += 1
+            print(f"{r.account}: {', '.join(r.files)}", file=sys.stderr)
+    print(f"Hotovo: {ok} účtov, {failed} chýb za {time.perf_counter() - t0:.1f} s -> {args.out}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
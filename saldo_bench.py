@@ -0,0 +1,248 @@
+# saldo_bench.py
+"""
+Benchmark salda: syntetické SAP exporty (src1 pohyby, src2 väzby) v zadaných veľkostiach,
+čas jednotlivých fáz (SaldoStats) generovania XLSX a PDF v každej téme + render_saldo_pdf (reporting),
+rows/s a peak RSS. Výsledky idú do JSON súboru (priebežne po každom prípade).
+
+    python saldo_bench.py --sizes 1000,10000,100000,1000000 --out bench.json
+    python saldo_bench.py --import-only          # len čas importu saldo_core voči IMPORT_BUDGET_MS
+
+Každý prípad beží v novom procese (spawn), takže peak RSS patrí len jemu.
+"""
+import argparse
+import datetime as _dt
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from openpyxl import Workbook
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(_HERE, "data", "template_saldo.xlsx")
+HELPER_PATH   = os.path.join(_HERE, "data", "pomocka_saldo.xlsx")
+LOGO_PATH     = os.path.join(_HERE, "data", "logo.png")
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+# studený štart: import saldo_core (openpyxl áno; reportlab platypus/canvas, pandas, pypdf až pri PDF výstupe)
+IMPORT_BUDGET_MS = 400
+LAZY_MODULES = ("reportlab.platypus", "reportlab.pdfgen", "pandas", "pypdf")
+
+SRC1_HEADERS = ["Zmluvný účet", "Číslo dokladu", "Dátum zadania", "Dátum účtovania", "Splatnosť netto",
+                "Označenie pôvodu", "Čiastka"]
+SRC2_HEADERS = ["Zmluvný účet", "Číslo dokladu", "Doplnková referencia"]
+
+# ---------- syntetické vstupy ----------
+def make_sources(rows: int, work_dir: str, origins: List[str], seed: int = 1):
+    """
+    Zapíše (alebo znovu použije) src1/src2 s `rows` pohybmi; vráti (cesta_src1, cesta_src2).
+    Pohyby majú typy z pomôcky, faktúry so splatnosťou a väzby prevažne s prefixom VBRK.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    p1 = os.path.join(work_dir, f"src1_{rows}_{seed}.xlsx")
+    p2 = os.path.join(work_dir, f"src2_{rows}_{seed}.xlsx")
+    if os.path.exists(p1) and os.path.exists(p2):
+        return p1, p2
+
+    rnd = random.Random(seed)
+    wb1 = Workbook(write_only=True); ws1 = wb1.create_sheet()
+    wb2 = Workbook(write_only=True); ws2 = wb2.create_sheet()
+    ws1.append(SRC1_HEADERS)
+    ws2.append(SRC2_HEADERS)
+    d0 = _dt.datetime(2023, 1, 1)
+    acc = 700000000 + seed
+    for i in range(rows):
+        doc = 100000000 + i
+        d = d0 + _dt.timedelta(days=i * 730 // max(rows, 1))
+        ws1.append([acc, doc, d, d + _dt.timedelta(days=1), d + _dt.timedelta(days=14),
+                    origins[i % len(origins)], round(rnd.uniform(-500, 500), 2)])
+        if i % 3:
+            ws2.append([acc, doc, f"VBRK{900000000 + i}" if i % 5 else f"VBRK {900000000 + i}"])
+        elif i % 2:
+            ws2.append([acc, doc, 900000000 + i])
+    # zápis cez dočasný súbor – prerušené generovanie nenechá polovičný vstup
+    for wb, p in ((wb1, p1), (wb2, p2)):
+        wb.save(p + ".part")
+        os.replace(p + ".part", p)
+    return p1, p2
+
+def _origins(helper_bytes: bytes) -> List[str]:
+    """'Označenie pôvodu' z pomôcky + jeden neznámy (nenamapovaný) typ."""
+    from saldo_core import compile_helper
+    return sorted(compile_helper(helper_bytes).pom_map) + ["Neznámy pôvod"]
+
+# ---------- meranie (v samostatnom procese) ----------
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _run_case(case: dict) -> dict:
+    """
+    Jeden prípad: príprava + výstup (xlsx/pdf) alebo render_saldo_pdf; fázy merané cez SaldoStats.
+    kind="api": celé verejné volanie generate_saldo_document (output="bundle": generate_saldo_bundle).
+    """
+    import saldo_core as sc
+
+    def read(p):
+        with open(p, "rb") as f:
+            return f.read()
+    template_bytes, helper_bytes = read(case["template"]), read(case["helper"])
+    src1_bytes, src2_bytes = read(case["src1"]), read(case["src2"])
+    logo_bytes = read(case["logo"]) if case["logo"] else None
+
+    stats = sc.SaldoStats()
+    t0 = time.perf_counter(); c0 = time.process_time()
+    if case["kind"] == "api":
+        args = (template_bytes, helper_bytes, src1_bytes, src2_bytes, "Benchmark", "123", "700000001")
+        opts = dict(theme=case["theme"], logo_bytes=logo_bytes, xlsx_engine=case["xlsx_engine"],
+                    balance_mode=case["balance_mode"], pdf_engine=case["pdf_engine"], stats=stats)
+        if case["output"] == "bundle":
+            size = sum(map(len, sc.generate_saldo_bundle(*args, **opts).values()))
+        else:
+            size = len(sc.generate_saldo_document(*args, output=case["output"], **opts))
+        ledger_rows = next((rec["rows"] for rec in stats.records if rec["stage"] == "balance"), None)
+    else:
+        ledger_rows, size = _run_stages(case, sc, stats, template_bytes, helper_bytes, src1_bytes, src2_bytes,
+                                        logo_bytes)
+    wall = time.perf_counter() - t0
+    return {
+        "stages": stats.records,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(time.process_time() - c0, 4),
+        "ledger_rows": ledger_rows,
+        "rows_per_s": round(case["rows"] / wall, 1) if wall else None,
+        "output_bytes": size,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def _run_stages(case, sc, stats, template_bytes, helper_bytes, src1_bytes, src2_bytes, logo_bytes):
+    """prepare_saldo + render_account / render_saldo_pdf (fázy oddelene); vráti (riadky ledgera, veľkosť výstupu)."""
+    tpl, ledger = sc.prepare_saldo(template_bytes, helper_bytes, src1_bytes, src2_bytes, stats=stats)
+    if case["kind"] == "reporting":
+        from reporting.saldo_pdf_layout import render_saldo_pdf
+        with tempfile.TemporaryDirectory() as tmp, stats.stage("render_saldo_pdf", len(ledger)):
+            out = os.path.join(tmp, "out.pdf")
+            render_saldo_pdf(None, case["logo"], out, ledger=ledger,
+                             customer={"SAP ID": "123", "Meno zákazníka": "Benchmark", "Zmluvný účet": "700000001"})
+            size = os.path.getsize(out)
+    else:
+        job = sc.AccountJob("700000001", "Benchmark", "123", ledger)
+        data = sc.render_account(tpl, template_bytes, job, theme=case["theme"], logo_bytes=logo_bytes,
+                                 outputs=(case["output"],), xlsx_engine=case["xlsx_engine"],
+                                 balance_mode=case["balance_mode"], pdf_engine=case["pdf_engine"], stats=stats)
+        size = len(data[case["output"]])
+    return len(ledger), size
+
+def measure_import(module: str = "saldo_core", runs: int = 5) -> dict:
+    """Čas importu v čerstvom interpreteri (minimum z `runs`) a ktoré z LAZY_MODULES sa pritom načítali."""
+    code = (f"import json, sys, time; t = time.perf_counter(); import {module}; "
+            f"print(json.dumps([time.perf_counter() - t, [m for m in {LAZY_MODULES!r} if m in sys.modules]]))")
+    times, loaded = [], set()
+    for _ in range(max(runs, 1)):
+        out = subprocess.run([sys.executable, "-c", code], cwd=_HERE, capture_output=True, text=True, check=True)
+        t, mods = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(t)
+        loaded.update(mods)
+    ms = round(min(times) * 1000, 1)
+    return {"module": module, "import_ms": ms, "budget_ms": IMPORT_BUDGET_MS, "loaded_lazy": sorted(loaded),
+            "ok": ms <= IMPORT_BUDGET_MS and not loaded}
+
+# ---------- beh ----------
+def _cases(args, sizes, src_paths):
+    themes = args.themes.split(",")
+    for rows in sizes:
+        p1, p2 = src_paths[rows]
+        base = dict(rows=rows, src1=p1, src2=p2, template=args.template, helper=args.helper, logo=args.logo or None,
+                    xlsx_engine=args.xlsx_engine, pdf_engine=args.pdf_engine, balance_mode=args.balance_mode)
+        for output in args.outputs.split(","):
+            for theme in themes:
+                yield dict(base, kind="core", output=output, theme=theme)
+        if args.api:
+            for output in args.outputs.split(",") + ["bundle"]:
+                yield dict(base, kind="api", output=output, theme=themes[0])
+        if args.reporting:
+            yield dict(base, kind="reporting", output="pdf", theme=None)
+
+def _env() -> dict:
+    import openpyxl, reportlab
+    return {
+        "timestamp": _dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "openpyxl": openpyxl.__version__,
+        "reportlab": reportlab.Version,
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    from saldo_core import BALANCE_MODES, OUTPUTS, PDF_ENGINES, THEMES, XLSX_ENGINES
+    p = argparse.ArgumentParser(description="Saldo – benchmark na syntetických exportoch.")
+    p.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Počty riadkov, čiarkou oddelené.")
+    p.add_argument("--outputs", default=",".join(OUTPUTS))
+    p.add_argument("--themes", default=",".join(THEMES))
+    p.add_argument("--xlsx-engine", default="template", choices=XLSX_ENGINES)
+    p.add_argument("--pdf-engine", default="platypus", choices=PDF_ENGINES)
+    p.add_argument("--balance-mode", default="formula", choices=BALANCE_MODES)
+    p.add_argument("--no-api", dest="api", action="store_false",
+                   help="Bez prípadov cez verejné API (generate_saldo_document / generate_saldo_bundle).")
+    p.add_argument("--no-reporting", dest="reporting", action="store_false", help="Bez render_saldo_pdf.")
+    p.add_argument("--repeat", type=int, default=1, help="Počet opakovaní každého prípadu.")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--work", default=os.path.join(tempfile.gettempdir(), "saldo_bench"),
+                   help="Adresár pre syntetické vstupy (znovu sa použijú).")
+    p.add_argument("--template", default=TEMPLATE_PATH)
+    p.add_argument("--helper", default=HELPER_PATH)
+    p.add_argument("--logo", default=LOGO_PATH)
+    p.add_argument("--out", default="bench.json", help="Výsledný JSON.")
+    p.add_argument("--import-only", action="store_true",
+                   help=f"Len zmerať import saldo_core (rozpočet {IMPORT_BUDGET_MS} ms); návratový kód 1 pri prekročení.")
+    return p
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    imp = measure_import()
+    print(f"import saldo_core: {imp['import_ms']} ms (rozpočet {imp['budget_ms']} ms)"
+          + (f", načítané pri importe: {', '.join(imp['loaded_lazy'])}" if imp["loaded_lazy"] else ""), file=sys.stderr)
+    if args.import_only:
+        return 0 if imp["ok"] else 1
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    with open(args.helper, "rb") as f:
+        origins = _origins(f.read())
+
+    src_paths = {}
+    for rows in sizes:
+        t = time.perf_counter()
+        src_paths[rows] = make_sources(rows, args.work, origins, args.seed)
+        print(f"vstupy {rows}: {time.perf_counter() - t:.1f} s", file=sys.stderr)
+
+    report = {"meta": {**_env(), "args": vars(args), "import": imp}, "results": []}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        for case in _cases(args, sizes, src_paths):
+            for run in range(args.repeat):
+                res = pool.submit(_run_case, case).result()
+                rec = {k: case[k] for k in ("kind", "rows", "output", "theme", "xlsx_engine", "pdf_engine",
+                                            "balance_mode")}
+                rec.update(run=run, **res)
+                report["results"].append(rec)
+                with open(args.out + ".part", "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=1)
+                os.replace(args.out + ".part", args.out)
+                print(f"{rec['kind']:9} {rec['rows']:>8} {rec['output']:6} {rec['theme'] or '-':5} "
+                      f"{rec['wall_s']:8.2f} s {rec['rows_per_s']:>10} r/s {rec['peak_rss_mb']} MB", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,49 @@
 # saldo_core.py
-from io import BytesIO
-from typing import Literal, Optional
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from io import BytesIO, StringIO
+from itertools import accumulate, islice
+from typing import Callable, Dict, Iterator, List, Literal, NamedTuple, Optional, Sequence, Tuple
 import datetime as _dt
+import cProfile
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import threading
+import zipfile
 import unicodedata  # <- robustné porovnávanie textu
+from xml.sax.saxutils import escape as _xml_escape, unescape as _xml_unescape
+try:
+    import resource     # len POSIX – peak RSS pri meraní fáz
+except ImportError:
+    resource = None
 
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.formatting.rule import Rule
 from openpyxl.utils import get_column_letter
-from openpyxl.drawing.image import Image as XLImage
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.utils.datetime import to_excel
 
-# PDF export
+# PDF export – reportlab (platypus, canvas, fonty), PIL a pypdf sa importujú až vo funkciách PDF výstupu,
+# aby import saldo_core (workery, Streamlit, XLSX-only úlohy) neplatil ich štart; pagesizes je len konštanta
 from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 HEADER_ROW = 9
 DATE_FMT   = "DD.MM.YY"
@@ -37,62 +65,813 @@ def _find_col(headers, name):
             return i
     return None
 
-def _last_data_row(ws, key_col):
-    last = HEADER_ROW
-    for r in range(HEADER_ROW+1, ws.max_row+1):
-        if ws.cell(row=r, column=key_col).value not in (None, ""):
-            last = r
-    return last
+# poradie a popis povinných stĺpcov v TEMPLATE (kľúč -> text do chybovej hlášky)
+TEMPLATE_COLS = {
+    "doc": "Číslo dokladu",
+    "inv": "Číslo Faktúry/číslo Faktúry",
+    "dz":  "Dátum vystavenia / Pripísania platby / Dátum zadania",
+    "du":  "Dátum účtovania",
+    "sn":  "Splatnosť netto",
+    "typ": "Typ dokladu",
+    "amt": "Čiastka",
+    "bal": "Zostatok",
+}
+
+def _resolve_cols(headers):
+    """Nájde stĺpce template podľa hlavičky; chýbajúce vráti ako None."""
+    return {
+        "doc": _find_col(headers, "Číslo dokladu"),
+        "inv": _find_col(headers, "číslo Faktúry") or _find_col(headers, "Číslo Faktúry"),
+        # akceptuj viac variantov (s/bez medzery a s/bez zalomenia)
+        "dz":  (_find_col(headers, "Dátum vystavenia / Pripísania platby")
+                or _find_col(headers, "Dátum vystavenia/Pripísania platby")
+                or _find_col(headers, "Dátum vystavenia /\nPripísania platby")
+                or _find_col(headers, "Dátum zadania")),
+        "du":  _find_col(headers, "Dátum účtovania"),
+        "sn":  _find_col(headers, "Splatnosť netto"),
+        "typ": _find_col(headers, "Typ dokladu"),
+        "amt": _find_col(headers, "Čiastka"),
+        "bal": _find_col(headers, "Zostatok"),
+    }
 
-def _style_ws(ws, c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal, last, theme="blue"):
+# šírky dátových stĺpcov v XLSX (kľúče ako TEMPLATE_COLS)
+XLSX_WIDTHS = {"doc": 16, "inv": 18, "dz": 18, "du": 16, "sn": 16, "typ": 22, "amt": 14, "bal": 14}
+
+def _xlsx_styles():
+    """Štýlové objekty pre XLSX (zdieľajú sa medzi requestami cez CompiledTemplate)."""
     # jemná 4ka téma pre XLSX (nie úplne rovnaké farby ako PDF, ale decentné)
-    header_fill = PatternFill("solid", fgColor="EAFBF9")  # bledý tyrkys
-    zebra_fill  = PatternFill("solid", fgColor="F7FDFB")
-    head_font   = Font(bold=True, color="0F172A")
     thin = Side(style="thin", color="D0D7E1")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    return {
+        "header_fill": PatternFill("solid", fgColor="EAFBF9"),  # bledý tyrkys
+        "zebra_fill":  PatternFill("solid", fgColor="F7FDFB"),
+        "head_font":   Font(bold=True, color="0F172A"),
+        "head_align":  Alignment(vertical="center", horizontal="center", wrap_text=True),
+        "border":      Border(left=thin, right=thin, top=thin, bottom=thin),
+    }
+
+XLSX_MONEY_FMT = "#,##0.00"
+# formát dátových stĺpcov: kľúč TEMPLATE_COLS -> pomenovaný štýl (stĺpce bez formátu nemajú štýl vôbec)
+XLSX_COL_STYLES = {"dz": "date", "du": "date", "sn": "date", "amt": "money", "bal": "money"}
+
+def _default_font_border(wb) -> Tuple[Font, Border]:
+    """Predvolené písmo a okraj zošita (bunka bez formátovania); nový write-only zošit má predvolené openpyxl."""
+    if wb.write_only or not wb.worksheets:
+        return DEFAULT_FONT, DEFAULT_BORDER
+    probe = Cell(wb.worksheets[0])
+    return probe.font, probe.border
+
+def _xlsx_named_styles(wb, styles=None) -> Dict[str, StyleArray]:
+    """
+    Zaregistruje v zošite pomenované štýly salda (hlavička, dátum, suma) a vráti ich StyleArray.
+    Bunky dostanú len kópiu poľa – žiadne nové štýlové objekty na bunku, styles.xml ostane malý.
+    """
+    st = styles or _xlsx_styles()
+    font, border = _default_font_border(wb)   # dátové štýly majú predvolené písmo zošita, len iný formát
+    named = {
+        "head":  NamedStyle("Saldo hlavička", font=st["head_font"], fill=st["header_fill"],
+                            border=st["border"], alignment=st["head_align"]),
+        "date":  NamedStyle("Saldo dátum", font=copy(font), border=copy(border), number_format=DATE_FMT),
+        "money": NamedStyle("Saldo suma", font=copy(font), border=copy(border), number_format=XLSX_MONEY_FMT),
+    }
+    for ns in named.values():
+        if ns.name not in wb.named_styles:
+            wb.add_named_style(ns)
+    return {k: ns.as_tuple() for k, ns in named.items()}
+
+def _xlsx_column_formats(ws, cols: Dict[str, int], named) -> None:
+    """Formáty dátumov a súm na úrovni stĺpcov (platia aj pre riadky dopísané v Exceli)."""
+    for key, name in XLSX_COL_STYLES.items():
+        ws.column_dimensions[get_column_letter(cols[key])]._style = copy(named[name])
+
+def _xlsx_zebra(ws, ncols: int, last: int, styles=None) -> None:
+    """Zebra (a okraje) dátovej oblasti ako jedno pravidlo podmieneného formátovania."""
+    st = styles or _xlsx_styles()
+    if last > HEADER_ROW:
+        zebra = st["zebra_fill"].fgColor.rgb
+        rule = Rule(type="expression", formula=[f"MOD(ROW()-{HEADER_ROW+1},2)=0"],
+                    dxf=DifferentialStyle(fill=PatternFill("solid", start_color=zebra, end_color=zebra),
+                                          border=st["border"]))
+        ws.conditional_formatting.add(f"A{HEADER_ROW+1}:{get_column_letter(ncols)}{last}", rule)
+
+def _style_ws(ws, c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal, last, theme="blue", styles=None, named=None):
+    named = named or _xlsx_named_styles(ws.parent, styles)
+    max_col = ws.max_column   # ws.max_column prechádza všetky bunky – zistiť raz
 
-    # hlavička (zapni zalamovanie textu)
-    for c in range(1, ws.max_column+1):
-        cell = ws.cell(row=HEADER_ROW, column=c)
-        cell.font = head_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(vertical="center", horizontal="center", wrap_text=True)
-        cell.border = border
+    # hlavička (pomenovaný štýl so zalamovaním textu)
+    for c in range(1, max_col+1):
+        ws.cell(row=HEADER_ROW, column=c)._style = copy(named["head"])
 
-    widths = {c_doc:16, c_inv:18, c_dz:18, c_du:16, c_sn:16, c_typ:22, c_amt:14, c_bal:14}
+    widths = dict(zip((c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal), XLSX_WIDTHS.values()))
     for col_idx, w in widths.items():
         if col_idx:
             ws.column_dimensions[get_column_letter(col_idx)].width = w
 
-    # formát peňazí
-    for r in range(HEADER_ROW+1, last+1):
-        if c_amt: ws.cell(row=r, column=c_amt).number_format = '#,##0.00'
-        if c_bal: ws.cell(row=r, column=c_bal).number_format = '#,##0.00'
-
-    # zebra + okraje
-    for r in range(HEADER_ROW+1, last+1):
-        if (r - (HEADER_ROW+1)) % 2 == 0:
-            for c in range(1, ws.max_column+1):
-                ws.cell(row=r, column=c).fill = zebra_fill
-                ws.cell(row=r, column=c).border = border
+    # formáty stĺpcov + zebra/okraje podmieneným formátovaním (nie po bunkách)
+    _xlsx_column_formats(ws, dict(zip(TEMPLATE_COLS, (c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal))), named)
+    _xlsx_zebra(ws, max_col, last, styles)
 
 def _insert_logo_xlsx(ws, logo_bytes: Optional[bytes]):
     if not logo_bytes:
         return
     try:
+        from openpyxl.drawing.image import Image as XLImage   # ťahá PIL – len keď je logo
         bio = BytesIO(logo_bytes)
         img = XLImage(bio)
         ws.add_image(img, "A1")
     except Exception:
         pass
 
+# ---------- kompilovaný template / pomôcka (cache) ----------
+class CompiledTemplate(NamedTuple):
+    """Predspracovaný TEMPLATE: stĺpce, hlavička a štýly – nezávislé od zákazníckych dát."""
+    key: str
+    headers: Tuple[object, ...]          # hodnoty v riadku HEADER_ROW
+    cols: Dict[str, int]                 # "doc", "inv", ... -> index stĺpca (1-based)
+    max_column: int
+    rename_dz: bool                      # premenovať hlavičku „Dátum zadania“
+    header_cells: Tuple[tuple, ...]      # (row, col, value, font, fill, border, alignment, number_format) pre riadky 1..HEADER_ROW
+    column_widths: Dict[str, float]
+    styles: Dict[str, object]
+    sheet_title: str
+    row_heights: Dict[int, float]        # výšky riadkov hlavičky (1..HEADER_ROW)
+    auto_filter: bool
+
+class CompiledHelper(NamedTuple):
+    """Predspracovaná pomôcka: 'Označenie pôvodu' -> 'Typ dokladu'."""
+    key: str
+    pom_map: Dict[str, object]
+
+COMPILED_CACHE_SIZE = 16   # max. počet položiek (template + pomôcky spolu)
+
+_compiled_cache: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+_compiled_lock = threading.Lock()
+_compiled_stats = {"hits": 0, "misses": 0}
+
+def _content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _compiled_get(kind: str, data: bytes, build):
+    key = (kind, _content_key(data))
+    with _compiled_lock:
+        hit = _compiled_cache.get(key)
+        if hit is not None:
+            _compiled_cache.move_to_end(key)
+            _compiled_stats["hits"] += 1
+            return hit
+        _compiled_stats["misses"] += 1
+    value = build(data, key[1])     # mimo zámku – parsovanie môže trvať
+    with _compiled_lock:
+        _compiled_cache[key] = value
+        _compiled_cache.move_to_end(key)
+        while len(_compiled_cache) > max(COMPILED_CACHE_SIZE, 0):
+            _compiled_cache.popitem(last=False)
+    return value
+
+def clear_compiled_cache() -> None:
+    """Explicitná invalidácia – zahodí všetky skompilované template a pomôcky."""
+    with _compiled_lock:
+        _compiled_cache.clear()
+        _compiled_stats["hits"] = _compiled_stats["misses"] = 0
+
+def compiled_cache_info() -> Dict[str, int]:
+    with _compiled_lock:
+        return {**_compiled_stats, "size": len(_compiled_cache), "maxsize": COMPILED_CACHE_SIZE}
+
+def _build_compiled_template(template_bytes: bytes, key: str) -> CompiledTemplate:
+    wb = load_workbook(BytesIO(template_bytes), data_only=False)
+    ws = wb[wb.sheetnames[0]]
+    headers = tuple(ws.cell(row=HEADER_ROW, column=c).value for c in range(1, ws.max_column+1))
+    cols = _resolve_cols(headers)
+    missing = [TEMPLATE_COLS[k] for k, v in cols.items() if v is None]
+    if missing:
+        # Diagnostická správa, aby bolo hneď jasné, čo chýba
+        raise RuntimeError(f"V TEMPLATE chýba niektorý povinný stĺpec. Chýbajú: {', '.join(missing)}")
+
+    rename_dz = _norm(headers[cols["dz"]-1]) in (_norm("Dátum zadania"),
+                                                 _norm("Dátum vystavenia/Pripísania platby"),
+                                                 _norm("Dátum vystavenia / Pripísania platby"))
+    header_cells = []
+    for row in ws.iter_rows(min_row=1, max_row=HEADER_ROW):
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                continue
+            header_cells.append((cell.row, cell.column, cell.value, copy(cell.font), copy(cell.fill),
+                                 copy(cell.border), copy(cell.alignment), cell.number_format))
+    widths = {k: d.width for k, d in ws.column_dimensions.items() if d.width}
+    heights = {r: d.height for r, d in ws.row_dimensions.items() if d.height and r <= HEADER_ROW}
+    return CompiledTemplate(key, headers, cols, ws.max_column, rename_dz, tuple(header_cells), widths,
+                            _xlsx_styles(), ws.title, heights, bool(ws.auto_filter.ref))
+
+def _build_compiled_helper(helper_bytes: bytes, key: str) -> CompiledHelper:
+    wb_h = load_workbook(BytesIO(helper_bytes), data_only=True); ws_h = wb_h[wb_h.sheetnames[0]]
+    hdr_h = [ws_h.cell(row=1, column=c).value for c in range(1, ws_h.max_column+1)]
+    def idx_h(name):
+        for i,h in enumerate(hdr_h, start=1):
+            if isinstance(h,str) and h.strip()==name:
+                return i
+        return None
+    h_src = idx_h("Označenie pôvodu"); h_dst = idx_h("Typ dokladu")
+    if not h_src or not h_dst:
+        raise RuntimeError("V pomôcke chýba 'Označenie pôvodu' alebo 'Typ dokladu'.")
+
+    pom_map = {}
+    for r in range(2, ws_h.max_row+1):
+        s = ws_h.cell(row=r, column=h_src).value
+        t = ws_h.cell(row=r, column=h_dst).value
+        if isinstance(s,str) and s.strip()!="":
+            pom_map[s.strip()] = t.strip() if isinstance(t,str) else t
+    return CompiledHelper(key, pom_map)
+
+def compile_template(template_bytes: bytes) -> CompiledTemplate:
+    """Vráti skompilovaný TEMPLATE z cache (kľúč = SHA-256 obsahu)."""
+    return _compiled_get("template", template_bytes, _build_compiled_template)
+
+def compile_helper(helper_bytes: bytes) -> CompiledHelper:
+    """Vráti skompilovanú pomôcku z cache (kľúč = SHA-256 obsahu)."""
+    return _compiled_get("helper", helper_bytes, _build_compiled_helper)
+
+# ---------- meranie fáz (voliteľné) ----------
+class SaldoStats:
+    """
+    Voliteľné meranie fáz generovania (odovzdá sa ako stats=... do verejného API).
+    Každá fáza pridá do `records` dict: stage, wall_s, cpu_s, rows, rss_peak_mb a pri trace_memory aj alloc_peak_kb.
+      - on_stage(record) sa zavolá po každej fáze,
+      - profile_dir: cProfile dump každej fázy ({poradie}_{fáza}.prof),
+        pri trace_memory aj tracemalloc snapshot ({poradie}_{fáza}.tracemalloc),
+      - trace_memory: zapne tracemalloc (špička alokácií vo fáze; výrazne spomaľuje).
+    Bez stats sa nemeria nič – fázy sú prázdny context manager.
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[dict], None]] = None, profile_dir: Optional[str] = None,
+                 trace_memory: bool = False):
+        self.records: List[dict] = []
+        self.on_stage = on_stage
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+
+    def stage(self, name: str, rows: Optional[int] = None) -> "_StageTimer":
+        return _StageTimer(self, name, rows)
+
+    def totals(self) -> Dict[str, dict]:
+        """Súčty podľa fázy (fáza sa pri viacerých výstupoch/účtoch môže opakovať)."""
+        out: Dict[str, dict] = {}
+        for rec in self.records:
+            t = out.setdefault(rec["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "rows": 0, "count": 0})
+            t["wall_s"] += rec["wall_s"]; t["cpu_s"] += rec["cpu_s"]; t["rows"] += rec["rows"] or 0; t["count"] += 1
+        return out
+
+    def summary(self) -> str:
+        """Čitateľná tabuľka fáz (pre log/CLI)."""
+        lines = [f"{'fáza':<14}{'wall s':>9}{'cpu s':>9}{'riadky':>10}{'RSS MB':>9}"]
+        for rec in self.records:
+            lines.append(f"{rec['stage']:<14}{rec['wall_s']:>9.3f}{rec['cpu_s']:>9.3f}"
+                         f"{rec['rows'] if rec['rows'] is not None else '':>10}{rec['rss_peak_mb'] or '':>9}")
+        return "\n".join(lines)
+
+class _StageTimer:
+    __slots__ = ("stats", "name", "rows", "_t0", "_c0", "_m0", "_prof")
+
+    def __init__(self, stats: SaldoStats, name: str, rows: Optional[int]):
+        self.stats, self.name, self.rows = stats, name, rows
+
+    def __enter__(self):
+        st = self.stats
+        self._prof = None
+        if st.profile_dir:
+            self._prof = cProfile.Profile()
+            try:
+                self._prof.enable()
+            except ValueError:   # iný profiler je už aktívny
+                self._prof = None
+        if st.trace_memory:
+            tracemalloc.reset_peak()
+            self._m0 = tracemalloc.get_traced_memory()[0]
+        self._t0 = time.perf_counter(); self._c0 = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._t0; cpu = time.process_time() - self._c0
+        st = self.stats
+        if self._prof is not None:
+            self._prof.disable()
+        rec = {"stage": self.name, "wall_s": round(wall, 6), "cpu_s": round(cpu, 6), "rows": self.rows,
+               "rss_peak_mb": _rss_peak_mb()}
+        if st.trace_memory:
+            rec["alloc_peak_kb"] = round((tracemalloc.get_traced_memory()[1] - self._m0) / 1024, 1)
+        if st.profile_dir:
+            os.makedirs(st.profile_dir, exist_ok=True)
+            base = os.path.join(st.profile_dir, f"{len(st.records):02d}_{self.name}")
+            if self._prof is not None:
+                self._prof.dump_stats(base + ".prof")
+            if st.trace_memory:
+                tracemalloc.take_snapshot().dump(base + ".tracemalloc")
+        st.records.append(rec)
+        if st.on_stage is not None:
+            st.on_stage(rec)
+        return False
+
+class _NoStage:
+    """Vypnuté meranie: prázdny context manager, zápis `rows` sa ignoruje."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NO_STAGE = _NoStage()
+_active_stats: ContextVar[Optional[SaldoStats]] = ContextVar("saldo_stats", default=None)
+
+def _stage(name: str, rows: Optional[int] = None):
+    """Fáza pre aktívne meranie (nastavené cez _measure), inak _NO_STAGE."""
+    stats = _active_stats.get()
+    return _NO_STAGE if stats is None else _StageTimer(stats, name, rows)
+
+@contextmanager
+def _measure(stats: Optional[SaldoStats]):
+    """Aktivuje stats pre volanie verejného API (v aktuálnom vlákne/kontexte)."""
+    if stats is None:
+        yield
+        return
+    started = stats.trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _active_stats.set(stats)
+    try:
+        yield
+    finally:
+        _active_stats.reset(token)
+        if started:
+            tracemalloc.stop()
+
+def _rss_peak_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+# ---------- ingestion (src1/src2) ----------
+# Zdroje môžu byť XLSX, CSV alebo Parquet – formát sa zistí z obsahu (source_format),
+# všetky cesty vracajú rovnaké riadky (hlavička + tuple hodnôt) pre to isté mapovanie a zostatok.
+SOURCE_FORMATS = ("xlsx", "csv", "parquet")
+
+class CsvFormat(NamedTuple):
+    """Voľby CSV zdroja; None = zistiť z obsahu (oddeľovač z hlavičky, desatinná čiarka pri ';' a TAB, UTF-8/cp1250)."""
+    delimiter: Optional[str] = None
+    decimal_comma: Optional[bool] = None
+    encoding: Optional[str] = None
+
+# binárne formáty, ktoré sa nesmú čítať ako CSV (hlavička bez stĺpcov = prázdne saldo)
+_BINARY_SIGNATURES = {
+    b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1": "starý Excel .xls (ulož ho ako .xlsx alebo CSV)",
+    b"%PDF": "PDF",
+    b"\x89PNG": "obrázok PNG",
+    b"\xff\xd8\xff": "obrázok JPEG",
+    b"\x1f\x8b": "gzip",
+    b"Rar!": "RAR",
+    b"7z\xbc\xaf": "7z",
+}
+
+def source_format(data: bytes) -> str:
+    """
+    Formát zdroja podľa obsahu: XLSX (ZIP), Parquet (PAR1 na začiatku aj konci), inak CSV.
+    Iné binárne súbory (.xls, PDF, obrázky, nulové bajty bez UTF-16 BOM) -> RuntimeError.
+    """
+    if data[:4] == b"PK\x03\x04":
+        return "xlsx"
+    if data[:4] == b"PAR1" and data[-4:] == b"PAR1":
+        return "parquet"
+    for sig, name in _BINARY_SIGNATURES.items():
+        if data.startswith(sig):
+            raise RuntimeError(f"Nepodporovaný formát zdroja: {name}.")
+    if b"\x00" in data[:4096] and data[:2] not in (b"\xff\xfe", b"\xfe\xff"):
+        raise RuntimeError("Nepodporovaný formát zdroja: binárny súbor (očakáva sa XLSX, CSV alebo Parquet).")
+    return "csv"
+
+def _iter_source_rows(data: bytes, min_row: int = 1, data_only: bool = True, csv_format: Optional[CsvFormat] = None):
+    """
+    Prejde zdroj (prvý hárok XLSX, CSV alebo Parquet), každý riadok od min_row práve raz (tuple hodnôt).
+    Prvý vrátený tuple (pri min_row=1) je hlavička.
+    """
+    fmt = source_format(data)
+    if fmt == "csv":
+        rows = _iter_csv_rows(data, csv_format or CsvFormat())
+    elif fmt == "parquet":
+        rows = _iter_parquet_rows(data)
+    else:
+        rows = _iter_xlsx_rows(data, min_row, data_only)
+        min_row = 1
+    if min_row > 1:
+        rows = islice(rows, min_row - 1, None)
+    yield from rows
+
+def _iter_xlsx_rows(data: bytes, min_row: int = 1, data_only: bool = True):
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=data_only)
+    try:
+        ws = wb[wb.sheetnames[0]]
+        for row in ws.iter_rows(min_row=min_row, values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+_CSV_DELIMITERS = ";\t,|"
+_CSV_DATE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})$")
+_CSV_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?$")
+# číslo so znamienkom vpredu alebo (SAP) vzadu; tisícky oddelené bodkou/medzerou resp. čiarkou
+_CSV_NUM_COMMA = re.compile(r"([-+]?)(\d{1,3}(?:[. \u00A0]\d{3})+|\d+)(?:,(\d+))?(-?)$")
+_CSV_NUM_DOT = re.compile(r"([-+]?)(\d{1,3}(?:[, \u00A0]\d{3})+|\d+)(?:\.(\d+))?(-?)$")
+_CSV_MEMO_SIZE = 65536   # opakované hodnoty (typy, dátumy) sa konvertujú raz
+
+def _csv_decode(data: bytes, encoding: Optional[str]) -> str:
+    if encoding:
+        return data.decode(encoding)
+    if data[:3] == b"\xef\xbb\xbf":
+        return data[3:].decode("utf-8")
+    if data[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return data.decode("utf-16")   # "Unicode text" z Excelu
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("cp1250")   # SAP exporty v SK/CZ lokalizácii
+
+def _csv_value(s: str, num_re):
+    """Text bunky CSV -> None / datetime / int / float / str (ako by ich vrátil XLSX)."""
+    s = s.strip()
+    if not s:
+        return None
+    if not (s[0].isdigit() or s[0] in "-+"):
+        return s
+    m = _CSV_DATE.match(s)
+    if m:
+        try:
+            return _dt.datetime(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        except ValueError:
+            return s
+    m = _CSV_ISO_DATE.match(s)
+    if m:
+        try:
+            return _dt.datetime(*(int(g) for g in m.groups() if g is not None))
+        except ValueError:
+            return s
+    m = num_re.match(s)
+    if m is None or (m.group(1) and m.group(4)):
+        return s
+    sign, whole, frac, trail = m.groups()
+    neg = sign == "-" or trail == "-"
+    if frac is None:
+        if len(whole) > 1 and whole[0] == "0":
+            return s                     # vedúca nula = identifikátor, nie číslo
+        v = int(re.sub(r"\D", "", whole))
+    else:
+        v = float(re.sub(r"\D", "", whole) + "." + frac)
+    return -v if neg else v
+
+def _iter_csv_rows(data: bytes, fmt: CsvFormat):
+    """CSV -> hlavička + riadky s typovanými hodnotami (čísla, dátumy dd.mm.rrrr / ISO)."""
+    text = _csv_decode(data, fmt.encoding)
+    delimiter = fmt.delimiter
+    if delimiter is None:
+        first = text[:text.find("\n")] if "\n" in text else text
+        delimiter = max(_CSV_DELIMITERS, key=first.count)
+    decimal_comma = fmt.decimal_comma if fmt.decimal_comma is not None else delimiter != ","
+    num_re = _CSV_NUM_COMMA if decimal_comma else _CSV_NUM_DOT
+
+    rows = csv.reader(StringIO(text), delimiter=delimiter)
+    hdr = next(rows, None)
+    if hdr is None:
+        return
+    yield tuple(h.strip() for h in hdr)
+    memo = {}
+    for raw in rows:
+        row = []
+        for cell in raw:
+            v = memo.get(cell, memo)
+            if v is memo:
+                v = _csv_value(cell, num_re)
+                if len(memo) < _CSV_MEMO_SIZE:
+                    memo[cell] = v
+            row.append(v)
+        yield tuple(row)
+
+def _iter_parquet_rows(data: bytes, batch_size: int = 65536):
+    """Parquet -> hlavička (názvy stĺpcov) + riadky; dátumy ako datetime bez časovej zóny (ako z XLSX)."""
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow.types as pat
+    except ImportError:
+        raise RuntimeError("Parquet vstup vyžaduje balík pyarrow (pip install pyarrow).") from None
+    pf = pq.ParquetFile(BytesIO(data))
+    schema = pf.schema_arrow
+    yield tuple(schema.names)
+    fix = []
+    for field in schema:
+        if pat.is_date(field.type):
+            fix.append(lambda v: None if v is None else _dt.datetime(v.year, v.month, v.day))
+        elif pat.is_timestamp(field.type) and field.type.tz is not None:
+            fix.append(lambda v: None if v is None else v.replace(tzinfo=None))
+        else:
+            fix.append(None)
+    for batch in pf.iter_batches(batch_size=batch_size):
+        cols = []
+        for col, f in zip(batch.columns, fix):
+            values = col.to_pylist()
+            cols.append(values if f is None else [f(v) for v in values])
+        yield from zip(*cols)
+
+def _src_idx(hdr, name):
+    """0-based index stĺpca v hlavičke zdroja (presná zhoda po strip())."""
+    for i, h in enumerate(hdr):
+        if isinstance(h, str) and h.strip() == name:
+            return i
+    return None
+
+def _iter_src1(src1_bytes: bytes, pom_map, key_names: Sequence[str] = (), csv_format: Optional[CsvFormat] = None):
+    """
+    Jeden prechod src1: pre každý neprázdny riadok vráti (kľúče, pohyb), kde
+      - kľúče = hodnoty stĺpcov key_names (None, ak stĺpec chýba),
+      - pohyb = (doc, dz, du, sn, typ, amt),
+      - 'Označenie pôvodu' sa namapuje na 'Typ dokladu',
+      - splatnosť sa ponechá len pri faktúrach.
+    """
+    rows = _iter_source_rows(src1_bytes, csv_format=csv_format)
+    hdr1 = next(rows, ())
+    i_doc = _src_idx(hdr1, "Číslo dokladu"); i_dz = _src_idx(hdr1, "Dátum zadania"); i_du = _src_idx(hdr1, "Dátum účtovania")
+    i_sn  = _src_idx(hdr1, "Splatnosť netto"); i_op = _src_idx(hdr1, "Označenie pôvodu"); i_amt = _src_idx(hdr1, "Čiastka")
+    i_keys = [_src_idx(hdr1, k) for k in key_names]
+    missing = [k for k, i in (("Číslo dokladu", i_doc), ("Čiastka", i_amt), *zip(key_names, i_keys)) if i is None]
+    if missing:
+        raise RuntimeError(f"V zdroji 1 chýba stĺpec: {', '.join(missing)}")
+    def pick(row, i):
+        return row[i] if i is not None and i < len(row) else None
+
+    faktura = _norm("Faktúra")
+    typ_is_faktura = {}   # cache: namapovaný typ -> je faktúra?
+    for row in rows:
+        if not any(v not in (None, "") for v in row):
+            continue
+        ozn_pov = pick(row, i_op)
+        mapped_typ = pom_map.get(ozn_pov.strip() if isinstance(ozn_pov, str) else ozn_pov, None)
+        fakt = typ_is_faktura.get(mapped_typ)
+        if fakt is None:
+            fakt = typ_is_faktura[mapped_typ] = isinstance(mapped_typ, str) and _norm(mapped_typ) == faktura
+        # Splatnosť len pri faktúrach, inak None
+        yield (tuple(pick(row, i) for i in i_keys),
+               (pick(row, i_doc), pick(row, i_dz), pick(row, i_du),
+                pick(row, i_sn) if fakt else None, mapped_typ, pick(row, i_amt)))
+
+def _read_src1(src1_bytes: bytes, pom_map, csv_format: Optional[CsvFormat] = None):
+    """Pohyby zo src1 ako zoznam (doc, dz, du, sn, typ, amt) – pozri _iter_src1."""
+    return [move for _, move in _iter_src1(src1_bytes, pom_map, csv_format=csv_format)]
+
+def _clean_ref(v):
+    """'Doplnková referencia' -> číslo faktúry (bez prefixu VBRK)."""
+    if isinstance(v, str):
+        s = v.strip()
+        if s.upper().startswith("VBRK"): s = s[4:].strip()
+        return s
+    return "" if v is None else str(v)
+
+def _iter_refs(src2_bytes: bytes, csv_format: Optional[CsvFormat] = None):
+    """Páry ('Číslo dokladu', číslo faktúry) zo src2 (väzby) v poradí exportu."""
+    rows = _iter_source_rows(src2_bytes, csv_format=csv_format)
+    hdr2 = next(rows, ())
+    j_doc = _src_idx(hdr2, "Číslo dokladu"); j_ref = _src_idx(hdr2, "Doplnková referencia")
+    if j_doc is None or j_ref is None:
+        raise RuntimeError("V zdroji 2 chýba 'Číslo dokladu' alebo 'Doplnková referencia'.")
+
+    for row in rows:
+        k = row[j_doc] if j_doc < len(row) else None
+        if k not in (None, ""):
+            yield str(k).strip(), _clean_ref(row[j_ref] if j_ref < len(row) else None)
+
+def _read_ref_map(src2_bytes: bytes, csv_format: Optional[CsvFormat] = None):
+    """Mapa 'Číslo dokladu' -> číslo faktúry zo src2 (väzby); pri opakovaní platí posledný riadok."""
+    return dict(_iter_refs(src2_bytes, csv_format))
+
+# ---------- úložisko väzieb (SQLite) ----------
+REFS_LOOKUP_BATCH = 500   # parametre v jednom SELECT … IN (…)
+
+class RefStore:
+    """
+    Lokálne úložisko väzieb 'Číslo dokladu' -> číslo faktúry (SQLite, jeden súbor):
+      - ingest() pridá src2 prírastkovo – číslo dokladu je primárny kľúč (nová väzba prepíše starú),
+        rovnaký súbor (SHA-256 obsahu) sa druhýkrát nespracúva,
+      - lookup() vráti väzby len pre zadané čísla dokladov (indexované vyhľadanie po dávkach),
+      - revision sa zvýši pri každej zmene väzieb (kľúč cache výstupov),
+      - súbor môže naraz používať viac procesov (WAL); objekt je thread-safe.
+    """
+
+    def __init__(self, path: str):
+        import sqlite3      # len pri použití úložiska
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS refs (doc TEXT PRIMARY KEY, ref TEXT NOT NULL) WITHOUT ROWID")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sources (sha TEXT PRIMARY KEY, rows INTEGER NOT NULL, "
+                               "changed INTEGER NOT NULL, loaded_at TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('revision', 0)")
+
+    def known(self, src2_bytes: bytes) -> bool:
+        """Bol už tento súbor (podľa SHA-256 obsahu) načítaný?"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sources WHERE sha = ?",
+                                      (_content_key(src2_bytes),)).fetchone() is not None
+
+    def ingest(self, src2_bytes: bytes, csv_format: Optional[CsvFormat] = None) -> int:
+        """Pridá väzby zo src2; vráti počet nových alebo zmenených čísel dokladov (0 = súbor už bol načítaný)."""
+        if self.known(src2_bytes):
+            return 0
+        sha = _content_key(src2_bytes)
+        refs = _read_ref_map(src2_bytes, csv_format)      # mimo zámku – parsovanie môže trvať
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT INTO refs (doc, ref) VALUES (?, ?) ON CONFLICT (doc) DO UPDATE "
+                                   "SET ref = excluded.ref WHERE ref <> excluded.ref", refs.items())
+            changed = self._conn.total_changes - before
+            if changed:
+                self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+            self._conn.execute("INSERT OR IGNORE INTO sources VALUES (?, ?, ?, ?)",
+                               (sha, len(refs), changed, _dt.datetime.now().isoformat(timespec="seconds")))
+        return changed
+
+    def lookup(self, docs) -> Dict[str, str]:
+        """Väzby pre čísla dokladov `docs` (reťazce ako v _read_ref_map); chýbajúce v mape nie sú."""
+        docs = list(docs)
+        out: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(docs), REFS_LOOKUP_BATCH):
+                chunk = docs[i:i + REFS_LOOKUP_BATCH]
+                out.update(self._conn.execute(
+                    f"SELECT doc, ref FROM refs WHERE doc IN ({','.join('?' * len(chunk))})", chunk))
+        return out
+
+    @property
+    def revision(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            docs = self._conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+            sources = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        return {"docs": docs, "sources": sources, "revision": self.revision}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def _move_docs(moves) -> set:
+    """Čísla dokladov z pohybov v tvare kľúčov ref_map."""
+    return {str(m[0]).strip() for m in moves if m[0] not in (None, "")}
+
+def _resolve_refs(moves, src2_bytes: Optional[bytes], csv_format: Optional[CsvFormat] = None,
+                  ref_store: Optional[RefStore] = None) -> Dict[str, str]:
+    """
+    ref_map pre pohyby: bez úložiska celé src2; s úložiskom sa src2 (ak je) najprv pridá
+    a väzby sa vyhľadajú len pre čísla dokladov z pohybov – src2 je potom nepovinné.
+    """
+    if ref_store is None:
+        if not src2_bytes:
+            raise RuntimeError("Chýba zdroj 2 (väzby) – bez úložiska väzieb (RefStore) je povinný.")
+        return _read_ref_map(src2_bytes, csv_format)
+    if src2_bytes:
+        ref_store.ingest(src2_bytes, csv_format)
+    return ref_store.lookup(_move_docs(moves))
+
+# ---------- ledger (stĺpcový model medzi parsovaním a výstupmi) ----------
+class Ledger:
+    """
+    Stĺpcový model výpisu – postaví sa raz zo vstupov a čítajú ho všetky výstupy (XLSX, PDF).
+      - čiastky a zostatky sú v array('d'), chýbajúca čiastka = NaN (do zostatku ide ako 0),
+      - typ dokladu je kód do `types` (0 = bez typu), `type_is_faktura[kód]` je príznak faktúry,
+      - opening = počiatočný zostatok (pri prírastku konečný zostatok predchádzajúceho salda).
+    """
+    __slots__ = ("doc", "inv", "dz", "du", "sn", "typ", "amt", "bal", "opening",
+                 "types", "type_is_faktura", "_type_codes")
+
+    def __init__(self, opening: float = 0.0):
+        self.opening = opening
+        self.doc = []; self.inv = []
+        self.dz = []; self.du = []; self.sn = []
+        self.typ = array("H")
+        self.amt = array("d")
+        self.bal = array("d")
+        self.types = [None]
+        self.type_is_faktura = bytearray(1)
+        self._type_codes = {None: 0}
+
+    def __len__(self):
+        return len(self.doc)
+
+    def type_code(self, typ) -> int:
+        code = self._type_codes.get(typ)
+        if code is None:
+            code = self._type_codes[typ] = len(self.types)
+            self.types.append(typ)
+            self.type_is_faktura.append(isinstance(typ, str) and _norm(typ) == _norm("Faktúra"))
+        return code
+
+    def append(self, doc, inv, dz, du, sn, typ_code: int, amt: Optional[float]):
+        self.doc.append(doc); self.inv.append(inv)
+        self.dz.append(dz); self.du.append(du); self.sn.append(sn)
+        self.typ.append(typ_code)
+        self.amt.append(_NAN if amt is None else amt)
+
+    def compute_balance(self) -> None:
+        """Bežiaci zostatok od `opening` – kumulatívny súčet v jednom prechode (accumulate beží v C)."""
+        self.bal = array("d", islice(accumulate((0.0 if a != a else a for a in self.amt), initial=self.opening), 1, None))
+
+    @property
+    def closing_balance(self) -> float:
+        return self.bal[-1] if self.bal else self.opening
+
+    def rows(self, start: int = 0, stop: Optional[int] = None):
+        """Riadky ako (doc, inv, dz, du, sn, typ, amt, bal); chýbajúca čiastka je None."""
+        types = self.types
+        for i in range(start, len(self) if stop is None else min(stop, len(self))):
+            a = self.amt[i]
+            yield (self.doc[i], self.inv[i], self.dz[i], self.du[i], self.sn[i],
+                   types[self.typ[i]], None if a != a else a, self.bal[i])
+
+_NAN = float("nan")
+
+def _build_ledger(moves, ref_map, opening: float = 0.0) -> Ledger:
+    """Zostaví ledger z pohybov (src1) a väzieb (src2): číslo faktúry len pri faktúrach + zostatok od `opening`."""
+    # riadky za posledným číslom dokladu (napr. súčtový riadok exportu) sa neberú
+    last = len(moves)
+    while last and moves[last-1][0] in (None, ""):
+        last -= 1
+
+    led = Ledger(opening)
+    for doc, dz, du, sn, typ, amt in moves[:last]:
+        code = led.type_code(typ)
+        inv = None
+        if led.type_is_faktura[code]:
+            inv = ref_map.get(str(doc).strip() if doc not in (None,"") else "", "") or None
+        led.append(doc, inv, dz, du, sn, code, _num(amt))
+    led.compute_balance()
+    return led
+
+class SaldoSnapshot(NamedTuple):
+    """
+    Stav vygenerovaného salda pre prírastok: počet riadkov, konečný zostatok a posledné číslo dokladu.
+    Uloží sa ako malý JSON (to_json) vedľa výstupu a ďalší mesiac nahradí čítanie celej histórie.
+    """
+    rows: int
+    closing_balance: float
+    last_doc: Optional[str]
+
+    def to_json(self) -> bytes:
+        return json.dumps(self._asdict(), ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "SaldoSnapshot":
+        try:
+            d = json.loads(data)
+            return cls(int(d["rows"]), float(d["closing_balance"]), d.get("last_doc"))
+        except (ValueError, TypeError, KeyError) as e:
+            raise RuntimeError(f"Neplatný snapshot salda: {e}") from None
+
+def _doc_key(doc) -> Optional[str]:
+    """Číslo dokladu -> reťazec na porovnanie (Excel čísla bez '.0'); prázdne = None."""
+    if isinstance(doc, float) and doc.is_integer():
+        doc = int(doc)
+    return None if doc in (None, "") else str(doc).strip()
+
+def ledger_snapshot(ledger: Ledger, base: Optional[SaldoSnapshot] = None) -> SaldoSnapshot:
+    """Snapshot po ledgeri (pri prírastku nadväzuje na base: riadky sa sčítajú)."""
+    last_doc = next((k for k in map(_doc_key, reversed(ledger.doc)) if k), None)
+    if base is not None:
+        last_doc = last_doc or base.last_doc
+    return SaldoSnapshot((base.rows if base else 0) + len(ledger), ledger.closing_balance, last_doc)
+
+def _moves_after(moves: list, last_doc: Optional[str]) -> list:
+    """Pohyby za posledným dokladom predchádzajúceho salda (prekryv exportov sa zahodí); inak všetky."""
+    if last_doc:
+        for i in range(len(moves) - 1, -1, -1):
+            if _doc_key(moves[i][0]) == last_doc:
+                return moves[i+1:]
+    return moves
+
 # ---------- helpers (PDF) ----------
 def _register_fonts():
     """Registruje DejaVu Sans (ak je v data/) a nastaví family mapovanie; inak padá na Helvetica."""
     try:
-        import os
         from reportlab.lib.fonts import addMapping
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
         base = os.path.dirname(__file__)
         ttf_regular = os.path.join(base, "data", "DejaVuSans.ttf")
         ttf_bold    = os.path.join(base, "data", "DejaVuSans-Bold.ttf")
@@ -138,82 +917,34 @@ THEMES = {
     "warm": {"header_hex": "#C6A875", "alt_row": "#FFF9F2", "grid": "#EADDC8"},
 }
 
-def _build_pdf(ws, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[bytes], theme="blue"):
-    FONT_REG, FONT_BOLD = _register_fonts()
+PDF_HEADERS = [
+    "Č. dokladu",
+    "Č. faktúry",
+    "Dátum vystavenia /\nPripísania platby",
+    "Dátum účt.",
+    "Splatnosť",
+    "Typ dokladu",
+    "Čiastka",
+    "Zostatok",
+]
+PDF_COL_WIDTHS = [75, 60, 70, 58, 58, 70, 62, 68]
+PDF_MARGIN = 24
+PDF_CELL_PAD = 2
+_FRAME_PAD = 6   # vnútorný padding rámca SimpleDocTemplate
+
+def _pdf_styles(FONT_REG, FONT_BOLD):
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(name="HdrTitle", parent=styles["Title"], fontName=FONT_BOLD, alignment=0))
     styles.add(ParagraphStyle(name="Base", parent=styles["Normal"], fontName=FONT_REG, fontSize=9, leading=12))
     styles.add(ParagraphStyle(name="HdrSmall", parent=styles["Normal"], fontName=FONT_BOLD, fontSize=9, alignment=1))
     styles.add(ParagraphStyle(name="Cell", parent=styles["Normal"], fontName=FONT_REG, fontSize=8, leading=10))
     styles.add(ParagraphStyle(name="CellRight", parent=styles["Normal"], fontName=FONT_REG, fontSize=8, leading=10, alignment=2))
+    return styles
 
-    th = THEMES.get(theme, THEMES["blue"])
-
-    # hlavičky z Excelu
-    xhdrs = [ws.cell(row=HEADER_ROW, column=c).value for c in range(1, ws.max_column+1)]
-    c_doc = _find_col(xhdrs, "Číslo dokladu")
-    c_inv = _find_col(xhdrs, "číslo Faktúry") or _find_col(xhdrs, "Číslo Faktúry")
-    # akceptuj viac variantov (s/bez medzery a s/bez zalomenia)
-    c_dz  = (_find_col(xhdrs, "Dátum vystavenia / Pripísania platby")
-             or _find_col(xhdrs, "Dátum vystavenia/Pripísania platby")
-             or _find_col(xhdrs, "Dátum vystavenia /\nPripísania platby")
-             or _find_col(xhdrs, "Dátum zadania"))
-    c_du  = _find_col(xhdrs, "Dátum účtovania")
-    c_sn  = _find_col(xhdrs, "Splatnosť netto")
-    c_typ = _find_col(xhdrs, "Typ dokladu")
-    c_amt = _find_col(xhdrs, "Čiastka")
-    c_bal = _find_col(xhdrs, "Zostatok")
-    last  = _last_data_row(ws, c_doc)
-
-    pdf_hdrs = [
-        "Č. dokladu",
-        "Č. faktúry",
-        "Dátum vystavenia /\nPripísania platby",
-        "Dátum účt.",
-        "Splatnosť",
-        "Typ dokladu",
-        "Čiastka",
-        "Zostatok",
-    ]
-
-    data = [[Paragraph(h, styles["HdrSmall"]) for h in pdf_hdrs]]
-    run_bal = 0.0
-    def _is_faktura(txt): return isinstance(txt, str) and _norm(txt) == _norm("Faktúra")
-
-    for r in range(HEADER_ROW+1, last+1):
-        doc = ws.cell(row=r, column=c_doc).value
-        inv = ws.cell(row=r, column=c_inv).value
-        dz  = ws.cell(row=r, column=c_dz).value
-        du  = ws.cell(row=r, column=c_du).value
-        sn  = ws.cell(row=r, column=c_sn).value
-        typ = ws.cell(row=r, column=c_typ).value
-        amt = _num(ws.cell(row=r, column=c_amt).value)
-        add_amt = amt if amt is not None else 0.0
-        run_bal += add_amt
-
-        row = [
-            Paragraph("" if doc is None else str(doc), styles["Cell"]),
-            Paragraph("" if (inv is None or not _is_faktura(typ)) else str(inv), styles["Cell"]),
-            Paragraph(_fmt_date(dz), styles["Cell"]),
-            Paragraph(_fmt_date(du), styles["Cell"]),
-            Paragraph(_fmt_date(sn) if _is_faktura(typ) else "", styles["Cell"]),
-            Paragraph("" if typ is None else str(typ), styles["Cell"]),
-            Paragraph(_fmt_money(amt), styles["CellRight"]),
-            Paragraph(_fmt_money(run_bal), styles["CellRight"]),
-        ]
-        data.append(row)
-
-    # "Súčet"
-    total_row = [Paragraph("", styles["Cell"]) for _ in range(8)]
-    total_row[5] = Paragraph("<b>Súčet</b>", styles["HdrSmall"])
-    total_row[7] = Paragraph(f"<b>{_fmt_money(run_bal)}</b>", styles["CellRight"])
-    data.append(total_row)
-
-    # Layout
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=24, rightMargin=24, topMargin=24, bottomMargin=24)
-
-    # Hlavička PDF
+def _pdf_header_table(styles, hdr_meno, hdr_sap, hdr_ucet, logo_bytes: Optional[bytes]):
+    """Hlavička PDF: logo + titul, dátum generovania a údaje zákazníka."""
+    from reportlab.platypus import Image as RLImage, Paragraph, Spacer, Table, TableStyle
     title = Paragraph("Náhľad na fakturačný účet – saldo", styles["HdrTitle"])
     date_p = Paragraph(f"Dátum generovania: {_dt.datetime.now().strftime('%d.%m.%Y')}", styles["Base"])
     meta = Paragraph(
@@ -223,9 +954,9 @@ def _build_pdf(ws, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[b
 
     header_tbl_data = []
     if logo_bytes:
-        rlimg = RLImage(BytesIO(logo_bytes), width=60, height=60)
+        rlimg = RLImage(BytesIO(logo_bytes), width=LOGO_PDF_SIZE, height=LOGO_PDF_SIZE)
         header_tbl_data.append([rlimg, Spacer(10, 10), [title, date_p, meta]])
-        col_head_widths = [60, 10, None]
+        col_head_widths = [LOGO_PDF_SIZE, 10, None]
     else:
         header_tbl_data.append(["", "", [title, date_p, meta]])
         col_head_widths = [0, 0, None]
@@ -238,43 +969,1027 @@ def _build_pdf(ws, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[b
         ("TOPPADDING", (0,0), (-1,-1), 0),
         ("BOTTOMPADDING", (0,0), (-1,-1), 6),
     ]))
+    return header_tbl
 
-    story = [header_tbl, Spacer(1, 6)]
+def _pdf_cells(ledger: Ledger, start: int = 0, stop: Optional[int] = None):
+    """Texty buniek tabuľky (8 stĺpcov) pre riadky ledgera [start, stop)."""
+    for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows(start, stop):
+        yield (
+            "" if doc is None else str(doc),
+            "" if inv is None else str(inv),
+            _fmt_date(dz),
+            _fmt_date(du),
+            _fmt_date(sn),
+            "" if typ is None else str(typ),
+            _fmt_money(amt),
+            _fmt_money(bal),
+        )
 
-    # tabuľka
-    col_widths = [75, 60, 70, 58, 58, 70, 62, 68]
-    table = Table(data, repeatRows=1, colWidths=col_widths, hAlign="LEFT")
-    table.setStyle(TableStyle([
+def _pdf_table_style(th, FONT_BOLD, with_total: bool = True):
+    """TableStyle tabuľky saldo; with_total=False pre časti (chunky) bez riadku „Súčet“."""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    body_end = -2 if with_total else -1
+    cmds = [
         ("BACKGROUND", (0,0), (-1,0), colors.HexColor(th["header_hex"])),
         ("TEXTCOLOR",   (0,0), (-1,0), colors.white),
         ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor(th["grid"])),
-        ("ROWBACKGROUNDS", (0,1), (-1,-2), [colors.white, colors.HexColor(th["alt_row"])]),
-        ("ALIGN", (2,1), (4,-2), "CENTER"),
-        ("ALIGN", (6,1), (7,-2), "RIGHT"),
-        ("ALIGN", (7,-1), (7,-1), "RIGHT"),
+        ("ROWBACKGROUNDS", (0,1), (-1,body_end), [colors.white, colors.HexColor(th["alt_row"])]),
+        ("ALIGN", (2,1), (4,body_end), "CENTER"),
+        ("ALIGN", (6,1), (7,body_end), "RIGHT"),
         ("FONTSIZE", (0,0), (-1,0), 9),
         ("FONTSIZE", (0,1), (-1,-1), 8),
-        ("LEFTPADDING", (0,0), (-1,-1), 2),
-        ("RIGHTPADDING", (0,0), (-1,-1), 2),
-        ("TOPPADDING", (0,0), (-1,-1), 2),
-        ("BOTTOMPADDING",(0,0), (-1,-1), 2),
-        ("BACKGROUND", (0,-1), (-1,-1), colors.HexColor(th["header_hex"])),
-        ("TEXTCOLOR",  (0,-1), (-1,-1), colors.white),
-        ("FONTNAME",   (5,-1), (5,-1), FONT_BOLD),
-        ("FONTNAME",   (7,-1), (7,-1), FONT_BOLD),
-    ]))
+        ("LEFTPADDING", (0,0), (-1,-1), PDF_CELL_PAD),
+        ("RIGHTPADDING", (0,0), (-1,-1), PDF_CELL_PAD),
+        ("TOPPADDING", (0,0), (-1,-1), PDF_CELL_PAD),
+        ("BOTTOMPADDING",(0,0), (-1,-1), PDF_CELL_PAD),
+    ]
+    if with_total:
+        cmds += [
+            ("ALIGN", (7,-1), (7,-1), "RIGHT"),
+            ("BACKGROUND", (0,-1), (-1,-1), colors.HexColor(th["header_hex"])),
+            ("TEXTCOLOR",  (0,-1), (-1,-1), colors.white),
+            ("FONTNAME",   (5,-1), (5,-1), FONT_BOLD),
+            ("FONTNAME",   (7,-1), (7,-1), FONT_BOLD),
+        ]
+    return TableStyle(cmds)
+
+def paginate_rows(heights, head_h: float, first_avail: float, page_avail: float):
+    """
+    Rozdelí riadky tabuľky (ich výšky) na strany s opakovanou hlavičkou výšky head_h.
+    Pravidlá ako split Table(repeatRows=1): na stranu ide hlavička + aspoň jeden riadok;
+    ak sa na prvú stranu nezmestí ani to, prvá strana ostane bez tabuľky (rozsah (0, 0)).
+    Vráti zoznam (start, stop) pre každú stranu.
+    """
+    pages = []
+    avail = first_avail - head_h
+    full = page_avail - head_h
+    start, used = 0, 0.0
+    for i, h in enumerate(heights):
+        if used + h > avail and (i > start or avail < full):
+            pages.append((start, i))
+            start, used, avail = i, 0.0, full
+        used += h
+    pages.append((start, len(heights)))
+    return pages
+
+def _build_pdf(ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[bytes], theme="blue",
+               chunked: bool = False, out=None):
+    """
+    PDF cez platypus. chunked=True: výšky riadkov sa zmerajú vopred a tabuľka sa pošle ako postupnosť
+    tabuliek po stranách (s hlavičkou) – bez merania a splitovania jednej obrovskej Table.
+    out = súbor (binárny), do ktorého sa PDF zapíše (vráti None); inak vráti bajty.
+    """
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table
+    ctx = pdf_context()
+    styles = ctx.styles
+
+    with _stage("pdf_layout", len(ledger)):
+        texts = list(_pdf_cells(ledger))
+        data = [[Paragraph(h, styles["HdrSmall"]) for h in PDF_HEADERS]]
+        for cells in texts:
+            row = [Paragraph(t, styles["Cell"]) for t in cells[:6]]
+            row += [Paragraph(t, styles["CellRight"]) for t in cells[6:]]
+            data.append(row)
+        run_bal = ledger.closing_balance
+
+        # "Súčet"
+        total_row = [Paragraph("", styles["Cell"]) for _ in range(8)]
+        total_row[5] = Paragraph("<b>Súčet</b>", styles["HdrSmall"])
+        total_row[7] = Paragraph(f"<b>{_fmt_money(run_bal)}</b>", styles["CellRight"])
+        data.append(total_row)
+
+        # Layout
+        buf = BytesIO() if out is None else out
+        doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN,
+                                topMargin=PDF_MARGIN, bottomMargin=PDF_MARGIN)
+
+        # Hlavička PDF
+        header_tbl = _pdf_header_table(styles, hdr_meno, hdr_sap, hdr_ucet, ctx.logo(logo_bytes))
+        story = [header_tbl, Spacer(1, 6)]
+
+        # tabuľka
+        if not chunked:
+            table = Table(data, repeatRows=1, colWidths=PDF_COL_WIDTHS, hAlign="LEFT")
+            table.setStyle(ctx.table_style(theme))
+            story.append(table)
+        else:
+            frame_w = A4[0] - 2*(PDF_MARGIN + _FRAME_PAD)
+            frame_h = A4[1] - 2*(PDF_MARGIN + _FRAME_PAD)
+            _, hdr_h = header_tbl.wrap(frame_w, frame_h)
+            # výšky meria ten istý Paragraph, ktorý sa potom kreslí (ako Table._calc)
+            def row_height(row):
+                return max(p.wrap(w - 2*PDF_CELL_PAD, frame_h)[1]
+                           for p, w in zip(row, PDF_COL_WIDTHS)) + 2*PDF_CELL_PAD
+            head_h = row_height(data[0])
+            heights = [row_height(r) for r in data[1:]]
+            pages = paginate_rows(heights, head_h, frame_h - hdr_h - 6, frame_h)
+            for k, (a, b) in enumerate(pages):
+                if k:
+                    story.append(PageBreak())
+                if a == b:
+                    continue
+                with_total = b == len(heights)
+                chunk = Table([data[0]] + data[1+a:1+b], colWidths=PDF_COL_WIDTHS,
+                              rowHeights=[head_h] + heights[a:b], hAlign="LEFT")
+                chunk.setStyle(ctx.table_style(theme, with_total=with_total))
+                story.append(chunk)
+
+    with _stage("pdf_build", len(ledger)):
+        doc.build(story)
+    return buf.getvalue() if out is None else None
+
+# ---------- PDF: priame kreslenie na canvas ----------
+_WRAP_SPLIT = re.compile(r"[ \t\r\n]+")
+
+def _wrap_text(text: str, font: str, size: float, width: float, string_width):
+    """Zalomenie ako v Paragraph (greedy po slovách); NBSP sa nedelí. string_width = pdfmetrics.stringWidth."""
+    if not text:
+        return []
+    if "\n" not in text and string_width(text, font, size) <= width:
+        return [text]
+    lines, cur = [], ""
+    for word in _WRAP_SPLIT.split(text.strip()):
+        cand = f"{cur} {word}" if cur else word
+        if cur and string_width(cand, font, size) > width:
+            lines.append(cur)
+            cur = word
+        else:
+            cur = cand
+    if cur:
+        lines.append(cur)
+    return lines
+
+_BODY_ALIGNS = [0]*6 + [2]*2
+
+def _layout_cells(texts, font, size, leading, aligns):
+    """Bunky riadku ako (riadky textu, font, veľkosť, leading, zarovnanie 0/1/2) + výška riadku."""
+    string_width = pdf_context().string_width
+    cells = []
+    lines_max = 1
+    for t, w, al in zip(texts, PDF_COL_WIDTHS, aligns):
+        lines = _wrap_text(t, font, size, w - 2*PDF_CELL_PAD, string_width)
+        lines_max = max(lines_max, len(lines))
+        cells.append((lines, font, size, leading, al))
+    return cells, lines_max * leading + 2*PDF_CELL_PAD
+
+def _total_row_layout(total: float, FONT_BOLD):
+    """Riadok „Súčet“: popis ako HdrSmall (9/12, stred), suma ako CellRight tučne (8/10, vpravo)."""
+    texts = ["", "", "", "", "", "Súčet", "", _fmt_money(total)]
+    cells, _ = _layout_cells(texts, FONT_BOLD, 8, 10, [0]*8)
+    cells[5] = _layout_cells(texts[5:6], FONT_BOLD, 9, 12, [1])[0][0]
+    cells[7] = (_wrap_text(texts[7], FONT_BOLD, 8, PDF_COL_WIDTHS[7] - 2*PDF_CELL_PAD, pdf_context().string_width),
+                FONT_BOLD, 8, 10, 2)
+    height = max(len(cells[5][0]) * 12, len(cells[7][0]) * 10) + 2*PDF_CELL_PAD
+    return cells, height
+
+class _CanvasTable:
+    """
+    Tabuľka saldo kreslená priamo na canvas: pevné šírky stĺpcov, riadky sa stránkujú aritmeticky
+    (výška = počet zalomených riadkov × leading + padding), hlavička sa opakuje na každej strane.
+    Vizuálne zodpovedá platypus tabuľke v _build_pdf (VALIGN bottom, zebra, mriežka).
+    """
+
+    def __init__(self, c, x0: float, FONT_REG: str, FONT_BOLD: str, th):
+        from reportlab.lib import colors
+        self.c = c
+        self.x0 = x0
+        self.font_reg = FONT_REG
+        self.font_bold = FONT_BOLD
+        self.header_bg = colors.HexColor(th["header_hex"])
+        self.alt_bg = colors.HexColor(th["alt_row"])
+        self.grid = colors.HexColor(th["grid"])
+        self.black = colors.black
+        xs = [x0]
+        for w in PDF_COL_WIDTHS:
+            xs.append(xs[-1] + w)
+        self.xs = xs
+        self.width = xs[-1] - x0
+        self._bounds = []   # hranice riadkov na aktuálnej strane (y)
+
+    def draw_row(self, y_top: float, cells, height: float, bg=None) -> float:
+        c = self.c
+        y_bot = y_top - height
+        if bg is not None:
+            c.setFillColor(bg)
+            c.rect(self.x0, y_bot, self.width, height, stroke=0, fill=1)
+        c.setFillColor(self.black)
+        cur_font = None
+        for i, (lines, font, size, leading, al) in enumerate(cells):
+            if not lines:
+                continue
+            if (font, size) != cur_font:
+                c.setFont(font, size)
+                cur_font = (font, size)
+            # VALIGN bottom: posledný riadok textu sedí na spodnom paddingu
+            base = y_bot + PDF_CELL_PAD + leading - size + (len(lines)-1)*leading
+            left = self.xs[i] + PDF_CELL_PAD
+            right = self.xs[i+1] - PDF_CELL_PAD
+            for line in lines:
+                if al == 2:
+                    c.drawRightString(right, base, line)
+                elif al == 1:
+                    c.drawCentredString((left + right) / 2, base, line)
+                else:
+                    c.drawString(left, base, line)
+                base -= leading
+        if not self._bounds:
+            self._bounds.append(y_top)
+        self._bounds.append(y_bot)
+        return y_bot
+
+    def close_page(self) -> None:
+        """Mriežka (GRID 0.25) pre riadky nakreslené na aktuálnej strane."""
+        if len(self._bounds) < 2:
+            self._bounds = []
+            return
+        c = self.c
+        c.setStrokeColor(self.grid)
+        c.setLineWidth(0.25)
+        top, bot = self._bounds[0], self._bounds[-1]
+        p = c.beginPath()
+        for y in self._bounds:
+            p.moveTo(self.x0, y); p.lineTo(self.x0 + self.width, y)
+        for x in self.xs:
+            p.moveTo(x, top); p.lineTo(x, bot)
+        c.drawPath(p, stroke=1, fill=0)
+        self._bounds = []
+
+_CANVAS_X0 = PDF_MARGIN + _FRAME_PAD
+_CANVAS_TOP = A4[1] - PDF_MARGIN - _FRAME_PAD
+_CANVAS_BOTTOM = PDF_MARGIN + _FRAME_PAD
+
+def _canvas_header(hdr_meno, hdr_sap, hdr_ucet, logo_bytes: Optional[bytes]):
+    """Hlavička výpisu (prvá strana) a jej výška."""
+    ctx = pdf_context()
+    header_tbl = _pdf_header_table(ctx.styles, hdr_meno, hdr_sap, hdr_ucet, ctx.logo(logo_bytes))
+    _, h = header_tbl.wrap(A4[0] - 2*_CANVAS_X0, _CANVAS_TOP - _CANVAS_BOTTOM)
+    return header_tbl, h
+
+def _canvas_layouts(ledger: Ledger, start: int = 0, stop: Optional[int] = None):
+    """(bunky, výška) pre riadky ledgera [start, stop)."""
+    font = pdf_context().font_reg
+    return [_layout_cells(t, font, 8, 10, _BODY_ALIGNS) for t in _pdf_cells(ledger, start, stop)]
+
+def _canvas_paginate(ledger: Ledger, heights, header_h: float):
+    """Strany tabuľky ako rozsahy riadkov; posledný riadok (index len(ledger)) je „Súčet“."""
+    font_bold = pdf_context().font_bold
+    _, head_h = _layout_cells(PDF_HEADERS, font_bold, 9, 12, [1]*8)
+    heights = list(heights)
+    heights.append(_total_row_layout(ledger.closing_balance, font_bold)[1])
+    frame_h = _CANVAS_TOP - _CANVAS_BOTTOM
+    return paginate_rows(heights, head_h, frame_h - header_h - 6, frame_h)
+
+def _draw_canvas_pages(ledger: Ledger, pages, header_tbl, theme="blue", layouts=None, out=None) -> Optional[bytes]:
+    """
+    Nakreslí strany `pages` (súvislé rozsahy z _canvas_paginate) ako samostatné PDF.
+    header_tbl sa kreslí na začiatok prvej z nich (len pre prvú stranu výpisu);
+    layouts = hotové (bunky, výška) pre riadky od pages[0][0], inak sa vypočítajú tu;
+    out = súbor, do ktorého sa PDF zapíše (vráti None), inak vráti bajty.
+    """
+    from reportlab.pdfgen import canvas
+    ctx = pdf_context()
+    FONT_REG, FONT_BOLD = ctx.font_reg, ctx.font_bold
+    th = THEMES.get(theme, THEMES["blue"])
+    n = len(ledger)
+    base = pages[0][0]
+    if layouts is None:
+        layouts = _canvas_layouts(ledger, base, min(pages[-1][1], n))
+
+    buf = BytesIO() if out is None else out
+    c = canvas.Canvas(buf, pagesize=A4)
+    tbl = _CanvasTable(c, _CANVAS_X0, FONT_REG, FONT_BOLD, th)
+    head_cells, head_h = _layout_cells(PDF_HEADERS, FONT_BOLD, 9, 12, [1]*8)
+
+    y = _CANVAS_TOP
+    if header_tbl is not None:
+        _, h = header_tbl.wrapOn(c, A4[0] - 2*_CANVAS_X0, _CANVAS_TOP - _CANVAS_BOTTOM)
+        header_tbl.drawOn(c, _CANVAS_X0, _CANVAS_TOP - h)
+        y = _CANVAS_TOP - h - 6
+
+    for p, (a, b) in enumerate(pages):
+        if p:
+            c.showPage()
+            y = _CANVAS_TOP
+        if a == b:
+            continue   # hlavička + prvý riadok sa nezmestili – tabuľka začína na ďalšej strane
+        y = tbl.draw_row(y, head_cells, head_h, tbl.header_bg)
+        # zebra začína na každej strane bielym riadkom (ako pri splite Table)
+        for k, i in enumerate(range(a, b)):
+            if i == n:   # "Súčet"
+                cells, rh = _total_row_layout(ledger.closing_balance, FONT_BOLD)
+                y = tbl.draw_row(y, cells, rh, tbl.header_bg)
+            else:
+                cells, rh = layouts[i - base]
+                y = tbl.draw_row(y, cells, rh, tbl.alt_bg if k % 2 else None)
+        tbl.close_page()
+
+    c.showPage()
+    c.save()
+    return buf.getvalue() if out is None else None
+
+def _build_pdf_canvas(ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[bytes], theme="blue",
+                      out=None):
+    """Rýchly PDF engine: rovnaký layout ako _build_pdf, ale tabuľka sa kreslí priamo na canvas."""
+    with _stage("pdf_layout", len(ledger)):
+        header_tbl, header_h = _canvas_header(hdr_meno, hdr_sap, hdr_ucet, logo_bytes)
+        layouts = _canvas_layouts(ledger)
+        pages = _canvas_paginate(ledger, [h for _, h in layouts], header_h)
+    with _stage("pdf_draw", len(ledger)):
+        return _draw_canvas_pages(ledger, pages, header_tbl, theme, layouts, out=out)
+
+# ---------- PDF: paralelné kreslenie po stranách ----------
+PDF_PARALLEL_MIN_ROWS = 2000   # menšie výpisy sa kreslia sériovo (réžia procesov by prevážila)
+
+_pdf_worker = {}   # stav worker procesu – nastaví ho _pdf_worker_init
+
+def _pdf_worker_init(ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, logo_bytes: Optional[bytes], theme) -> None:
+    """Worker dostane ledger (so zostatkom) a hlavičku raz pri štarte."""
+    _pdf_worker.update(ledger=ledger, hdr=(hdr_meno, hdr_sap, hdr_ucet, logo_bytes), theme=theme)
+    pdf_context()
+
+def _pdf_worker_heights(start: int, stop: int):
+    return [h for _, h in _canvas_layouts(_pdf_worker["ledger"], start, stop)]
+
+def _pdf_worker_part(pages, first: bool) -> bytes:
+    w = _pdf_worker
+    header_tbl = _canvas_header(*w["hdr"])[0] if first else None
+    return _draw_canvas_pages(w["ledger"], pages, header_tbl, w["theme"])
+
+def _split_even(items: list, parts: int):
+    """Rozdelí zoznam na najviac `parts` súvislých, približne rovnakých častí."""
+    parts = max(1, min(parts, len(items)))
+    q, r = divmod(len(items), parts)
+    out, a = [], 0
+    for k in range(parts):
+        b = a + q + (k < r)
+        out.append(items[a:b])
+        a = b
+    return out
+
+def _merge_pdfs(parts, out=None) -> Optional[bytes]:
+    """Spojí PDF časti za sebou do jedného dokumentu (do súboru out, inak vráti bajty)."""
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(BytesIO(part)))
+    buf = BytesIO() if out is None else out
+    writer.write(buf)
+    return buf.getvalue() if out is None else None
+
+def _build_pdf_parallel(ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes: Optional[bytes], theme="blue",
+                        workers: Optional[int] = None, out=None) -> Optional[bytes]:
+    """
+    Canvas engine rozložený na procesy (pre výpisy s desiatkami tisíc riadkov):
+      1. workery zmerajú výšky riadkov po blokoch (zostatok je už v ledgeri),
+      2. strany sa rozdelia centrálne (paginate_rows) – čísla strán a hranice sú známe vopred,
+      3. každý worker nakreslí súvislý rozsah strán (s opakovanou hlavičkou tabuľky; prvý aj s hlavičkou výpisu,
+         posledný aj so „Súčet“),
+      4. časti sa spoja do jedného PDF.
+    Výsledok vyzerá rovnako ako pdf_engine="canvas".
+    """
+    workers = workers or os.cpu_count() or 1
+    n = len(ledger)
+    if workers <= 1 or n < PDF_PARALLEL_MIN_ROWS:
+        return _build_pdf_canvas(ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes, theme, out=out)
+
+    _, header_h = _canvas_header(hdr_meno, hdr_sap, hdr_ucet, logo_bytes)
+    with ProcessPoolExecutor(workers, initializer=_pdf_worker_init,
+                             initargs=(ledger, hdr_meno, hdr_sap, hdr_ucet, logo_bytes, theme)) as pool:
+        with _stage("pdf_layout", n):
+            blocks = _split_even(range(n), workers * 4)
+            heights = [h for part in pool.map(_pdf_worker_heights, [r.start for r in blocks], [r.stop for r in blocks])
+                       for h in part]
+            pages = _canvas_paginate(ledger, heights, header_h)
+        with _stage("pdf_draw", n):
+            groups = _split_even(pages, workers)
+            parts = list(pool.map(_pdf_worker_part, groups, [k == 0 for k in range(len(groups))]))
+    with _stage("pdf_merge", n):
+        return _merge_pdfs(parts, out=out)
+
+PDF_ENGINES = ("platypus", "chunked", "canvas", "parallel")
+
+# ---------- PDF kontext (teplý, zdieľaný v procese) ----------
+LOGO_PDF_SIZE = 60          # strana loga v PDF (pt)
+LOGO_PDF_SCALE = 4          # rozlíšenie zmenšeného loga = LOGO_PDF_SIZE * LOGO_PDF_SCALE px
+LOGO_CACHE_SIZE = 8
+
+class PdfContext:
+    """
+    Všetko, čo PDF potrebuje a nezávisí od dát: registrované fonty, štýly odsekov,
+    TableStyle pre každú tému a dekódované/zmenšené logá (cache podľa hashu obsahu).
+    Vytvára sa raz na proces (pdf_context / warm_pdf_context).
+    """
+    __slots__ = ("font_reg", "font_bold", "styles", "string_width", "_table_styles", "_logos", "_lock")
+
+    def __init__(self):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        self.font_reg, self.font_bold = _register_fonts()
+        self.string_width = stringWidth
+        self.styles = _pdf_styles(self.font_reg, self.font_bold)
+        self._table_styles = {}
+        self._logos: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def table_style(self, theme: str, with_total: bool = True):
+        theme = theme if theme in THEMES else "blue"
+        key = (theme, with_total)
+        ts = self._table_styles.get(key)
+        if ts is None:
+            ts = self._table_styles[key] = _pdf_table_style(THEMES[theme], self.font_bold, with_total=with_total)
+        return ts
+
+    def logo(self, logo_bytes: Optional[bytes]) -> Optional[bytes]:
+        """Logo zmenšené na veľkosť v PDF (PNG bytes); nedekódovateľné logo sa vráti bez zmeny."""
+        if not logo_bytes:
+            return None
+        key = _content_key(logo_bytes)
+        with self._lock:
+            if key in self._logos:
+                self._logos.move_to_end(key)
+                return self._logos[key]
+        small = _shrink_logo(logo_bytes, LOGO_PDF_SIZE * LOGO_PDF_SCALE)
+        with self._lock:
+            self._logos[key] = small
+            while len(self._logos) > LOGO_CACHE_SIZE:
+                self._logos.popitem(last=False)
+        return small
+
+    def warm(self, logo_bytes: Optional[bytes] = None) -> "PdfContext":
+        for theme in THEMES:
+            self.table_style(theme, True); self.table_style(theme, False)
+        self.logo(logo_bytes)
+        return self
+
+def _shrink_logo(logo_bytes: bytes, px: int) -> bytes:
+    try:
+        from PIL import Image as PILImage
+        img = PILImage.open(BytesIO(logo_bytes))
+        img.load()
+        if max(img.size) <= px:
+            return logo_bytes
+        img.thumbnail((px, px), PILImage.LANCZOS)
+        out = BytesIO()
+        img.save(out, format="PNG", optimize=True)
+        return out.getvalue()
+    except Exception:
+        return logo_bytes
+
+_pdf_ctx: Optional[PdfContext] = None
+_pdf_ctx_lock = threading.Lock()
 
-    story.append(table)
-    doc.build(story)
-    buf.seek(0)
-    return buf.read()
+def pdf_context() -> PdfContext:
+    """Procesový PDF kontext (vytvorí sa pri prvom použití)."""
+    global _pdf_ctx
+    if _pdf_ctx is None:
+        with _pdf_ctx_lock:
+            if _pdf_ctx is None:
+                _pdf_ctx = PdfContext()
+    return _pdf_ctx
+
+def warm_pdf_context(logo_bytes: Optional[bytes] = None) -> PdfContext:
+    """Predhreje PDF kontext pri štarte (fonty, štýly, TableStyle všetkých tém, logo)."""
+    return pdf_context().warm(logo_bytes)
+
+# ---------- príprava (jeden prechod) ----------
+# Fázy generovania (pre priebeh v UI): parsovanie vstupov s mapovaním typov, väzby (src2), zostatok, výstupy
+STAGES = ("parse", "map", "balance", "xlsx", "pdf")
+
+def _prepare_ledger(template_bytes: bytes, helper_bytes: bytes, src1_bytes: bytes, src2_bytes: Optional[bytes],
+                    progress: Optional[Callable[[str], None]] = None, base: Optional[SaldoSnapshot] = None,
+                    csv_format: Optional[CsvFormat] = None, ref_store: Optional[RefStore] = None):
+    """
+    Načíta vstupy, namapuje typy, doplní faktúry a zostatok. Vráti (tpl, ledger); progress(fáza) pri každej fáze.
+    S base (prírastok) sa berú len pohyby za base.last_doc a zostatok pokračuje od base.closing_balance.
+    S ref_store sa väzby berú z úložiska (src2 sa do neho najprv pridá, ak je zadané).
+    """
+    progress = progress or _no_progress
+    # --- TEMPLATE + HELPER (pomôcka) – skompilované, z cache ---
+    progress("parse")
+    with _stage("template"):
+        tpl = compile_template(template_bytes)
+    with _stage("helper") as st:
+        pom_map = compile_helper(helper_bytes).pom_map
+        st.rows = len(pom_map)
+
+    # --- SRC1 (pohyby) + mapovanie typu ---
+    with _stage("src1") as st:
+        moves = _read_src1(src1_bytes, pom_map, csv_format)
+        if base is not None:
+            moves = _moves_after(moves, base.last_doc)
+        st.rows = len(moves)
+
+    # --- SRC2 (väzby) – „Číslo faktúry“ z „Doplnková referencia“ ---
+    progress("map")
+    with _stage("src2") as st:
+        ref_map = _resolve_refs(moves, src2_bytes, csv_format, ref_store)
+        st.rows = len(ref_map)
+
+    progress("balance")
+    with _stage("balance") as st:
+        ledger = _build_ledger(moves, ref_map, base.closing_balance if base else 0.0)
+        st.rows = len(ledger)
+    return tpl, ledger
+
+def _no_progress(stage: str) -> None:
+    pass
+
+def prepare_saldo(template_bytes: bytes, helper_bytes: bytes, src1_bytes: bytes, src2_bytes: Optional[bytes],
+                  progress: Optional[Callable[[str], None]] = None,
+                  stats: Optional[SaldoStats] = None,
+                  csv_format: Optional[CsvFormat] = None,
+                  ref_store: Optional[RefStore] = None) -> Tuple[CompiledTemplate, Ledger]:
+    """
+    Verejná príprava (parsovanie + mapovanie + zostatok) bez výstupov – výsledok sa dá cachovať
+    a výstupy (iná téma, hlavička) potom vyrobiť cez render_account bez opätovného parsovania.
+    progress(fáza) sa volá na začiatku fáz "parse", "map" a "balance"; stats = voliteľné meranie (SaldoStats).
+    src1/src2 môžu byť XLSX, CSV (voľby v csv_format) alebo Parquet; s ref_store=RefStore(...) je src2 nepovinné.
+    """
+    with _measure(stats):
+        return _prepare_ledger(template_bytes, helper_bytes, src1_bytes, src2_bytes, progress, csv_format=csv_format,
+                               ref_store=ref_store)
+
+# ---------- XLSX výstup ----------
+# Zostatok v XLSX: "formula" = reťaz =H{r-1}+G{r} (Excel prepočíta pri otvorení),
+# "value" = hodnoty z ledgera, "both" = vzorce s uloženými (cached) hodnotami.
+BALANCE_MODES = ("formula", "value", "both")
+
+def _balance_value(mode: str, r: int, bal: float, L_G: str, L_H: str, opening: float = 0.0):
+    if mode == "value":
+        return bal
+    if r == HEADER_ROW+1:
+        return f"={opening!r}+{L_G}{r}" if opening else f"={L_G}{r}"
+    return f"={L_H}{r-1}+{L_G}{r}"
+
+def _set_calc_on_load(wb, mode: str) -> None:
+    # pri hodnotách (aj cached) nie je dôvod nútiť Excel prepočítať celý hárok pri otvorení
+    if mode != "formula" and wb.calculation is not None:
+        wb.calculation.fullCalcOnLoad = False
+
+_SHEET_XML = re.compile(r"xl/worksheets/sheet\d+\.xml")
+
+def _cache_balance_values(xlsx, ledger: Optional[Ledger], c_bal: int, out=None,
+                          sheets: Optional[Dict[str, Ledger]] = None) -> Optional[bytes]:
+    """
+    Doplní do vzorcov v stĺpci Zostatok uložené hodnoty (<v>) z ledgera – čítačky s data_only ich uvidia.
+    xlsx = bajty alebo súbor; výsledok ide do súboru out (vráti None), inak vráti bajty.
+    sheets = {súbor hárku v ZIPe: ledger} pre viac hárkov, inak sa ledger použije pre prvý hárok.
+    """
+    col = re.escape(get_column_letter(c_bal))
+    cell_re = re.compile(rb'(<c r="' + col.encode() + rb'(\d+)"[^>]*>)(<f>[^<]*</f>)<v\s*/>(</c>)')
+    def filler(bal):
+        def fill(m):
+            i = int(m.group(2)) - (HEADER_ROW+1)
+            if not 0 <= i < len(bal):
+                return m.group(0)
+            return m.group(1) + m.group(3) + b"<v>" + repr(bal[i]).encode() + b"</v>" + m.group(4)
+        return fill
+
+    buf = BytesIO() if out is None else out
+    src = BytesIO(xlsx) if isinstance(xlsx, bytes) else xlsx
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zout:
+        if sheets is None:
+            sheet = min((n for n in zin.namelist() if _SHEET_XML.fullmatch(n)), default=None)
+            sheets = {sheet: ledger}
+        for info in zin.infolist():
+            target = sheets.get(info.filename)
+            if target is not None:
+                zout.writestr(info, cell_re.sub(filler(target.bal), zin.read(info.filename)))
+            else:
+                with zin.open(info) as fi, zout.open(info, "w") as fo:
+                    shutil.copyfileobj(fi, fo, STREAM_CHUNK)
+    return buf.getvalue() if out is None else None
+
+def _write_xlsx_template(
+    tpl: CompiledTemplate,
+    template_bytes: bytes,
+    ledger: Ledger,
+    hdr_meno: str,
+    hdr_sap: str,
+    hdr_ucet: str,
+    hdr_spol: str,
+    theme: str,
+    logo_bytes: Optional[bytes],
+    balance_mode: str = "formula",
+):
+    """Vyplní načítaný TEMPLATE dátami z ledgera. Vráti workbook."""
+    c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal = (tpl.cols[k] for k in TEMPLATE_COLS)
+
+    with _stage("xlsx_load"):
+        wb = load_workbook(BytesIO(template_bytes), data_only=False)
+        ws = wb[wb.sheetnames[0]]
+
+        # Premenuj hlavičku „Dátum zadania“ -> nový text (ak je to práve tento stĺpec)
+        if tpl.rename_dz:
+            hdr_cell = ws.cell(row=HEADER_ROW, column=c_dz)
+            hdr_cell.value = "Dátum vystavenia / Pripísania platby"
+            hdr_cell.alignment = tpl.styles["head_align"]
+
+        # vyčisti dáta v šablóne (ponechaj hlavičku)
+        if ws.max_row > HEADER_ROW:
+            ws.delete_rows(HEADER_ROW+1, ws.max_row-HEADER_ROW)
+
+    # --- dáta + Zostatok; dátumy a sumy dostanú pomenovaný štýl (kópia StyleArray) ---
+    # Štýl na bunke musí ostať aj popri štýle stĺpca: zapísaná <c> bez „s“ má v Exceli xf 0,
+    # štýl <col> platí len pre bunky, ktoré v sheetData nie sú (riadky dopísané neskôr).
+    # Kópia, lebo bunka bežného hárka mení svoje StyleArray na mieste (cell.font = ...).
+    with _stage("xlsx_write", len(ledger)):
+        named = _xlsx_named_styles(wb, tpl.styles)
+        date_st, money_st = named["date"], named["money"]
+        L_G = get_column_letter(c_amt); L_H = get_column_letter(c_bal)
+        r = HEADER_ROW
+        for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows():
+            r += 1
+            ws.cell(row=r, column=c_doc, value=doc)
+            ws.cell(row=r, column=c_inv, value=inv)
+            ws.cell(row=r, column=c_dz,  value=dz)._style = copy(date_st)
+            ws.cell(row=r, column=c_du,  value=du)._style = copy(date_st)
+            ws.cell(row=r, column=c_sn,  value=sn)._style = copy(date_st)
+            ws.cell(row=r, column=c_typ, value=typ)
+            ws.cell(row=r, column=c_amt, value=amt)._style = copy(money_st)
+            ws.cell(row=r, column=c_bal, value=_balance_value(balance_mode, r, bal, L_G, L_H,
+                                                              ledger.opening))._style = copy(money_st)
+        last = r
+        _set_calc_on_load(wb, balance_mode)
+
+    # --- horná hlavička pre XLSX + logo + štýl
+    with _stage("xlsx_style", len(ledger)):
+        ws["B1"] = hdr_sap; ws["B2"] = hdr_meno; ws["B3"] = hdr_spol; ws["B4"] = hdr_ucet
+        _insert_logo_xlsx(ws, logo_bytes)
+        _style_ws(ws, c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal, last, theme=theme, styles=tpl.styles,
+                  named=named)
+    return wb
+
+def _write_xlsx_stream(
+    tpl: CompiledTemplate,
+    ledger: Ledger,
+    hdr_meno: str,
+    hdr_sap: str,
+    hdr_ucet: str,
+    hdr_spol: str,
+    theme: str,
+    logo_bytes: Optional[bytes],
+    balance_mode: str = "formula",
+):
+    """
+    Write-only XLSX pre veľké výpisy: hlavička sa skopíruje z kompilovaného TEMPLATE raz,
+    dátové riadky sa streamujú so zdieľanými (vopred pripravenými) štýlmi – pamäť nerastie s počtom riadkov.
+    Vráti workbook (write_only), ktorý sa dá uložiť práve raz.
+    """
+    wb = Workbook(write_only=True)
+    named = _xlsx_named_styles(wb, tpl.styles)
+    _stream_sheet(wb.create_sheet(tpl.sheet_title), tpl, named, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol,
+                  logo_bytes, balance_mode)
+    _set_calc_on_load(wb, balance_mode)
+    return wb
+
+def _stream_sheet(ws, tpl: CompiledTemplate, named, ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol,
+                  logo_bytes: Optional[bytes], balance_mode: str) -> None:
+    """Naplní jeden write-only hárok výpisu (hlavička z TEMPLATE + riadky ledgera); named = štýly workbooku."""
+    c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal = (tpl.cols[k] for k in TEMPLATE_COLS)
+    st = tpl.styles
+    ncols = tpl.max_column
+
+    # rozmery a formáty stĺpcov musia byť nastavené pred prvým append
+    for letter, w in tpl.column_widths.items():
+        ws.column_dimensions[letter].width = w
+    for key, w in XLSX_WIDTHS.items():
+        ws.column_dimensions[get_column_letter(tpl.cols[key])].width = w
+    _xlsx_column_formats(ws, tpl.cols, named)
+    for r, h in tpl.row_heights.items():
+        ws.row_dimensions[r].height = h
+
+    # --- hlavička (riadky 1..HEADER_ROW) z kompilovaného TEMPLATE
+    values = {(1, 2): hdr_sap, (2, 2): hdr_meno, (3, 2): hdr_spol, (4, 2): hdr_ucet}
+    if tpl.rename_dz:
+        values[(HEADER_ROW, c_dz)] = "Dátum vystavenia / Pripísania platby"
+    block = {}
+    for r, c, v, font, fill, border, alignment, number_format in tpl.header_cells:
+        block[(r, c)] = (values.get((r, c), v), font, fill, border, alignment, number_format)
+    for (r, c), v in values.items():
+        block.setdefault((r, c), (v, None, None, None, None, None))
+    for r in range(1, HEADER_ROW):
+        width = max([c for (rr, c) in block if rr == r] or [0])
+        cells = []
+        for c in range(1, width+1):
+            v, font, fill, border, alignment, number_format = block.get((r, c), (None,)*6)
+            cell = WriteOnlyCell(ws, value=v)
+            if font is not None:
+                cell.font = font; cell.fill = fill; cell.border = border; cell.alignment = alignment
+            if number_format:
+                cell.number_format = number_format
+            cells.append(cell)
+        ws.append(cells)
+    # riadok hlavičky tabuľky – pomenovaný štýl ako v _style_ws
+    head = []
+    for c in range(1, ncols+1):
+        cell = WriteOnlyCell(ws, value=block.get((HEADER_ROW, c), (None,))[0])
+        cell._style = copy(named["head"])
+        head.append(cell)
+    ws.append(head)
+
+    # --- štýly dátových buniek podľa stĺpca (dátum / suma / bez štýlu); zebra je podmienené formátovanie
+    row_styles = [None] * ncols
+    for key, name in XLSX_COL_STYLES.items():
+        row_styles[tpl.cols[key]-1] = named[name]
+
+    # --- dátové riadky (stream)
+    L_G = get_column_letter(c_amt); L_H = get_column_letter(c_bal)
+    slots = (c_doc-1, c_inv-1, c_dz-1, c_du-1, c_sn-1, c_typ-1, c_amt-1)
+    r = HEADER_ROW
+    for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows():
+        r += 1
+        vals = [None] * ncols
+        for i, v in zip(slots, (doc, inv, dz, du, sn, typ, amt)):
+            vals[i] = v
+        vals[c_bal-1] = _balance_value(balance_mode, r, bal, L_G, L_H, ledger.opening)
+        cells = []
+        for v, style in zip(vals, row_styles):
+            if style is None:
+                cells.append(v)
+            else:
+                cell = WriteOnlyCell(ws, value=v)
+                cell._style = style
+                cells.append(cell)
+        ws.append(cells)
+
+    if tpl.auto_filter:
+        ws.auto_filter.ref = f"A{HEADER_ROW}:{get_column_letter(ncols)}{max(r, HEADER_ROW)}"
+    _xlsx_zebra(ws, ncols, r, st)
+    _insert_logo_xlsx(ws, logo_bytes)
+
+XLSX_ENGINES = ("template", "stream")
+
+# ---------- cache výstupov na disku (voliteľná) ----------
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_RESULT_NAME = re.compile(r"[0-9a-f]{64}\.\w+$")
+_STALE_PART_S = 3600            # .part po páde zapisujúceho procesu sa pri upratovaní zmaže
+
+_code_version_value: Optional[str] = None
+
+def code_version() -> str:
+    """Verzia kódu pre kľúče cache: SHA-256 tohto modulu + verzie openpyxl a reportlab."""
+    global _code_version_value
+    if _code_version_value is None:
+        import openpyxl
+        from importlib.metadata import PackageNotFoundError, version
+        try:
+            rl = version("reportlab")
+        except PackageNotFoundError:
+            rl = "?"
+        with open(__file__, "rb") as f:
+            src = f.read()
+        _code_version_value = f"{_content_key(src)[:16]}/openpyxl {openpyxl.__version__}/reportlab {rl}"
+    return _code_version_value
+
+def result_key(inputs: Sequence[Optional[bytes]], params: dict, ext: str) -> str:
+    """Názov položky cache: SHA-256 verzie kódu, všetkých vstupných bajtov a parametrov + '.ext'."""
+    h = hashlib.sha256(code_version().encode())
+    for data in inputs:
+        # dĺžka pred obsahom – hranice medzi vstupmi sú jednoznačné, None != b""
+        h.update(b"-" if data is None else len(data).to_bytes(8, "big"))
+        h.update(data or b"")
+    h.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=repr).encode())
+    return f"{h.hexdigest()}.{ext}"
+
+class ResultCache:
+    """
+    Hotové výstupy na disku, adresované obsahom (kľúč z result_key):
+      - zápis cez dočasný súbor + os.replace – čitateľ nikdy nevidí polovičný výstup,
+      - LRU podľa mtime (hit ho obnoví); po zápise sa najstaršie mažú, kým je súčet > max_bytes,
+      - adresár môže zdieľať viac procesov (zmiznutý súbor = miss), počítadlá sú za tento objekt.
+    """
+
+    def __init__(self, path: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        if max_bytes < 0:
+            raise ValueError("max_bytes nesmie byť záporné.")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _file(self, name: str) -> str:
+        if not _RESULT_NAME.match(name):
+            raise ValueError(f"Neplatný kľúč cache: {name}")
+        return os.path.join(self.path, name)
+
+    def _count(self, what: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[what] += n
+
+    def open(self, name: str):
+        """Otvorená položka (binárny súbor na čítanie) alebo None pri miss; volajúci ju zatvorí."""
+        p = self._file(name)
+        try:
+            f = open(p, "rb")
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        with suppress(FileNotFoundError):
+            os.utime(p)                 # LRU: čas posledného použitia
+        self._count("hits")
+        return f
+
+    def get(self, name: str) -> Optional[bytes]:
+        f = self.open(name)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put(self, name: str, data: bytes) -> None:
+        if len(data) <= self.max_bytes:
+            self.put_file(name, BytesIO(data))
+
+    def put_file(self, name: str, src) -> None:
+        """Uloží obsah súboru src (od aktuálnej pozície) po blokoch; väčší ako max_bytes sa neuloží."""
+        p = self._file(name)
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=name + ".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(src, f, STREAM_CHUNK)
+                size = f.tell()
+            if size > self.max_bytes:
+                os.remove(tmp)
+                return
+            os.replace(tmp, p)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+        self._count("writes")
+        self._evict()
+
+    def _entries(self):
+        """(mtime, veľkosť, cesta) všetkých položiek; staré .part súbory zmaže."""
+        now = time.time()
+        out = []
+        with os.scandir(self.path) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                if _RESULT_NAME.match(e.name):
+                    out.append((st.st_mtime, st.st_size, e.path))
+                elif e.name.endswith(".part") and now - st.st_mtime > _STALE_PART_S:
+                    with suppress(FileNotFoundError):
+                        os.remove(e.path)
+        return out
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for _, size, path in sorted(entries):
+            with suppress(FileNotFoundError):
+                os.remove(path)
+                removed += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._count("evictions", removed)
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+    def info(self) -> Dict[str, int]:
+        entries = self._entries()
+        with self._lock:
+            return {**self._stats, "entries": len(entries), "bytes": sum(size for _, size, _ in entries),
+                    "max_bytes": self.max_bytes}
 
 # ---------- public API ----------
+OUTPUTS = ("xlsx", "pdf")
+
+def generate_saldo_bundle(
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    hdr_meno: str,
+    hdr_sap: str,
+    hdr_ucet: str,
+    hdr_spol: str = "SWAN a.s.",
+    theme: Literal["blue","gray","warm"] = "blue",
+    logo_bytes: Optional[bytes] = None,
+    outputs: Sequence[Literal["xlsx","pdf"]] = OUTPUTS,
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    stats: Optional[SaldoStats] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+) -> Dict[str, bytes]:
+    """
+    Vygeneruje viac výstupov z jedného prechodu vstupmi:
+      - template, pomôcka, src1 a src2 sa načítajú a spracujú iba raz,
+      - vráti dict {"xlsx": bytes, "pdf": bytes} len s požadovanými výstupmi,
+      - xlsx_engine="stream" zapisuje XLSX v write-only režime (pre veľké výpisy),
+      - balance_mode určuje 'Zostatok' v XLSX: vzorce, hodnoty alebo vzorce s uloženými hodnotami,
+      - pdf_engine="chunked" posiela tabuľku po stranách (lineárny čas), "canvas" ju kreslí priamo na canvas,
+        "parallel" kreslí canvas po rozsahoch strán v pdf_workers procesoch (predvolene počet jadier),
+      - stats=SaldoStats(...) zapne meranie fáz (čas, CPU, pamäť, riadky; voliteľne cProfile/tracemalloc),
+      - src1/src2 môžu byť XLSX, CSV alebo Parquet (zistí sa z obsahu); CSV voľby v csv_format=CsvFormat(...),
+      - ref_store=RefStore(...) berie väzby z úložiska (src2 sa doň pridá, ak je zadané, inak je nepovinné).
+    """
+    outputs = _check_options(outputs, xlsx_engine, balance_mode, pdf_engine)
+    with _measure(stats):
+        tpl, ledger = _prepare_ledger(template_bytes, helper_bytes, src1_bytes, src2_bytes, csv_format=csv_format,
+                                      ref_store=ref_store)
+        return _render_outputs(tpl, template_bytes, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes,
+                               outputs, xlsx_engine, balance_mode, pdf_engine, pdf_workers)
+
+def _check_options(outputs, xlsx_engine, balance_mode, pdf_engine) -> Tuple[str, ...]:
+    """Overí voľby generovania (ValueError pri neznámej hodnote); vráti výstupy bez duplicít."""
+    outputs = tuple(dict.fromkeys(outputs))
+    unknown = [o for o in outputs if o not in OUTPUTS]
+    if unknown:
+        raise ValueError(f"Neznámy výstup: {', '.join(map(str, unknown))} (povolené: {', '.join(OUTPUTS)})")
+    if xlsx_engine not in XLSX_ENGINES:
+        raise ValueError(f"Neznámy xlsx_engine: {xlsx_engine} (povolené: {', '.join(XLSX_ENGINES)})")
+    if balance_mode not in BALANCE_MODES:
+        raise ValueError(f"Neznámy balance_mode: {balance_mode} (povolené: {', '.join(BALANCE_MODES)})")
+    if pdf_engine not in PDF_ENGINES:
+        raise ValueError(f"Neznámy pdf_engine: {pdf_engine} (povolené: {', '.join(PDF_ENGINES)})")
+    return outputs
+
+def _render_output(out, tpl: CompiledTemplate, template_bytes: bytes, ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet,
+                   hdr_spol, theme, logo_bytes, output, xlsx_engine, balance_mode, pdf_engine, pdf_workers=None) -> None:
+    """Z hotového ledgera zapíše jeden výstup do binárneho súboru out (voľby už overené cez _check_options)."""
+    if output == "pdf":
+        if pdf_engine == "canvas":
+            _build_pdf_canvas(ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes=logo_bytes, theme=theme, out=out)
+        elif pdf_engine == "parallel":
+            _build_pdf_parallel(ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes=logo_bytes,
+                                theme=theme, workers=pdf_workers, out=out)
+        else:
+            _build_pdf(ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes=logo_bytes, theme=theme,
+                       chunked=pdf_engine == "chunked", out=out)
+        return
+    if xlsx_engine == "stream":
+        with _stage("xlsx_write", len(ledger)):
+            wb = _write_xlsx_stream(tpl, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes,
+                                    balance_mode=balance_mode)
+    else:
+        wb = _write_xlsx_template(tpl, template_bytes, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes,
+                                  balance_mode=balance_mode)
+    with _stage("xlsx_save", len(ledger)):
+        if balance_mode != "both":
+            wb.save(out)
+            return
+        # uložené hodnoty zostatku sa dopĺňajú prepisom ZIPu – medzivýsledok ide do spoolu, nie celý do pamäte
+        with tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES) as tmp:
+            wb.save(tmp)
+            tmp.seek(0)
+            _cache_balance_values(tmp, ledger, tpl.cols["bal"], out=out)
+
+def _render_outputs(tpl: CompiledTemplate, template_bytes: bytes, ledger: Ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol,
+                    theme, logo_bytes, outputs, xlsx_engine, balance_mode, pdf_engine, pdf_workers=None) -> Dict[str, bytes]:
+    """Z hotového ledgera vyrobí požadované výstupy ako bajty (voľby už overené cez _check_options)."""
+    result: Dict[str, bytes] = {}
+    for o in outputs:
+        buf = BytesIO()
+        _render_output(buf, tpl, template_bytes, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes, o,
+                       xlsx_engine, balance_mode, pdf_engine, pdf_workers)
+        result[o] = buf.getvalue()   # bez seek+read – druhá kópia výstupu v pamäti nevznikne
+    return result
+
+_DOCUMENT_DEFAULTS = dict(hdr_spol="SWAN a.s.", theme="blue", xlsx_engine="template", balance_mode="formula",
+                          pdf_engine="platypus", csv_format=None)
+
+def document_key(template_bytes: bytes, helper_bytes: bytes, src1_bytes: bytes, src2_bytes: Optional[bytes],
+                 logo_bytes: Optional[bytes] = None, output: str = "xlsx", **opts) -> str:
+    """
+    Kľúč ResultCache pre generate_saldo_document s rovnakými argumentmi (napr. overenie cache pred zaradením úlohy);
+    pdf_workers a stats menia len priebeh, nie výstup, preto sa ignorujú. PDF má v hlavičke dátum generovania,
+    preto je v kľúči aj dnešný dátum (včerajšie PDF sa nepoužije).
+    """
+    opts.pop("pdf_workers", None)
+    opts.pop("stats", None)
+    store = opts.pop("ref_store", None)
+    if store is not None:
+        # výsledok závisí od obsahu úložiska väzieb – jeho súbor a revízia sú súčasťou kľúča
+        opts["ref_store"] = (os.path.abspath(store.path), store.revision)
+    if opts.get("csv_format") == CsvFormat():
+        opts["csv_format"] = None       # prázdne voľby = autodetekcia, rovnaký výstup
+    output = "pdf" if output == "pdf" else "xlsx"
+    if output == "pdf":
+        opts["generated"] = _dt.date.today().isoformat()
+    return result_key((template_bytes, helper_bytes, src1_bytes, src2_bytes, logo_bytes),
+                      {**_DOCUMENT_DEFAULTS, **opts}, output)
+
 def generate_saldo_document(
     template_bytes: bytes,
     helper_bytes: bytes,
     src1_bytes: bytes,
-    src2_bytes: bytes,
+    src2_bytes: Optional[bytes],
     hdr_meno: str,
     hdr_sap: str,
     hdr_ucet: str,
@@ -282,6 +1997,14 @@ def generate_saldo_document(
     theme: Literal["blue","gray","warm"] = "blue",
     logo_bytes: Optional[bytes] = None,
     output: Literal["xlsx","pdf"] = "xlsx",
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    stats: Optional[SaldoStats] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+    cache: Optional[ResultCache] = None,
 ) -> bytes:
     """
     Vygeneruje XLSX alebo PDF:
@@ -289,159 +2012,649 @@ def generate_saldo_document(
       - doplní 'Číslo faktúry' z 'Doplnková referencia' (src2),
       - vypočíta bežiaci 'Zostatok',
       - vloží hlavičku B1..B4 a voliteľne logo,
-      - pre PDF použije firemnú tabuľku a témy.
+      - pre PDF použije firemnú tabuľku a témy,
+      - src1/src2 prijme ako XLSX, CSV (csv_format) alebo Parquet; s ref_store je src2 nepovinné,
+      - s cache=ResultCache(...) vráti rovnakú požiadavku (vstupy, hlavička, voľby, verzia kódu) z disku.
+    Oba výstupy naraz (jedno parsovanie) vráti generate_saldo_bundle.
     """
-    # --- TEMPLATE ---
-    wb = load_workbook(BytesIO(template_bytes), data_only=False)
-    ws = wb[wb.sheetnames[0]]
-    headers = [ws.cell(row=HEADER_ROW, column=c).value for c in range(1, ws.max_column+1)]
-
-    c_doc = _find_col(headers, "Číslo dokladu")
-    c_inv = _find_col(headers, "číslo Faktúry") or _find_col(headers, "Číslo Faktúry")
-    # akceptuj viac variantov (s/bez medzery a s/bez zalomenia)
-    c_dz  = (_find_col(headers, "Dátum vystavenia / Pripísania platby")
-             or _find_col(headers, "Dátum vystavenia/Pripísania platby")
-             or _find_col(headers, "Dátum vystavenia /\nPripísania platby")
-             or _find_col(headers, "Dátum zadania"))
-    c_du  = _find_col(headers, "Dátum účtovania")
-    c_sn  = _find_col(headers, "Splatnosť netto")
-    c_typ = _find_col(headers, "Typ dokladu")
-    c_amt = _find_col(headers, "Čiastka")
-    c_bal = _find_col(headers, "Zostatok")
-
-    if None in (c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal):
-        # Diagnostická správa, aby bolo hneď jasné, čo chýba
-        missing = []
-        if c_doc is None: missing.append("Číslo dokladu")
-        if c_inv is None: missing.append("Číslo Faktúry/číslo Faktúry")
-        if c_dz  is None: missing.append("Dátum vystavenia / Pripísania platby / Dátum zadania")
-        if c_du  is None: missing.append("Dátum účtovania")
-        if c_sn  is None: missing.append("Splatnosť netto")
-        if c_typ is None: missing.append("Typ dokladu")
-        if c_amt is None: missing.append("Čiastka")
-        if c_bal is None: missing.append("Zostatok")
-        raise RuntimeError(f"V TEMPLATE chýba niektorý povinný stĺpec. Chýbajú: {', '.join(missing)}")
+    output = "pdf" if output == "pdf" else "xlsx"
+    key = None
+    if cache is not None:
+        if ref_store is not None and src2_bytes:
+            ref_store.ingest(src2_bytes, csv_format)   # kľúč s revíziou po pridaní väzieb
+        key = document_key(template_bytes, helper_bytes, src1_bytes, src2_bytes, logo_bytes, output=output,
+                           hdr_meno=hdr_meno, hdr_sap=hdr_sap, hdr_ucet=hdr_ucet, hdr_spol=hdr_spol, theme=theme,
+                           xlsx_engine=xlsx_engine, balance_mode=balance_mode, pdf_engine=pdf_engine,
+                           csv_format=csv_format, ref_store=ref_store)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    data = generate_saldo_bundle(
+        template_bytes, helper_bytes, src1_bytes, src2_bytes,
+        hdr_meno=hdr_meno, hdr_sap=hdr_sap, hdr_ucet=hdr_ucet, hdr_spol=hdr_spol,
+        theme=theme, logo_bytes=logo_bytes, outputs=(output,), xlsx_engine=xlsx_engine,
+        balance_mode=balance_mode, pdf_engine=pdf_engine, pdf_workers=pdf_workers, stats=stats, csv_format=csv_format,
+        ref_store=ref_store,
+    )[output]
+    if key is not None:
+        cache.put(key, data)
+    return data
 
-    # Premenuj hlavičku „Dátum zadania“ -> nový text (ak je to práve tento stĺpec)
-    hdr_cell = ws.cell(row=HEADER_ROW, column=c_dz)
-    if _norm(hdr_cell.value) in (_norm("Dátum zadania"),
-                                 _norm("Dátum vystavenia/Pripísania platby"),
-                                 _norm("Dátum vystavenia / Pripísania platby")):
-        hdr_cell.value = "Dátum vystavenia / Pripísania platby"
-        hdr_cell.alignment = Alignment(vertical="center", horizontal="center", wrap_text=True)
+# ---------- výstup do súboru / spoolu / po blokoch (ohraničená pamäť) ----------
+SPOOL_MAX_BYTES = 8 * 1024 * 1024   # SpooledTemporaryFile: väčší výstup sa presunie do dočasného súboru
+STREAM_CHUNK = 64 * 1024
 
-    # --- HELPER (pomôcka) ---
-    wb_h = load_workbook(BytesIO(helper_bytes), data_only=True); ws_h = wb_h[wb_h.sheetnames[0]]
-    hdr_h = [ws_h.cell(row=1, column=c).value for c in range(1, ws_h.max_column+1)]
-    def idx_h(name):
-        for i,h in enumerate(hdr_h, start=1):
-            if isinstance(h,str) and h.strip()==name:
-                return i
-        return None
-    h_src = idx_h("Označenie pôvodu"); h_dst = idx_h("Typ dokladu")
-    if not h_src or not h_dst:
-        raise RuntimeError("V pomôcke chýba 'Označenie pôvodu' alebo 'Typ dokladu'.")
+@contextmanager
+def atomic_output(dest):
+    """
+    Binárny súbor pre zápis do cesty dest: dočasný súbor vedľa nej (mkstemp – súbežní zapisovatelia
+    do rovnakého dest si ho neprepíšu), po úspechu os.replace, pri chybe sa zmaže.
+    """
+    dest = os.fspath(dest)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest) or ".", prefix=os.path.basename(dest) + ".", suffix=".part")
+    try:
+        os.chmod(tmp, 0o644)   # mkstemp vytvára 0600 – výstup má byť čitateľný ako pri open()
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp, dest)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
 
-    pom_map = {}
-    for r in range(2, ws_h.max_row+1):
-        s = ws_h.cell(row=r, column=h_src).value
-        t = ws_h.cell(row=r, column=h_dst).value
-        if isinstance(s,str) and s.strip()!="":
-            pom_map[s.strip()] = t.strip() if isinstance(t,str) else t
+def write_saldo_document(
+    dest,
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    hdr_meno: str,
+    hdr_sap: str,
+    hdr_ucet: str,
+    hdr_spol: str = "SWAN a.s.",
+    theme: Literal["blue","gray","warm"] = "blue",
+    logo_bytes: Optional[bytes] = None,
+    output: Literal["xlsx","pdf"] = "xlsx",
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    stats: Optional[SaldoStats] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+    cache: Optional[ResultCache] = None,
+) -> None:
+    """
+    Ako generate_saldo_document, ale výstup sa zapíše priamo do `dest` – bajty celého výstupu
+    nevzniknú v pamäti (writer zapisuje rovno do súboru):
+      - dest = cesta: zápis cez dočasný súbor vedľa nej a os.replace (nikdy nezostane polovičný súbor),
+      - dest = binárny súbor (open(..., "wb"), socket.makefile, SpooledTemporaryFile, …): zapisuje sa od aktuálnej pozície.
+    Pri cache sa hit skopíruje z disku po blokoch; miss sa vyrobí do spoolu a z neho sa uloží aj odošle.
+    """
+    output = "pdf" if output == "pdf" else "xlsx"
+    _check_options((output,), xlsx_engine, balance_mode, pdf_engine)
+    if isinstance(dest, (str, os.PathLike)):
+        with atomic_output(dest) as f:
+            write_saldo_document(f, template_bytes, helper_bytes, src1_bytes, src2_bytes, hdr_meno, hdr_sap,
+                                 hdr_ucet, hdr_spol, theme, logo_bytes, output, xlsx_engine, balance_mode,
+                                 pdf_engine, pdf_workers, stats, csv_format, ref_store, cache)
+        return
 
-    # --- SRC1 (pohyby) + mapovanie typu ---
-    wb1 = load_workbook(BytesIO(src1_bytes), data_only=True); ws1 = wb1[wb1.sheetnames[0]]
-    hdr1 = [ws1.cell(row=1, column=c).value for c in range(1, ws1.max_column+1)]
-    def idx1(name):
-        for i,h in enumerate(hdr1, start=1):
-            if isinstance(h,str) and h.strip()==name:
-                return i
+    key = None
+    if cache is not None:
+        if ref_store is not None and src2_bytes:
+            ref_store.ingest(src2_bytes, csv_format)   # kľúč s revíziou po pridaní väzieb
+        key = document_key(template_bytes, helper_bytes, src1_bytes, src2_bytes, logo_bytes, output=output,
+                           hdr_meno=hdr_meno, hdr_sap=hdr_sap, hdr_ucet=hdr_ucet, hdr_spol=hdr_spol, theme=theme,
+                           xlsx_engine=xlsx_engine, balance_mode=balance_mode, pdf_engine=pdf_engine,
+                           csv_format=csv_format, ref_store=ref_store)
+        hit = cache.open(key)
+        if hit is not None:
+            with hit:
+                shutil.copyfileobj(hit, dest, STREAM_CHUNK)
+            return
+
+    with _measure(stats):
+        tpl, ledger = _prepare_ledger(template_bytes, helper_bytes, src1_bytes, src2_bytes, csv_format=csv_format,
+                                      ref_store=ref_store)
+        args = (tpl, template_bytes, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes, output,
+                xlsx_engine, balance_mode, pdf_engine, pdf_workers)
+        if key is None:
+            _render_output(dest, *args)
+            return
+        with tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES) as tmp:
+            _render_output(tmp, *args)
+            tmp.seek(0)
+            cache.put_file(key, tmp)
+            tmp.seek(0)
+            shutil.copyfileobj(tmp, dest, STREAM_CHUNK)
+
+def spool_saldo_document(*args, spool_max_size: int = SPOOL_MAX_BYTES, **kwargs):
+    """
+    Výstup do SpooledTemporaryFile (do spool_max_size v pamäti, nad limit na disku), pretočený na začiatok;
+    argumenty ako generate_saldo_document. Volajúci súbor zatvorí (zmaže sa sám).
+    """
+    f = tempfile.SpooledTemporaryFile(spool_max_size)
+    try:
+        write_saldo_document(f, *args, **kwargs)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+def iter_file_chunks(f, chunk_size: int = STREAM_CHUNK) -> Iterator[bytes]:
+    """Číta súbor po blokoch až do konca a potom ho zatvorí (aj pri prerušenom sťahovaní)."""
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        f.close()
+
+def iter_saldo_document(*args, chunk_size: int = STREAM_CHUNK, spool_max_size: int = SPOOL_MAX_BYTES,
+                        **kwargs) -> Iterator[bytes]:
+    """
+    Výstup po blokoch pre streamované sťahovanie; argumenty ako generate_saldo_document.
+    Dokument sa vyrobí hneď (chyby vstupov vzniknú pri volaní, nie uprostred odpovede) do spoolu
+    a iterátor ho potom len číta.
+    """
+    return iter_file_chunks(spool_saldo_document(*args, spool_max_size=spool_max_size, **kwargs), chunk_size)
+
+# ---------- prírastok: nové pohyby k existujúcemu saldu ----------
+_XML_ROW = re.compile(rb'<row [^>]*?r="(\d+)"')
+_XML_CELL = re.compile(rb'<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_XML_ATTR_S = re.compile(rb'\ss="(\d+)"')
+_XML_ATTR_T = re.compile(rb'\st="(\w+)"')
+_XML_V = re.compile(rb"<v>([^<]*)</v>")
+_XML_IS = re.compile(rb"<is><t[^>]*>([^<]*)</t></is>")
+
+def _sheet_name(zf: zipfile.ZipFile) -> str:
+    sheet = min((n for n in zf.namelist() if _SHEET_XML.fullmatch(n)), default=None)
+    if sheet is None:
+        raise RuntimeError("Predchádzajúce saldo nie je platný XLSX (chýba hárok).")
+    return sheet
+
+def _xml_rows_from_end(data: bytes, end: int, count: int):
+    """Posledných `count` riadkov (číslo, xml) pred pozíciou end – od konca, bez čítania zvyšku hárku."""
+    out = []
+    while len(out) < count:
+        start = data.rfind(b"<row ", 0, end)
+        if start < 0:
+            break
+        m = _XML_ROW.match(data, start)
+        out.append((int(m.group(1)), data[start:end]))
+        end = start
+    return out
+
+def _xml_cells(row_xml: bytes) -> Dict[str, Tuple[Optional[bytes], Optional[bytes], Optional[bytes]]]:
+    """Bunky riadku: stĺpec -> (štýl s, typ t, obsah)."""
+    cells = {}
+    for m in _XML_CELL.finditer(row_xml):
+        s_attr = _XML_ATTR_S.search(m.group(2)); t_attr = _XML_ATTR_T.search(m.group(2))
+        cells[m.group(1).decode()] = (s_attr and s_attr.group(1), t_attr and t_attr.group(1), m.group(3))
+    return cells
+
+def _xml_value(cell) -> object:
+    """Hodnota bunky z XML (číslo alebo inline text); shared string / chýbajúca hodnota -> None."""
+    _, t, body = cell
+    if not body:
+        return None
+    if t == b"inlineStr":
+        m = _XML_IS.search(body)
+        return _xml_unescape(m.group(1).decode("utf-8")) if m else None
+    m = _XML_V.search(body)
+    if m is None or t not in (None, b"n"):
+        return None
+    v = float(m.group(1))
+    return int(v) if v.is_integer() else v
+
+def _snapshot_from_tail(sheet_xml: bytes, tpl: CompiledTemplate) -> Optional[SaldoSnapshot]:
+    """Snapshot z posledného riadku hárku, ak má uložený zostatok (<v>) a číslo dokladu; inak None."""
+    rows = _xml_rows_from_end(sheet_xml, sheet_xml.rfind(b"</sheetData>"), 1)
+    if not rows or rows[0][0] <= HEADER_ROW:
+        return None
+    r, row_xml = rows[0]
+    cells = _xml_cells(row_xml)
+    L = {k: get_column_letter(c) for k, c in tpl.cols.items()}
+    bal = _xml_value(cells.get(L["bal"], (None, None, None)))
+    doc = _doc_key(_xml_value(cells.get(L["doc"], (None, None, None))))
+    if not isinstance(bal, (int, float)) or doc is None:
         return None
-    i_doc = idx1("Číslo dokladu"); i_dz=idx1("Dátum zadania"); i_du=idx1("Dátum účtovania")
-    i_sn  = idx1("Splatnosť netto"); i_op=idx1("Označenie pôvodu"); i_amt=idx1("Čiastka")
+    return SaldoSnapshot(r - HEADER_ROW, float(bal), doc)
 
-    # vyčisti dáta v šablóne (ponechaj hlavičku)
-    if ws.max_row > HEADER_ROW:
-        ws.delete_rows(HEADER_ROW+1, ws.max_row-HEADER_ROW)
+_OPENING_FORMULA = re.compile(r"=\s*(-?[\d.]+(?:[eE][-+]?\d+)?)\s*\+")
 
-    r0 = HEADER_ROW+1
-    for r in range(2, ws1.max_row+1):
-        row_has_data = any(ws1.cell(row=r, column=c).value not in (None,"") for c in range(1, ws1.max_column+1))
-        if not row_has_data:
+def _snapshot_from_scan(xlsx_bytes: bytes, tpl: CompiledTemplate) -> SaldoSnapshot:
+    """Snapshot prechodom celého hárku (read-only): pri zostatkoch len vo vzorcoch = počiatočný + súčet čiastok."""
+    idx = {k: c - 1 for k, c in tpl.cols.items()}
+    def pick(row, k):
+        return row[idx[k]] if idx[k] < len(row) else None
+
+    rows = 0
+    total = opening = 0.0
+    last_doc = last_bal = None
+    for n, row in enumerate(_iter_source_rows(xlsx_bytes, HEADER_ROW+1, data_only=False), start=1):
+        bal = pick(row, "bal")
+        if n == 1 and isinstance(bal, str):
+            m = _OPENING_FORMULA.match(bal)
+            opening = float(m.group(1)) if m else 0.0
+        if all(pick(row, k) in (None, "") for k in idx):
             continue
-        ozn_pov = ws1.cell(row=r, column=i_op).value if i_op else None
-        mapped_typ = pom_map.get(ozn_pov.strip() if isinstance(ozn_pov, str) else ozn_pov, None)
+        rows = n
+        total += _num(pick(row, "amt")) or 0.0
+        last_bal = bal
+        last_doc = _doc_key(pick(row, "doc")) or last_doc
+    closing = float(last_bal) if isinstance(last_bal, (int, float)) else opening + total
+    return SaldoSnapshot(rows, closing, last_doc)
 
-        # plnenie štandardných polí
-        ws.cell(row=r0, column=c_doc, value=ws1.cell(row=r, column=i_doc).value if i_doc else None)
-        ws.cell(row=r0, column=c_dz,  value=ws1.cell(row=r, column=i_dz).value if i_dz else None)
-        ws.cell(row=r0, column=c_du,  value=ws1.cell(row=r, column=i_du).value if i_du else None)
+def snapshot_from_xlsx(xlsx_bytes: bytes, template_bytes: bytes) -> SaldoSnapshot:
+    """
+    Snapshot z predtým vygenerovaného XLSX salda (z tohto TEMPLATE):
+      - ak má posledný riadok uložený zostatok (balance_mode "value"/"both" alebo už raz doplnené saldo),
+        číta sa len koniec hárku,
+      - inak (len vzorce) sa hárok raz prejde a zostatok sa dopočíta z čiastok.
+    """
+    tpl = compile_template(template_bytes)
+    with _stage("snapshot") as st:
+        try:
+            with zipfile.ZipFile(BytesIO(xlsx_bytes)) as zf:
+                snap = _snapshot_from_tail(zf.read(_sheet_name(zf)), tpl)
+        except zipfile.BadZipFile:
+            raise RuntimeError("Predchádzajúce saldo nie je platný XLSX.") from None
+        if snap is None:
+            snap = _snapshot_from_scan(xlsx_bytes, tpl)
+        st.rows = snap.rows
+    return snap
 
-        # Splatnosť len pri faktúrach, inak None
-        if mapped_typ and isinstance(mapped_typ, str) and _norm(mapped_typ) == _norm("Faktúra"):
-            ws.cell(row=r0, column=c_sn, value=ws1.cell(row=r, column=i_sn).value if i_sn else None)
-        else:
-            ws.cell(row=r0, column=c_sn, value=None)
+def _xml_cell(ref: str, style: Optional[bytes], v, formula: Optional[str] = None) -> str:
+    s_attr = f' s="{style.decode()}"' if style else ""
+    if formula is not None:
+        return f'<c r="{ref}"{s_attr}><f>{formula}</f><v>{v!r}</v></c>'
+    if v is None:
+        return f'<c r="{ref}"{s_attr}/>' if style else ""
+    if isinstance(v, (_dt.datetime, _dt.date)):
+        v = to_excel(v)
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        # 16 platných číslic ako openpyxl (safe_string) – hodnoty ako v nanovo vygenerovanom salde
+        return f'<c r="{ref}"{s_attr} t="n"><v>{v:.16g}</v></c>'
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{_xml_escape(str(v))}</t></is></c>'
 
-        ws.cell(row=r0, column=c_typ, value=mapped_typ if mapped_typ is not None else None)
-        ws.cell(row=r0, column=c_amt, value=ws1.cell(row=r, column=i_amt).value if i_amt else None)
-        r0 += 1
+_XML_DIMENSION = re.compile(rb'(<dimension ref="[A-Z]+\d+:[A-Z]+)(\d+)(")')
+# rozsahy za </sheetData>, ktoré sa posúvajú s posledným riadkom (autofilter, zebra)
+_XML_RANGES = re.compile(rb'(<(?:autoFilter ref|conditionalFormatting sqref)="[A-Z]+\d+:[A-Z]+)(\d+)(")')
 
-    # --- Zostatok + formát dátumov ---
-    L_G = get_column_letter(c_amt); L_H = get_column_letter(c_bal)
-    last = _last_data_row(ws, c_doc)
-    for r in range(HEADER_ROW+1, last+1):
-        ws.cell(row=r, column=c_bal, value=f"={L_G}{r}" if r==HEADER_ROW+1 else f"={L_H}{r-1}+{L_G}{r}")
-    for c in (c_dz, c_du, c_sn):
-        if c:
-            for rr in range(HEADER_ROW+1, last+1):
-                ws.cell(row=rr, column=c).number_format = DATE_FMT
-
-    # --- SRC2 (väzby) – doplň „Číslo faktúry“ z „Doplnková referencia“ ---
-    wb2 = load_workbook(BytesIO(src2_bytes), data_only=True); ws2 = wb2[wb2.sheetnames[0]]
-    hdr2 = [ws2.cell(row=1, column=c).value for c in range(1, ws2.max_column+1)]
-    def idx2(name):
-        for i,h in enumerate(hdr2, start=1):
-            if isinstance(h,str) and h.strip()==name:
-                return i
-        return None
-    j_doc = idx2("Číslo dokladu"); j_ref = idx2("Doplnková referencia")
-    if not j_doc or not j_ref:
-        raise RuntimeError("V zdroji 2 chýba 'Číslo dokladu' alebo 'Doplnková referencia'.")
+def append_saldo_xlsx(xlsx_bytes: bytes, template_bytes: bytes, ledger: Ledger,
+                      balance_mode: Literal["formula","value","both"] = "formula") -> bytes:
+    """
+    Pripíše riadky ledgera (prírastok) na koniec existujúceho XLSX salda:
+      - existujúce riadky sa neparsujú – nové sa vložia pred </sheetData> (ostatné časti ZIP sa len skopírujú),
+      - štýly buniek (zebra, formáty) sa preberú z posledných dvoch riadkov s rovnakou paritou,
+      - zostatok vo vzorcoch nadväzuje na predchádzajúci riadok a vždy má uloženú hodnotu (<v>) z ledgera,
+      - rozsah <dimension>, autofilter a zebra (podmienené formátovanie) sa posunú na nový posledný riadok.
+    """
+    if balance_mode not in BALANCE_MODES:
+        raise ValueError(f"Neznámy balance_mode: {balance_mode} (povolené: {', '.join(BALANCE_MODES)})")
+    tpl = compile_template(template_bytes)
+    cols = [(k, get_column_letter(c)) for k, c in tpl.cols.items()]
+    L_G = get_column_letter(tpl.cols["amt"]); L_H = get_column_letter(tpl.cols["bal"])
 
-    ref_map = {}
-    for r in range(2, ws2.max_row+1):
-        k = ws2.cell(row=r, column=j_doc).value
-        v = ws2.cell(row=r, column=j_ref).value
-        if k not in (None,""):
-            s = ""
-            if isinstance(v, str):
-                s = v.strip()
-                if s.upper().startswith("VBRK"): s = s[4:].strip()
-            elif v is not None:
-                s = str(v)
-            ref_map[str(k).strip()] = s
-
-    def is_faktura(v): return isinstance(v, str) and _norm(v) == _norm("Faktúra")
-    for rr in range(HEADER_ROW+1, last+1):
-        doc = ws.cell(row=rr, column=c_doc).value
-        typ = ws.cell(row=rr, column=c_typ).value
-        if is_faktura(typ):
-            inv = ref_map.get(str(doc).strip() if doc not in (None,"") else "", "")
-            ws.cell(row=rr, column=c_inv, value=inv if inv else None)
-        else:
-            ws.cell(row=rr, column=c_inv, value=None)
+    with _stage("xlsx_append", len(ledger)):
+        out = BytesIO()
+        try:
+            zin = zipfile.ZipFile(BytesIO(xlsx_bytes))
+        except zipfile.BadZipFile:
+            raise RuntimeError("Predchádzajúce saldo nie je platný XLSX.") from None
+        with zin, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+            sheet = _sheet_name(zin)
+            data = zin.read(sheet)
+            end = data.rfind(b"</sheetData>")
+            if end < 0:
+                raise RuntimeError("Predchádzajúce saldo nemá dátovú časť hárku.")
+            tail = _xml_rows_from_end(data, end, 2)
+            last = tail[0][0] if tail else 0
+            if last < HEADER_ROW:
+                raise RuntimeError("Predchádzajúce saldo nemá hlavičku tabuľky – nie je z tohto TEMPLATE.")
+            # štýly podľa parity dátového riadku (zebra); ak je len jeden dátový riadok, platí pre obe
+            styles = {}
+            for r, row_xml in tail:
+                if r > HEADER_ROW:
+                    cells = _xml_cells(row_xml)
+                    styles[(r - (HEADER_ROW+1)) % 2] = {L: cells.get(L, (None,))[0] for _, L in cols}
+            for parity in (0, 1):
+                styles.setdefault(parity, styles.get(1 - parity, {}))
 
-    # --- horná hlavička pre XLSX + logo + štýl
-    ws["B1"] = hdr_sap; ws["B2"] = hdr_meno; ws["B3"] = hdr_spol; ws["B4"] = hdr_ucet
+            parts = []
+            r = last
+            for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows():
+                r += 1
+                st = styles[(r - (HEADER_ROW+1)) % 2]
+                vals = dict(doc=doc, inv=inv, dz=dz, du=du, sn=sn, typ=typ, amt=amt)
+                cells = []
+                for k, L in cols:
+                    if k == "bal":
+                        formula = None
+                        if balance_mode != "value":
+                            formula = f"{L_H}{r-1}+{L_G}{r}" if r > HEADER_ROW+1 else f"{L_G}{r}"
+                        cells.append(_xml_cell(f"{L}{r}", st.get(L), bal, formula))
+                    else:
+                        cells.append(_xml_cell(f"{L}{r}", st.get(L), vals[k]))
+                parts.append(f'<row r="{r}">{"".join(cells)}</row>')
+
+            new_last = str(r).encode()
+            head = _XML_DIMENSION.sub(lambda m: m.group(1) + new_last + m.group(3), data[:end], count=1)
+            foot = _XML_RANGES.sub(lambda m: m.group(1) + (new_last if int(m.group(2)) < r else m.group(2))
+                                   + m.group(3), data[end:])
+            data = head + "".join(parts).encode("utf-8") + foot
+            for info in zin.infolist():
+                zout.writestr(info, data if info.filename == sheet else zin.read(info.filename))
+    return out.getvalue()
+
+def prepare_saldo_increment(template_bytes: bytes, helper_bytes: bytes, src1_bytes: bytes, src2_bytes: Optional[bytes],
+                            base: SaldoSnapshot, progress: Optional[Callable[[str], None]] = None,
+                            stats: Optional[SaldoStats] = None,
+                            csv_format: Optional[CsvFormat] = None,
+                            ref_store: Optional[RefStore] = None) -> Tuple[CompiledTemplate, Ledger]:
+    """
+    Ako prepare_saldo, ale len pre nové pohyby: ledger obsahuje iba riadky za base.last_doc
+    (prekryv exportov sa zahodí) a zostatok začína na base.closing_balance (ledger.opening).
+    """
+    with _measure(stats):
+        return _prepare_ledger(template_bytes, helper_bytes, src1_bytes, src2_bytes, progress, base=base,
+                               csv_format=csv_format, ref_store=ref_store)
+
+def generate_saldo_increment(
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    hdr_meno: str,
+    hdr_sap: str,
+    hdr_ucet: str,
+    hdr_spol: str = "SWAN a.s.",
+    theme: Literal["blue","gray","warm"] = "blue",
+    logo_bytes: Optional[bytes] = None,
+    previous_xlsx: Optional[bytes] = None,
+    snapshot: Optional[SaldoSnapshot] = None,
+    outputs: Sequence[Literal["xlsx","pdf"]] = OUTPUTS,
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    stats: Optional[SaldoStats] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+) -> Dict[str, bytes]:
+    """
+    Prírastkové saldo: src1/src2 obsahujú len nové pohyby, história sa znovu nespracúva.
+      - východisko = snapshot (SaldoSnapshot.from_json) alebo predchádzajúce XLSX (snapshot_from_xlsx),
+      - "xlsx": s previous_xlsx je to celé saldo s pripísanými riadkami (append_saldo_xlsx),
+        inak len nové pohyby s počiatočným zostatkom,
+      - "pdf": výpis nových pohybov so zostatkom nadväzujúcim na predchádzajúce saldo,
+      - "snapshot": JSON nového stavu (vždy) – vstup pre ďalší prírastok.
+    """
+    outputs = _check_options(outputs, xlsx_engine, balance_mode, pdf_engine)
+    if previous_xlsx is None and snapshot is None:
+        raise ValueError("Prírastok potrebuje previous_xlsx alebo snapshot.")
+    with _measure(stats):
+        base = snapshot if snapshot is not None else snapshot_from_xlsx(previous_xlsx, template_bytes)
+        tpl, ledger = _prepare_ledger(template_bytes, helper_bytes, src1_bytes, src2_bytes, base=base,
+                                      csv_format=csv_format, ref_store=ref_store)
+        rendered = tuple(o for o in outputs if not (o == "xlsx" and previous_xlsx is not None))
+        result = _render_outputs(tpl, template_bytes, ledger, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes,
+                                 rendered, xlsx_engine, balance_mode, pdf_engine, pdf_workers)
+        if "xlsx" in outputs and previous_xlsx is not None:
+            result["xlsx"] = append_saldo_xlsx(previous_xlsx, template_bytes, ledger, balance_mode)
+        result["snapshot"] = ledger_snapshot(ledger, base).to_json()
+    return result
+
+# ---------- dávka: viac zmluvných účtov z jedného exportu ----------
+ACCOUNT_COL = "Zmluvný účet"
+
+class AccountPart(NamedTuple):
+    """Pohyby jedného zmluvného účtu zo src1 + prvé neprázdne hodnoty doplnkových stĺpcov (meno, SAP ID)."""
+    account: str
+    moves: list
+    meta: tuple
+
+def _account_key(v) -> str:
+    """Hodnota 'Zmluvný účet' -> reťazec (Excel čísla bez '.0')."""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return "" if v is None else str(v).strip()
+
+def split_src1_by_account(src1_bytes: bytes, pom_map, account_col: str = ACCOUNT_COL,
+                          meta_cols: Sequence[str] = (), csv_format: Optional[CsvFormat] = None) -> Dict[str, AccountPart]:
+    """
+    Rozdelí src1 podľa zmluvného účtu v jednom prechode:
+      - poradie účtov aj pohybov zostáva ako v exporte,
+      - riadky bez účtu sa preskočia,
+      - meta = prvá neprázdna hodnota každého stĺpca z meta_cols v rámci účtu.
+    """
+    parts: Dict[str, AccountPart] = {}
+    for keys, move in _iter_src1(src1_bytes, pom_map, (account_col, *meta_cols), csv_format):
+        acc = _account_key(keys[0])
+        if not acc:
+            continue
+        part = parts.get(acc)
+        if part is None:
+            part = parts[acc] = AccountPart(acc, [], [None] * len(meta_cols))
+        for j, v in enumerate(keys[1:]):
+            if part.meta[j] in (None, ""):
+                part.meta[j] = v
+        part.moves.append(move)
+    return {acc: p._replace(meta=tuple(_account_key(m) for m in p.meta)) for acc, p in parts.items()}
+
+class AccountJob(NamedTuple):
+    """Jeden účet dávky pripravený na výstupy: hlavička + hotový ledger (pickle-ovateľný pre worker procesy)."""
+    account: str
+    hdr_meno: str
+    hdr_sap: str
+    ledger: Ledger
+
+def plan_saldo_batch(
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    account_col: str = ACCOUNT_COL,
+    name_col: Optional[str] = None,
+    sap_col: Optional[str] = None,
+    hdr_meno: str = "",
+    hdr_sap: str = "",
+    accounts: Optional[Sequence[str]] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+) -> Iterator[AccountJob]:
+    """
+    Generátor AccountJob pre každý zmluvný účet v src1 (v poradí exportu):
+      - pomôcka a src2 sa spracujú raz pre celý beh,
+      - src1 sa rozdelí podľa account_col v jednom prechode,
+      - ledger sa zostaví až pri odobratí účtu,
+      - meno / SAP ID v hlavičke sa berú zo stĺpcov name_col / sap_col (ak sú zadané),
+        inak sa použijú hdr_meno / hdr_sap,
+      - accounts obmedzí beh na vybrané účty,
+      - src1/src2 môžu byť XLSX, CSV (csv_format) alebo Parquet,
+      - s ref_store=RefStore(...) sa väzby vyhľadajú len pre čísla dokladov zo src1 (src2 nepovinné).
+    """
+    pom_map = compile_helper(helper_bytes).pom_map
+    meta_cols = tuple(c for c in (name_col, sap_col) if c)
+    parts = split_src1_by_account(src1_bytes, pom_map, account_col, meta_cols, csv_format)
+    ref_map = _resolve_refs([m for part in parts.values() for m in part.moves], src2_bytes, csv_format, ref_store)
+
+    wanted = None if accounts is None else {_account_key(a) for a in accounts}
+    for acc, part in parts.items():
+        if wanted is not None and acc not in wanted:
+            continue
+        meta = dict(zip(meta_cols, part.meta))
+        yield AccountJob(acc, meta.get(name_col) or hdr_meno, meta.get(sap_col) or hdr_sap,
+                         _build_ledger(part.moves, ref_map))
+
+def render_account(
+    tpl: CompiledTemplate,
+    template_bytes: bytes,
+    job: AccountJob,
+    hdr_spol: str = "SWAN a.s.",
+    theme: Literal["blue","gray","warm"] = "blue",
+    logo_bytes: Optional[bytes] = None,
+    outputs: Sequence[Literal["xlsx","pdf"]] = OUTPUTS,
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    stats: Optional[SaldoStats] = None,
+) -> Dict[str, bytes]:
+    """Výstupy jedného účtu dávky (rovnaké ako generate_saldo_bundle pre ten účet); stats = voliteľné meranie."""
+    outputs = _check_options(outputs, xlsx_engine, balance_mode, pdf_engine)
+    with _measure(stats):
+        return _render_outputs(tpl, template_bytes, job.ledger, job.hdr_meno, job.hdr_sap, job.account, hdr_spol,
+                               theme, logo_bytes, outputs, xlsx_engine, balance_mode, pdf_engine, pdf_workers)
+
+def generate_saldo_batch(
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    hdr_spol: str = "SWAN a.s.",
+    theme: Literal["blue","gray","warm"] = "blue",
+    logo_bytes: Optional[bytes] = None,
+    outputs: Sequence[Literal["xlsx","pdf"]] = OUTPUTS,
+    xlsx_engine: Literal["template","stream"] = "template",
+    balance_mode: Literal["formula","value","both"] = "formula",
+    pdf_engine: Literal["platypus","chunked","canvas","parallel"] = "platypus",
+    pdf_workers: Optional[int] = None,
+    account_col: str = ACCOUNT_COL,
+    name_col: Optional[str] = None,
+    sap_col: Optional[str] = None,
+    hdr_meno: str = "",
+    hdr_sap: str = "",
+    accounts: Optional[Sequence[str]] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+) -> Iterator[Tuple[str, Dict[str, bytes]]]:
+    """
+    Sériový generátor (účet, {"xlsx": bytes, "pdf": bytes}) pre každý zmluvný účet v src1
+    (plan_saldo_batch + render_account; paralelný beh je v saldo_batch.run_batch).
+    """
+    outputs = _check_options(outputs, xlsx_engine, balance_mode, pdf_engine)
+    tpl = compile_template(template_bytes)
+    for job in plan_saldo_batch(helper_bytes, src1_bytes, src2_bytes, account_col, name_col, sap_col,
+                                hdr_meno, hdr_sap, accounts, csv_format, ref_store):
+        yield job.account, _render_outputs(tpl, template_bytes, job.ledger, job.hdr_meno, job.hdr_sap, job.account,
+                                           hdr_spol, theme, logo_bytes, outputs, xlsx_engine, balance_mode, pdf_engine,
+                                           pdf_workers)
+
+# ---------- jeden workbook pre viac účtov (hárok na účet + súhrn) ----------
+SUMMARY_SHEET = "Súhrn"
+SUMMARY_HEADERS = ("Zmluvný účet", "Meno zákazníka", "SAP ID", "Počet pohybov", "Konečný zostatok")
+SUMMARY_WIDTHS = (18, 32, 14, 14, 18)
+_SHEET_UNSAFE = re.compile(r"[\[\]:*?/\\]+")
+
+def _sheet_title(account: str, used: set) -> str:
+    """Názov hárku z účtu: bez znakov zakázaných v Exceli, max. 31 znakov, jedinečný (bez ohľadu na veľkosť písmen)."""
+    base = (_SHEET_UNSAFE.sub("_", account).strip("'") or "bez_uctu")[:31]
+    title, k = base, 1
+    while title.lower() in used:
+        k += 1
+        suffix = f"~{k}"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+def _summary_sheet(ws, jobs, titles, named, hdr_spol, logo_bytes: Optional[bytes]) -> None:
+    """Súhrn: účet (odkaz na hárok), meno, SAP ID, počet pohybov, konečný zostatok + riadok Spolu."""
+    for i, w in enumerate(SUMMARY_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+    ws.column_dimensions["E"]._style = copy(named["money"])   # formáty stĺpcov pred prvým append
+    ws.append(["Spoločnosť", hdr_spol])
+    ws.append([])
+    head = []
+    for h in SUMMARY_HEADERS:
+        cell = WriteOnlyCell(ws, value=h)
+        cell._style = copy(named["head"])
+        head.append(cell)
+    ws.append(head)
+    total = 0.0
+    for job, title in zip(jobs, titles):
+        link = WriteOnlyCell(ws, value=job.account)
+        link.hyperlink = Hyperlink(ref="", location=f"'{title}'!A1")
+        bal = WriteOnlyCell(ws, value=job.ledger.closing_balance)
+        bal._style = copy(named["money"])
+        ws.append([link, job.hdr_meno, job.hdr_sap, len(job.ledger), bal])
+        total += job.ledger.closing_balance
+    bal = WriteOnlyCell(ws, value=total)
+    bal._style = copy(named["money"])
+    ws.append(["Spolu", None, None, sum(len(j.ledger) for j in jobs), bal])
     _insert_logo_xlsx(ws, logo_bytes)
-    _style_ws(ws, c_doc, c_inv, c_dz, c_du, c_sn, c_typ, c_amt, c_bal, last, theme=theme)
 
-    # --- export
-    if output == "pdf":
-        return _build_pdf(ws, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, logo_bytes=logo_bytes, theme=theme)
+def write_saldo_workbook(
+    dest,
+    template_bytes: bytes,
+    helper_bytes: bytes,
+    src1_bytes: bytes,
+    src2_bytes: Optional[bytes],
+    hdr_spol: str = "SWAN a.s.",
+    logo_bytes: Optional[bytes] = None,
+    balance_mode: Literal["formula","value","both"] = "formula",
+    account_col: str = ACCOUNT_COL,
+    name_col: Optional[str] = None,
+    sap_col: Optional[str] = None,
+    hdr_meno: str = "",
+    hdr_sap: str = "",
+    accounts: Optional[Sequence[str]] = None,
+    csv_format: Optional[CsvFormat] = None,
+    ref_store: Optional[RefStore] = None,
+    stats: Optional[SaldoStats] = None,
+) -> None:
+    """
+    Jeden XLSX pre viac zmluvných účtov (napr. kľúčový zákazník) do dest (cesta alebo binárny súbor):
+      - hárok „Súhrn“ s konečnými zostatkami (účty sú odkazy na svoje hárky) a riadkom Spolu,
+      - za ním hárok na každý účet (v poradí exportu) s hlavičkou z TEMPLATE, ako stream XLSX jedného účtu,
+      - src1/src2 sa prečítajú raz a všetky zostatky sa počítajú v jednom prechode (plan_saldo_batch),
+      - pomenované štýly a formáty stĺpcov sú spoločné pre všetky hárky,
+      - logo je len na súhrne (openpyxl by obrázok uložil znova pre každý hárok).
+    Účty, ich výber a hlavička ako pri dávke (account_col, name_col/sap_col alebo hdr_meno/hdr_sap, accounts).
+    """
+    _check_options(("xlsx",), "stream", balance_mode, "platypus")
+    if isinstance(dest, (str, os.PathLike)):
+        with atomic_output(dest) as f:
+            write_saldo_workbook(f, template_bytes, helper_bytes, src1_bytes, src2_bytes, hdr_spol,
+                                 logo_bytes, balance_mode, account_col, name_col, sap_col, hdr_meno, hdr_sap,
+                                 accounts, csv_format, ref_store, stats)
+        return
+
+    with _measure(stats):
+        tpl = compile_template(template_bytes)
+        with _stage("parse"):
+            jobs = list(plan_saldo_batch(helper_bytes, src1_bytes, src2_bytes, account_col, name_col, sap_col,
+                                         hdr_meno, hdr_sap, accounts, csv_format, ref_store))
+        if not jobs:
+            raise RuntimeError(f"V zdroji 1 nie je žiadny účet (stĺpec '{account_col}').")
+        rows = sum(len(j.ledger) for j in jobs)
+        with _stage("xlsx_write", rows):
+            wb = Workbook(write_only=True)
+            named = _xlsx_named_styles(wb, tpl.styles)
+            used = {SUMMARY_SHEET.lower()}
+            titles = [_sheet_title(j.account, used) for j in jobs]
+            _summary_sheet(wb.create_sheet(SUMMARY_SHEET), jobs, titles, named, hdr_spol, logo_bytes)
+            for job, title in zip(jobs, titles):
+                _stream_sheet(wb.create_sheet(title), tpl, named, job.ledger, job.hdr_meno, job.hdr_sap, job.account,
+                              hdr_spol, None, balance_mode)
+            _set_calc_on_load(wb, balance_mode)
+        with _stage("xlsx_save", rows):
+            if balance_mode != "both":
+                wb.save(dest)
+                return
+            with tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES) as tmp:
+                wb.save(tmp)
+                tmp.seek(0)
+                # write-only hárky sú sheet1..N v poradí vytvorenia (sheet1 = súhrn)
+                _cache_balance_values(tmp, None, tpl.cols["bal"], out=dest,
+                                      sheets={f"xl/worksheets/sheet{k}.xml": j.ledger for k, j in enumerate(jobs, 2)})
 
-    out = BytesIO()
-    wb.save(out)
-    out.seek(0)
-    return out.read()
+def generate_saldo_workbook(*args, **kwargs) -> bytes:
+    """Ako write_saldo_workbook (bez dest), vráti bajty XLSX."""
+    buf = BytesIO()
+    write_saldo_workbook(buf, *args, **kwargs)
+    return buf.getvalue()
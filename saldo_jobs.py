@@ -0,0 +1,153 @@
+# saldo_jobs.py
+"""
+Generovanie salda na pozadí (pre Streamlit): obmedzený pool vlákien, limit rozpracovaných úloh,
+priebeh po fázach a výstupy zverejnené hneď, ako sú hotové (XLSX pred PDF).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Optional
+
+from saldo_core import STAGES, AccountJob, RefStore, prepare_saldo, render_account
+
+STAGE_LABELS = {
+    "parse": "Načítanie vstupov",
+    "map": "Väzby (čísla faktúr)",
+    "balance": "Zostatok",
+    "xlsx": "XLSX",
+    "pdf": "PDF",
+}
+
+class QueueFull(RuntimeError):
+    """Server je vyťažený – rozpracovaných úloh je viac, ako povoľuje max_pending."""
+
+class Job:
+    """
+    Stav jednej úlohy. Zapisuje ho worker, UI ho len číta:
+      - stage = práve bežiaca fáza (None pred štartom a po skončení),
+      - done = dokončené fázy v poradí,
+      - results = hotové výstupy {"xlsx": bytes, "pdf": bytes} (pribúdajú postupne),
+      - error = výnimka, ak úloha zlyhala; finished = úloha skončila (úspešne či nie).
+    """
+    __slots__ = ("stage", "done", "results", "error", "finished")
+
+    def __init__(self):
+        self.stage: Optional[str] = None
+        self.done: list = []
+        self.results: Dict[str, bytes] = {}
+        self.error: Optional[BaseException] = None
+        self.finished = False
+
+    def enter(self, stage: Optional[str]) -> None:
+        """Prechod do ďalšej fázy (None = koniec); predchádzajúca sa označí za dokončenú."""
+        if self.stage is not None:
+            self.done.append(self.stage)
+        self.stage = stage
+
+    @property
+    def fraction(self) -> float:
+        return 1.0 if self.finished else len(self.done) / len(STAGES)
+
+class _LRU:
+    """Malá thread-safe LRU mapa."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        return None
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+def _sha(data: Optional[bytes]) -> str:
+    return hashlib.sha256(data or b"").hexdigest()
+
+class JobRunner:
+    """
+    Zdieľaný (na proces) spúšťač úloh:
+      - najviac `workers` úloh beží naraz, najviac `max_pending` čaká alebo beží (inak QueueFull),
+      - rozparsovaný ledger sa cachuje podľa hashu vstupov – zmena témy/hlavičky len prekreslí výstupy,
+      - hotové výstupy sa cachujú podľa (vstupy, hlavička, téma), PDF aj podľa dnešného dátumu (je v jeho hlavičke)
+        – rovnaká požiadavka sa negeneruje znova,
+      - s ref_store sa src2 pridá do úložiska väzieb a je nepovinné; namiesto src2 je v kľúči revízia úložiska.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, cache_size: int = 8,
+                 ref_store: Optional[RefStore] = None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="saldo-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._ledgers = _LRU(cache_size)
+        self._outputs = _LRU(2 * cache_size)    # XLSX a PDF sú samostatné položky
+        self.ref_store = ref_store
+
+    def submit(self, template_bytes: bytes, helper_bytes: bytes, src1_bytes: bytes, src2_bytes: Optional[bytes],
+               hdr_meno: str, hdr_sap: str, hdr_ucet: str, hdr_spol: str = "SWAN a.s.", theme: str = "blue",
+               logo_bytes: Optional[bytes] = None) -> Job:
+        """Zaradí úlohu a hneď vráti jej Job; pri plnej fronte vyhodí QueueFull."""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("Server je momentálne vyťažený, skús to o chvíľu znova.")
+        job = Job()
+        try:
+            fut = self._pool.submit(self._run, job, template_bytes, helper_bytes, src1_bytes, src2_bytes,
+                                    hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return job
+
+    def _run(self, job: Job, template_bytes, helper_bytes, src1_bytes, src2_bytes,
+             hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, logo_bytes) -> None:
+        try:
+            store = self.ref_store
+            if store is not None:
+                if src2_bytes:
+                    store.ingest(src2_bytes)
+                src2_bytes = None       # väzby už sú v úložisku
+            in_key = (_sha(template_bytes), _sha(helper_bytes), _sha(src1_bytes),
+                      _sha(src2_bytes) if store is None else store.revision)
+            base = (in_key, hdr_meno, hdr_sap, hdr_ucet, hdr_spol, theme, _sha(logo_bytes))
+            # dátum generovania je v hlavičke PDF – proces beží dni, včerajšie PDF sa nepoužije (XLSX áno)
+            out_keys = {"xlsx": base + ("xlsx",), "pdf": base + ("pdf", date.today())}
+            cached = {o: self._outputs.get(k) for o, k in out_keys.items()}
+            if all(v is not None for v in cached.values()):
+                job.done.extend(STAGES)
+                job.results.update(cached)
+                return
+
+            prepared = self._ledgers.get(in_key)
+            if prepared is None:
+                prepared = prepare_saldo(template_bytes, helper_bytes, src1_bytes, src2_bytes, progress=job.enter,
+                                         ref_store=store)
+                self._ledgers.put(in_key, prepared)
+            else:
+                job.done.extend(("parse", "map", "balance"))
+            tpl, ledger = prepared
+
+            acc = AccountJob(hdr_ucet, hdr_meno, hdr_sap, ledger)
+            for o in ("xlsx", "pdf"):
+                job.enter(o)
+                data = cached[o]
+                if data is None:
+                    data = render_account(tpl, template_bytes, acc, hdr_spol=hdr_spol, theme=theme,
+                                          logo_bytes=logo_bytes, outputs=(o,))[o]
+                    self._outputs.put(out_keys[o], data)
+                job.results[o] = data
+            job.enter(None)
+        except Exception as e:
+            job.error = e
+        finally:
+            job.finished = True
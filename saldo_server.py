@@ -0,0 +1,422 @@
+# saldo_server.py
+"""
+HTTP služba nad generate_saldo_document pre ostatné interné systémy (bez externých závislostí):
+multipart upload src1/src2 + polia hlavičky -> XLSX alebo PDF v tele odpovede.
+
+    python saldo_server.py --port 8080 --workers 4
+    curl -F src1=@pohyby.xlsx -F src2=@vazby.xlsx -F hdr_meno="Jožko Mrkvička" -F hdr_sap=1090989 \\
+         -F hdr_ucet=777777777 -F output=pdf http://localhost:8080/saldo -o saldo.pdf
+
+S --refs-db sa väzby zo src2 pridajú do SQLite úložiska a ďalšie požiadavky už src2 posielať nemusia.
+
+Generovanie beží v pevnom poole procesov (template, pomôcka a PDF kontext sú v každom workeri
+načítané raz); nad `max_pending` rozpracovaných požiadaviek služba hneď odpovie 429.
+Worker zapisuje výstup do dočasného súboru a služba ho posiela po blokoch – bajty výstupu
+neputujú medzi procesmi ani nie sú celé v pamäti.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+from contextlib import suppress
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from saldo_batch import HELPER_PATH, LOGO_PATH, TEMPLATE_PATH, output_name
+from saldo_core import (BALANCE_MODES, OUTPUTS, PDF_ENGINES, RESULT_CACHE_MAX_BYTES, STREAM_CHUNK, THEMES,
+                        XLSX_ENGINES, CsvFormat, RefStore, ResultCache, compile_helper, compile_template, document_key,
+                        warm_pdf_context, write_saldo_document)
+from saldo_jobs import QueueFull
+
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024   # celé telo požiadavky (src1 + src2 + polia)
+RETRY_AFTER_S = 2                     # hlavička Retry-After pri 429
+
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+REQUIRED_FIELDS = ("src1", "src2", "hdr_meno", "hdr_sap", "hdr_ucet")
+
+# ---------- multipart ----------
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?', re.I)
+_DISPOSITION_NAME = re.compile(rb'\bname="([^"]*)"', re.I)
+
+def parse_multipart(body: bytes, content_type: str) -> Dict[str, bytes]:
+    """multipart/form-data -> {názov poľa: bajty}; súbory aj textové polia (pri opakovaní platí prvé)."""
+    m = _BOUNDARY.search(content_type or "")
+    if not content_type.lower().startswith("multipart/form-data") or not m:
+        raise ValueError("Očakáva sa multipart/form-data s boundary.")
+    delim = b"--" + m.group(1).encode("latin-1")
+    fields: Dict[str, bytes] = {}
+    for part in body.split(delim)[1:]:
+        if part.startswith(b"--"):
+            break
+        head, sep, data = part.partition(b"\r\n\r\n")
+        if not sep:
+            raise ValueError("Poškodená časť multipart tela.")
+        name = _DISPOSITION_NAME.search(head)
+        if name:
+            # dáta končia CRLF pred ďalším oddeľovačom
+            fields.setdefault(name.group(1).decode("utf-8", "replace"),
+                              data[:-2] if data.endswith(b"\r\n") else data)
+    return fields
+
+def _text(fields: Dict[str, bytes], name: str, default: str = "") -> str:
+    v = fields.get(name)
+    return default if v is None else v.decode("utf-8", "replace").strip()
+
+def _choice(fields: Dict[str, bytes], name: str, default: str, allowed) -> str:
+    v = _text(fields, name) or default
+    if v not in allowed:
+        raise ValueError(f"Neznáma hodnota {name}: {v} (povolené: {', '.join(sorted(allowed))})")
+    return v
+
+def request_options(fields: Dict[str, bytes], defaults: Optional[dict] = None, src2_required: bool = True) -> dict:
+    """
+    Polia formulára -> kľúčové argumenty generate_saldo_document (ValueError pri chýbajúcich/neplatných);
+    src2_required=False pri úložisku väzieb.
+    """
+    d = defaults or {}
+    missing = [f for f in REQUIRED_FIELDS if not (fields.get(f) or b"").strip() and (src2_required or f != "src2")]
+    if missing:
+        raise ValueError("Chýbajú povinné polia: " + ", ".join(missing))
+    delimiter, decimal = _text(fields, "csv_delimiter"), _text(fields, "csv_decimal")
+    if decimal not in ("", "comma", "dot"):
+        raise ValueError(f"Neznáma hodnota csv_decimal: {decimal} (povolené: comma, dot)")
+    return dict(
+        hdr_meno=_text(fields, "hdr_meno"),
+        hdr_sap=_text(fields, "hdr_sap"),
+        hdr_ucet=_text(fields, "hdr_ucet"),
+        hdr_spol=_text(fields, "hdr_spol", d.get("hdr_spol", "SWAN a.s.")),
+        theme=_choice(fields, "theme", d.get("theme", "blue"), THEMES),
+        output=_choice(fields, "output", d.get("output", "xlsx"), OUTPUTS),
+        xlsx_engine=_choice(fields, "xlsx_engine", d.get("xlsx_engine", "stream"), XLSX_ENGINES),
+        balance_mode=_choice(fields, "balance_mode", d.get("balance_mode", "formula"), BALANCE_MODES),
+        pdf_engine=_choice(fields, "pdf_engine", d.get("pdf_engine", "canvas"), PDF_ENGINES),
+        csv_format=CsvFormat(delimiter.replace("\\t", "\t") or None, None if not decimal else decimal == "comma",
+                             _text(fields, "csv_encoding") or None),
+    )
+
+# ---------- worker procesy ----------
+_worker = {}   # stav worker procesu – nastaví ho _worker_init raz pri štarte
+
+def _worker_init(template_bytes: bytes, helper_bytes: bytes, logo_bytes: Optional[bytes],
+                 refs_db: Optional[str] = None) -> None:
+    """
+    Worker si raz skompiluje template a pomôcku (ostanú v cache saldo_core), predhreje PDF kontext
+    a otvorí vlastné spojenie na úložisko väzieb.
+    """
+    compile_template(template_bytes)
+    compile_helper(helper_bytes)
+    warm_pdf_context(logo_bytes)
+    _worker.update(template_bytes=template_bytes, helper_bytes=helper_bytes, logo_bytes=logo_bytes,
+                   ref_store=RefStore(refs_db) if refs_db else None)
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+def _worker_ingest(src2_bytes: bytes, csv_format: Optional[CsvFormat]) -> int:
+    """Pridá src2 do úložiska väzieb (parsovanie beží vo workeri, nie vo vlákne HTTP servera)."""
+    return _worker["ref_store"].ingest(src2_bytes, csv_format)
+
+def _worker_render(src1_bytes: bytes, src2_bytes: Optional[bytes], opts: dict, path: str) -> str:
+    """Vyrobí výstup do súboru `path` (do rodiča sa vracia len cesta)."""
+    w = _worker
+    write_saldo_document(path, w["template_bytes"], w["helper_bytes"], src1_bytes, src2_bytes,
+                         logo_bytes=w["logo_bytes"], ref_store=w["ref_store"], **opts)
+    return path
+
+class SaldoService:
+    """
+    Pevný pool `workers` procesov + limit `max_pending` rozpracovaných požiadaviek (bežiace aj čakajúce):
+      - submit() pri plnej fronte hneď vyhodí QueueFull (HTTP 429), nič neblokuje,
+      - pri páde worker procesu sa pool vytvorí nanovo (rozpracované požiadavky dostanú chybu),
+      - s cache=ResultCache(...) sa opakovaná požiadavka vráti z disku bez workera aj bez miesta vo fronte,
+      - s refs_db (cesta k RefStore) je src2 nepovinné; nové src2 pridá do úložiska worker (resolve_src2,
+        rovnaký limit fronty ako generovanie) a pri generovaní sa väzby len vyhľadávajú.
+    """
+
+    def __init__(self, template_bytes: bytes, helper_bytes: bytes, logo_bytes: Optional[bytes] = None,
+                 workers: int = 2, max_pending: int = 8, defaults: Optional[dict] = None,
+                 cache: Optional[ResultCache] = None, refs_db: Optional[str] = None):
+        if workers < 1 or max_pending < 1:
+            raise ValueError("workers a max_pending musia byť aspoň 1.")
+        # vstupy overí rodič – chybný template/pomôcka zastaví štart, nie prvú požiadavku
+        compile_template(template_bytes)
+        compile_helper(helper_bytes)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.defaults = dict(defaults or {})
+        self.cache = cache
+        self.ref_store = RefStore(refs_db) if refs_db else None
+        self._initargs = (template_bytes, helper_bytes, logo_bytes)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: HTTP vlákna už bežia, fork by ich stav skopíroval do workera
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_worker_init,
+                                   initargs=(*self._initargs, None if self.ref_store is None else self.ref_store.path))
+
+    def warm(self) -> None:
+        """Spustí všetky worker procesy vopred (import + kompilácia), aby prvé požiadavky nečakali."""
+        for f in [self._pool.submit(_worker_ping) for _ in range(self.workers)]:
+            f.result()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def resolve_src2(self, src2_bytes: Optional[bytes], opts: dict) -> Optional[bytes]:
+        """
+        Bez úložiska vráti src2 bezo zmeny. S úložiskom ho doň pridá a vráti None – výstup potom závisí
+        len od úložiska a kľúč cache od jeho revízie. Už načítaný súbor sa len porovná podľa SHA-256;
+        nový sa parsuje vo workeri a zaberá miesto vo fronte (QueueFull, RuntimeError pri chybnom súbore).
+        """
+        if self.ref_store is None:
+            return src2_bytes
+        if src2_bytes and not self.ref_store.known(src2_bytes):
+            self._acquire()
+            try:
+                with self._lock:
+                    pool = self._pool
+                pool.submit(_worker_ingest, src2_bytes, opts.get("csv_format")).result()
+            finally:
+                self._release()
+        return None
+
+    def _key(self, src1_bytes: bytes, src2_bytes: Optional[bytes], opts: dict) -> str:
+        template_bytes, helper_bytes, logo_bytes = self._initargs
+        return document_key(template_bytes, helper_bytes, src1_bytes, src2_bytes, logo_bytes,
+                            ref_store=self.ref_store, **opts)
+
+    def cached(self, src1_bytes: bytes, src2_bytes: Optional[bytes], opts: dict):
+        """Otvorený hotový výstup z cache (None = nie je cache alebo miss)."""
+        return None if self.cache is None else self.cache.open(self._key(src1_bytes, src2_bytes, opts))
+
+    def store(self, src1_bytes: bytes, src2_bytes: Optional[bytes], opts: dict, f) -> None:
+        if self.cache is not None:
+            self.cache.put_file(self._key(src1_bytes, src2_bytes, opts), f)
+
+    def submit(self, src1_bytes: bytes, src2_bytes: Optional[bytes], opts: dict) -> Future:
+        """
+        Zaradí generovanie; vráti Future s cestou k dočasnému súboru s výstupom (volajúci ho zmaže).
+        Pri plnej fronte vyhodí QueueFull.
+        """
+        self._acquire()
+        with self._lock:
+            pool = self._pool
+        fd, path = tempfile.mkstemp(prefix="saldo-", suffix="." + opts["output"])
+        os.close(fd)
+        try:
+            fut = pool.submit(_worker_render, src1_bytes, src2_bytes, opts, path)
+        except BaseException:
+            self._done(None, path)
+            raise
+        fut.add_done_callback(lambda f: self._done(f, path))
+        return fut
+
+    def _acquire(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("Server je momentálne vyťažený, skús to o chvíľu znova.")
+        with self._lock:
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _done(self, fut: Optional[Future], path: str) -> None:
+        if fut is None or fut.cancelled() or fut.exception() is not None:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+        self._release()
+
+    def replace_broken_pool(self) -> None:
+        with self._lock:
+            old, self._pool = self._pool, self._new_pool()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> dict:
+        st = {"workers": self.workers, "max_pending": self.max_pending, "pending": self._pending}
+        if self.cache is not None:
+            st["cache"] = self.cache.info()
+        if self.ref_store is not None:
+            st["refs"] = self.ref_store.info()
+        return st
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        if self.ref_store is not None:
+            self.ref_store.close()
+
+# ---------- HTTP ----------
+class SaldoHandler(BaseHTTPRequestHandler):
+    """POST /saldo (multipart) -> súbor; GET /health -> stav fronty (JSON)."""
+    server_version = "saldo/1"
+    timeout = 120          # pomalý/zaseknutý klient neblokuje vlákno donekonečna
+
+    @property
+    def service(self) -> SaldoService:
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def _json(self, code: int, payload: dict, headers: Tuple[Tuple[str, str], ...] = ()) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/health":
+            self._json(200, {"status": "ok", **self.service.status()})
+        else:
+            self._json(404, {"error": "Neznáma cesta."})
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/saldo":
+            return self._json(404, {"error": "Neznáma cesta."})
+        raw_length = self.headers.get("Content-Length")
+        if raw_length is None:
+            return self._json(411, {"error": "Chýba Content-Length."})
+        try:
+            length = int(raw_length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._json(400, {"error": f"Neplatná Content-Length: {raw_length!r}"})
+        if length > MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            return self._json(413, {"error": f"Telo požiadavky je väčšie ako {MAX_UPLOAD_BYTES} B."})
+        body = self.rfile.read(length)
+        try:
+            fields = parse_multipart(body, self.headers.get("Content-Type", ""))
+            opts = request_options(fields, self.service.defaults, src2_required=self.service.ref_store is None)
+        except ValueError as e:
+            return self._json(400, {"error": str(e)})
+
+        src1_bytes = fields["src1"]
+        try:
+            src2_bytes = self.service.resolve_src2(fields.get("src2") or None, opts)
+        except Exception as e:
+            return self._failed(e)
+        hit = self.service.cached(src1_bytes, src2_bytes, opts)
+        if hit is not None:
+            with hit:
+                return self._send_file(hit, opts["output"], opts["hdr_ucet"])
+        try:
+            path = self.service.submit(src1_bytes, src2_bytes, opts).result()
+        except Exception as e:
+            return self._failed(e)
+        try:
+            with open(path, "rb") as f:
+                self.service.store(src1_bytes, src2_bytes, opts, f)
+                f.seek(0)
+                self._send_file(f, opts["output"], opts["hdr_ucet"])
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+    def _failed(self, e: Exception) -> None:
+        """Chyba zaradenia alebo workera -> HTTP odpoveď (poradie vetiev: QueueFull aj BrokenProcessPool sú RuntimeError)."""
+        retry = (("Retry-After", str(RETRY_AFTER_S)),)
+        if isinstance(e, QueueFull):
+            return self._json(429, {"error": str(e)}, retry)
+        if isinstance(e, BrokenProcessPool):
+            self.service.replace_broken_pool()
+            return self._json(503, {"error": "Worker proces spadol, skús to znova."}, retry)
+        if isinstance(e, zipfile.BadZipFile):
+            return self._json(422, {"error": f"{type(e).__name__}: {e}"})
+        if isinstance(e, RuntimeError):   # chybné vstupy (chýbajúci stĺpec, nečitateľný súbor, …)
+            return self._json(422, {"error": str(e)})
+        if isinstance(e, ValueError):
+            return self._json(400, {"error": str(e)})
+        return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _send_file(self, f, ext: str, account: str) -> None:
+        """Výstup zo súboru po blokoch STREAM_CHUNK (Content-Length je známa, klient vidí priebeh sťahovania)."""
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[ext])
+        self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="{output_name(account, ext)}"')
+        self.end_headers()
+        shutil.copyfileobj(f, self.wfile, STREAM_CHUNK)
+
+class SaldoHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, service: SaldoService, quiet: bool = False):
+        super().__init__(addr, SaldoHandler)
+        self.service = service
+        self.quiet = quiet
+
+def make_server(host: str, port: int, service: SaldoService, quiet: bool = False) -> SaldoHTTPServer:
+    """HTTP server nad službou (port 0 = voľný port, skutočný je v server.server_address)."""
+    return SaldoHTTPServer((host, port), service, quiet=quiet)
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Saldo – HTTP služba (multipart src1/src2 -> XLSX/PDF).")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Počet worker procesov.")
+    p.add_argument("--max-pending", type=int, default=None,
+                   help="Max. rozpracovaných požiadaviek (bežiace + čakajúce, predvolene 2 × workers); nad limit 429.")
+    p.add_argument("--template", default=TEMPLATE_PATH)
+    p.add_argument("--helper", default=HELPER_PATH)
+    p.add_argument("--logo", default=LOGO_PATH, help="PNG logo; prázdny reťazec = bez loga.")
+    p.add_argument("--xlsx-engine", default="stream", choices=XLSX_ENGINES, help="Predvolený, ak ho požiadavka neurčí.")
+    p.add_argument("--pdf-engine", default="canvas", choices=PDF_ENGINES, help="Predvolený, ak ho požiadavka neurčí.")
+    p.add_argument("--cache-dir", default=None, help="Adresár cache hotových výstupov (predvolene bez cache).")
+    p.add_argument("--cache-mb", type=int, default=RESULT_CACHE_MAX_BYTES // (1024 * 1024),
+                   help="Max. veľkosť cache v MB (najdlhšie nepoužité výstupy sa mažú).")
+    p.add_argument("--refs-db", default=None,
+                   help="SQLite úložisko väzieb (src2 sa doň pridáva a v ďalších požiadavkach je nepovinné).")
+    p.add_argument("--quiet", action="store_true", help="Bez logu požiadaviek.")
+    return p
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    def read(p):
+        with open(p, "rb") as f:
+            return f.read()
+    service = SaldoService(read(args.template), read(args.helper), read(args.logo) if args.logo else None,
+                           workers=args.workers, max_pending=args.max_pending or 2 * args.workers,
+                           defaults=dict(xlsx_engine=args.xlsx_engine, pdf_engine=args.pdf_engine),
+                           cache=ResultCache(args.cache_dir, args.cache_mb * 1024 * 1024) if args.cache_dir else None,
+                           refs_db=args.refs_db)
+    service.warm()
+    server = make_server(args.host, args.port, service, quiet=args.quiet)
+    print(f"Saldo služba na http://{args.host}:{server.server_address[1]} "
+          f"({service.workers} workerov, max {service.max_pending} rozpracovaných)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# tests/conftest.py
+import datetime as _dt
+import os
+import random
+import sys
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)   # moduly sú skripty v koreni repozitára (bez balíčka)
+
+import saldo_bench  # noqa: E402
+import saldo_core  # noqa: E402
+
+ACCOUNT = 700000001
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def xlsx_bytes(rows) -> bytes:
+    """Riadky (prvý = hlavička) -> XLSX bajty."""
+    wb = Workbook()
+    ws = wb.active
+    for r in rows:
+        ws.append(list(r))
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+def data_rows(xlsx: bytes, data_only: bool = True, sheet=None):
+    """Dátové riadky výpisu (za hlavičkou tabuľky) ako tuple hodnôt."""
+    wb = load_workbook(BytesIO(xlsx), data_only=data_only)
+    ws = wb[sheet] if sheet else wb.worksheets[0]
+    return [r for r in ws.iter_rows(min_row=saldo_core.HEADER_ROW + 1, values_only=True)]
+
+@pytest.fixture(scope="session")
+def template_bytes() -> bytes:
+    return _read(saldo_bench.TEMPLATE_PATH)
+
+@pytest.fixture(scope="session")
+def helper_bytes() -> bytes:
+    return _read(saldo_bench.HELPER_PATH)
+
+@pytest.fixture(scope="session")
+def logo_bytes() -> bytes:
+    return _read(saldo_bench.LOGO_PATH)
+
+@pytest.fixture(scope="session")
+def origins(helper_bytes):
+    return saldo_bench._origins(helper_bytes)
+
+@pytest.fixture(scope="session")
+def source_rows(origins):
+    """
+    Generátor riadkov src1/src2 ako v saldo_bench.make_sources, s voliteľne viacerými účtami:
+    make(rows, accounts) -> (riadky src1, riadky src2) vrátane hlavičiek.
+    """
+    def make(rows: int = 60, accounts=(ACCOUNT,), seed: int = 1):
+        rnd = random.Random(seed)
+        r1, r2 = [saldo_bench.SRC1_HEADERS], [saldo_bench.SRC2_HEADERS]
+        d0 = _dt.datetime(2023, 1, 1)
+        for i in range(rows):
+            acc = accounts[i % len(accounts)]
+            doc = 100000000 + i
+            d = d0 + _dt.timedelta(days=i)
+            r1.append([acc, doc, d, d + _dt.timedelta(days=1), d + _dt.timedelta(days=14),
+                       origins[i % len(origins)], round(rnd.uniform(-500, 500), 2)])
+            if i % 3:
+                r2.append([acc, doc, f"VBRK{900000000 + i}" if i % 5 else f"VBRK {900000000 + i}"])
+            elif i % 2:
+                r2.append([acc, doc, 900000000 + i])
+        return r1, r2
+    return make
+
+@pytest.fixture(scope="session")
+def make_sources(source_rows):
+    """make(rows, accounts) -> (src1 XLSX, src2 XLSX)."""
+    def make(rows: int = 60, accounts=(ACCOUNT,), seed: int = 1):
+        r1, r2 = source_rows(rows, accounts, seed)
+        return xlsx_bytes(r1), xlsx_bytes(r2)
+    return make
+
+@pytest.fixture(scope="session")
+def sources(make_sources):
+    return make_sources()
+
+@pytest.fixture
+def inputs(template_bytes, helper_bytes, sources):
+    """Pozičné argumenty verejného API: template, pomôcka, src1, src2, meno, SAP ID, účet."""
+    return (template_bytes, helper_bytes, *sources, "Jožko Mrkvička", "1090989", str(ACCOUNT))
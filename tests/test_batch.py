@@ -0,0 +1,104 @@
+# tests/test_batch.py – dávka po účtoch (CLI, plánovač procesov) a workbook pre viac účtov
+import os
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+import saldo_batch
+import saldo_core as sc
+from conftest import data_rows, xlsx_bytes
+
+ACCOUNTS = (700000001, 700000002, "ABC/1:[x]*")
+
+@pytest.fixture(scope="module")
+def multi(make_sources):
+    return make_sources(90, ACCOUNTS)
+
+def test_output_name_is_safe_and_unique():
+    assert saldo_batch.output_name("700000001", "pdf") == "saldo_700000001.pdf"
+    a, b = saldo_batch.output_name("123/45", "xlsx"), saldo_batch.output_name("123 45", "xlsx")
+    assert a != b and "/" not in a and " " not in b
+
+def test_plan_splits_by_account(helper_bytes, multi):
+    jobs = list(sc.plan_saldo_batch(helper_bytes, *multi))
+    assert [j.account for j in jobs] == [str(a) for a in ACCOUNTS]
+    assert [len(j.ledger) for j in jobs] == [30, 30, 30]
+    assert [j.account for j in sc.plan_saldo_batch(helper_bytes, *multi, accounts=["700000002"])] == ["700000002"]
+
+def test_batch_account_equals_single_account_statement(template_bytes, helper_bytes, multi, source_rows):
+    r1, _ = source_rows(90, ACCOUNTS)
+    only = [r1[0]] + [r for r in r1[1:] if r[0] == 700000002]
+    single = sc.generate_saldo_document(template_bytes, helper_bytes, xlsx_bytes(only), multi[1], "", "",
+                                        "700000002", balance_mode="value")
+    batch = dict(sc.generate_saldo_batch(template_bytes, helper_bytes, *multi, outputs=("xlsx",),
+                                         balance_mode="value"))
+    assert data_rows(batch["700000002"]["xlsx"]) == data_rows(single)
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_batch_writes_every_account(template_bytes, helper_bytes, multi, tmp_path, jobs):
+    results = list(saldo_batch.run_batch(template_bytes, helper_bytes, *multi, str(tmp_path), jobs=jobs,
+                                         pdf_engine="canvas"))
+    assert sorted(r.account for r in results) == sorted(str(a) for a in ACCOUNTS)
+    assert all(r.error is None and len(r.files) == 2 for r in results)
+    names = {n for r in results for n in r.files}
+    assert names == set(os.listdir(tmp_path))
+    assert not [n for n in names if n.endswith(".part")]
+
+def test_run_batch_reports_account_error_and_continues(template_bytes, helper_bytes, multi, tmp_path, monkeypatch):
+    real = saldo_batch.render_account
+
+    def render(tpl, template_bytes, job, **kw):
+        if job.account == "700000002":
+            raise RuntimeError("chybný účet")
+        return real(tpl, template_bytes, job, **kw)
+
+    monkeypatch.setattr(saldo_batch, "render_account", render)
+    results = {r.account: r for r in saldo_batch.run_batch(template_bytes, helper_bytes, *multi, str(tmp_path),
+                                                            outputs=("xlsx",))}
+    assert results["700000002"].error == "RuntimeError: chybný účet"
+    assert results["700000001"].error is None and results["700000001"].files
+
+def test_cli_writes_per_account_files(multi, tmp_path):
+    src1, src2 = tmp_path / "src1.xlsx", tmp_path / "src2.xlsx"
+    src1.write_bytes(multi[0]); src2.write_bytes(multi[1])
+    out = tmp_path / "out"
+    rc = saldo_batch.main(["--src1", str(src1), "--src2", str(src2), "--out", str(out), "--jobs", "1",
+                           "--outputs", "xlsx", "--account", "700000001"])
+    assert rc == 0
+    assert os.listdir(out) == ["saldo_700000001.xlsx"]
+
+def test_workbook_has_summary_and_sheet_per_account(template_bytes, helper_bytes, multi):
+    data = sc.generate_saldo_workbook(template_bytes, helper_bytes, *multi, balance_mode="value")
+    wb = load_workbook(BytesIO(data), data_only=True)
+    assert wb.sheetnames[0] == sc.SUMMARY_SHEET and len(wb.sheetnames) == 1 + len(ACCOUNTS)
+    summary = [r for r in wb[sc.SUMMARY_SHEET].iter_rows(min_row=4, values_only=True)]
+    batch = dict(sc.generate_saldo_batch(template_bytes, helper_bytes, *multi, outputs=("xlsx",),
+                                         xlsx_engine="stream", balance_mode="value"))
+    for (acc, _, _, count, closing), sheet in zip(summary, wb.sheetnames[1:]):
+        rows = data_rows(data, sheet=sheet)
+        assert rows == data_rows(batch[str(acc)]["xlsx"])
+        assert count == len(rows) and closing == pytest.approx(rows[-1][-1])
+    assert summary[-1][0] == "Spolu" and summary[-1][3] == 90
+    assert wb[sc.SUMMARY_SHEET]["A4"].hyperlink.location == f"'{wb.sheetnames[1]}'!A1"
+
+def test_workbook_without_accounts_is_runtime_error(template_bytes, helper_bytes, multi):
+    with pytest.raises(RuntimeError):
+        sc.generate_saldo_workbook(template_bytes, helper_bytes, *multi, accounts=["neexistuje"])
+
+def test_killed_worker_fails_only_its_account(template_bytes, helper_bytes, multi, tmp_path, monkeypatch):
+    real = saldo_batch.render_account
+
+    def render(tpl, template_bytes, job, **kw):
+        if job.account == "700000002":
+            os._exit(1)                 # pád workera (napr. OOM killer) – pool sa rozbije
+        return real(tpl, template_bytes, job, **kw)
+
+    monkeypatch.setattr(saldo_batch, "render_account", render)     # fork pool zdedí náhradu
+    results = {r.account: r for r in saldo_batch.run_batch(template_bytes, helper_bytes, *multi, str(tmp_path),
+                                                            jobs=2, outputs=("xlsx",))}
+    assert sorted(results) == sorted(str(a) for a in ACCOUNTS)
+    assert results["700000002"].error.startswith("BrokenProcessPool") and not results["700000002"].files
+    for acc in ("700000001", "ABC/1:[x]*"):
+        assert results[acc].error is None and len(results[acc].files) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(f for r in results.values() for f in r.files)
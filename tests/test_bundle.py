@@ -0,0 +1,116 @@
+# tests/test_bundle.py – jedno parsovanie, cache kompilácie, ledger, XLSX enginy a zostatok
+import zipfile
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+import saldo_core as sc
+from conftest import data_rows
+
+def test_bundle_emits_requested_outputs_from_one_parse(inputs):
+    stats = sc.SaldoStats()
+    out = sc.generate_saldo_bundle(*inputs, stats=stats)
+    assert set(out) == {"xlsx", "pdf"}
+    assert out["xlsx"][:2] == b"PK" and out["pdf"][:4] == b"%PDF"
+    assert [r["stage"] for r in stats.records].count("src1") == 1
+    assert set(sc.generate_saldo_bundle(*inputs, outputs=("pdf",))) == {"pdf"}
+
+def test_bundle_matches_single_document(inputs):
+    bundle = sc.generate_saldo_bundle(*inputs, outputs=("xlsx",))
+    single = sc.generate_saldo_document(*inputs, output="xlsx")
+    assert data_rows(bundle["xlsx"], data_only=False) == data_rows(single, data_only=False)
+
+@pytest.mark.parametrize("kw", [dict(outputs=("docx",)), dict(xlsx_engine="x"), dict(balance_mode="x"),
+                                dict(pdf_engine="x")])
+def test_unknown_option_is_value_error(inputs, kw):
+    with pytest.raises(ValueError):
+        sc.generate_saldo_bundle(*inputs, **kw)
+
+def test_compiled_cache_by_content(template_bytes, helper_bytes):
+    sc.clear_compiled_cache()
+    first = sc.compile_template(template_bytes)
+    assert sc.compile_template(bytes(template_bytes)) is first
+    sc.compile_helper(helper_bytes)
+    info = sc.compiled_cache_info()
+    assert (info["hits"], info["misses"], info["size"]) == (1, 2, 2)
+    sc.clear_compiled_cache()
+    assert sc.compiled_cache_info()["size"] == 0
+
+def test_template_without_required_column(template_bytes):
+    wb = load_workbook(BytesIO(template_bytes))
+    ws = wb.worksheets[0]
+    for c in ws[sc.HEADER_ROW]:
+        if c.value == "Zostatok":
+            c.value = "Iné"
+    buf = BytesIO()
+    wb.save(buf)
+    with pytest.raises(RuntimeError, match="Zostatok"):
+        sc.compile_template(buf.getvalue())
+
+def test_ledger_balance_and_invoices(template_bytes, helper_bytes, sources, source_rows):
+    _, ledger = sc.prepare_saldo(template_bytes, helper_bytes, *sources)
+    r1, r2 = source_rows()
+    amounts = [r[6] for r in r1[1:]]
+    assert len(ledger) == len(amounts)
+    assert list(ledger.bal) == pytest.approx([sum(amounts[:i+1]) for i in range(len(amounts))])
+    assert ledger.closing_balance == pytest.approx(sum(amounts))
+    refs = {r[1]: str(r[2]).replace("VBRK", "").strip() for r in r2[1:]}
+    for doc, inv, dz, du, sn, typ, amt, bal in ledger.rows():
+        if typ == "Faktúra":
+            assert inv == (refs.get(doc) or None)
+        else:
+            assert inv is None and sn is None
+
+def test_ledger_missing_amount_counts_as_zero():
+    led = sc.Ledger(opening=10.0)
+    code = led.type_code("Platba")
+    led.append(1, None, None, None, None, code, 5.0)
+    led.append(2, None, None, None, None, code, None)
+    led.compute_balance()
+    assert list(led.bal) == [15.0, 15.0]
+    assert [r[6] for r in led.rows()] == [5.0, None]
+
+def test_xlsx_engines_write_same_values(inputs):
+    tpl = sc.generate_saldo_document(*inputs, xlsx_engine="template", balance_mode="value")
+    stream = sc.generate_saldo_document(*inputs, xlsx_engine="stream", balance_mode="value")
+    assert data_rows(tpl) == data_rows(stream)
+    ws = load_workbook(BytesIO(stream)).worksheets[0]
+    assert [ws.cell(row=i, column=2).value for i in range(1, 5)] == ["1090989", "Jožko Mrkvička", "SWAN a.s.",
+                                                                    inputs[-1]]
+
+@pytest.mark.parametrize("engine", sc.XLSX_ENGINES)
+def test_balance_modes(inputs, template_bytes, helper_bytes, sources, engine):
+    _, ledger = sc.prepare_saldo(template_bytes, helper_bytes, *sources)
+    bal_col = sc.compile_template(template_bytes).cols["bal"] - 1
+    expected = pytest.approx(list(ledger.bal))
+
+    formula = sc.generate_saldo_document(*inputs, xlsx_engine=engine, balance_mode="formula")
+    assert all(str(r[bal_col]).startswith("=") for r in data_rows(formula, data_only=False))
+    assert all(r[bal_col] is None for r in data_rows(formula))     # bez uložených hodnôt
+
+    value = sc.generate_saldo_document(*inputs, xlsx_engine=engine, balance_mode="value")
+    assert [r[bal_col] for r in data_rows(value, data_only=False)] == expected
+
+    both = sc.generate_saldo_document(*inputs, xlsx_engine=engine, balance_mode="both")
+    assert [r[bal_col] for r in data_rows(both, data_only=False)] == [r[bal_col] for r in data_rows(formula, False)]
+    assert [r[bal_col] for r in data_rows(both)] == expected
+
+@pytest.mark.parametrize("engine", sc.XLSX_ENGINES)
+def test_named_styles_do_not_grow_with_rows(template_bytes, helper_bytes, make_sources, engine):
+    def xfs(rows):
+        data = sc.generate_saldo_document(template_bytes, helper_bytes, *make_sources(rows), "M", "S", "U",
+                                          xlsx_engine=engine)
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            styles = zf.read("xl/styles.xml")
+        return styles.count(b"<xf "), data
+
+    small, _ = xfs(10)
+    large, data = xfs(300)
+    assert small == large
+    ws = load_workbook(BytesIO(data)).worksheets[0]
+    cols = sc.compile_template(template_bytes).cols
+    cell = ws.cell(row=sc.HEADER_ROW + 1, column=cols["amt"])
+    assert cell.number_format == sc.XLSX_MONEY_FMT and cell.style == "Saldo suma"
+    assert ws.cell(row=sc.HEADER_ROW + 1, column=cols["dz"]).number_format == sc.DATE_FMT
+    assert ws.conditional_formatting   # zebra ako podmienené formátovanie
@@ -0,0 +1,71 @@
+# tests/test_cache.py – ResultCache na disku: hit/miss, LRU pri limite, kľúč podľa verzie kódu
+import os
+
+import pytest
+
+import saldo_core as sc
+
+def _name(i: int, ext: str = "xlsx") -> str:
+    return f"{i:064x}.{ext}"
+
+def test_hit_and_miss(tmp_path):
+    cache = sc.ResultCache(str(tmp_path))
+    assert cache.get(_name(1)) is None
+    cache.put(_name(1), b"obsah")
+    assert cache.get(_name(1)) == b"obsah"
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["writes"], info["entries"], info["bytes"]) == (1, 1, 1, 1, 5)
+    cache.clear()
+    assert cache.get(_name(1)) is None and cache.info()["entries"] == 0
+
+def test_evicts_least_recently_used_at_cap(tmp_path):
+    cache = sc.ResultCache(str(tmp_path), max_bytes=30)
+    for i in range(3):
+        cache.put(_name(i), b"x" * 10)
+        os.utime(tmp_path / _name(i), (1000 + i, 1000 + i))
+    assert cache.get(_name(0)) is not None          # hit obnoví mtime – najstaršia je teraz položka 1
+    cache.put(_name(3), b"y" * 10)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [_name(0), _name(2), _name(3)]
+    info = cache.info()
+    assert (info["evictions"], info["bytes"]) == (1, 30)
+
+def test_too_large_is_not_stored(tmp_path):
+    cache = sc.ResultCache(str(tmp_path), max_bytes=4)
+    cache.put(_name(1), b"12345")
+    with open(tmp_path / "src", "wb+") as f:
+        f.write(b"12345")
+        f.seek(0)
+        cache.put_file(_name(2), f)
+    assert cache.info()["writes"] == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["src"]       # ani .part nezostal
+
+def test_invalid_key_and_limit(tmp_path):
+    cache = sc.ResultCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.get("../mimo.xlsx")
+    with pytest.raises(ValueError):
+        sc.ResultCache(str(tmp_path), max_bytes=-1)
+
+def test_document_served_from_cache(inputs, tmp_path, monkeypatch):
+    cache = sc.ResultCache(str(tmp_path))
+    calls = []
+    bundle = sc.generate_saldo_bundle
+    monkeypatch.setattr(sc, "generate_saldo_bundle", lambda *a, **k: calls.append(k["theme"]) or bundle(*a, **k))
+    first = sc.generate_saldo_document(*inputs, cache=cache)
+    assert sc.generate_saldo_document(*inputs, cache=cache) == first
+    sc.generate_saldo_document(*inputs, theme="gray", cache=cache)       # iné voľby = iný kľúč
+    assert calls == ["blue", "gray"]
+    assert (cache.info()["hits"], cache.info()["misses"]) == (1, 2)
+
+def test_code_version_change_invalidates(inputs, tmp_path, monkeypatch):
+    template_bytes, helper_bytes, src1, src2, *hdr = inputs
+    cache = sc.ResultCache(str(tmp_path))
+    key = sc.document_key(template_bytes, helper_bytes, src1, src2)
+    sc.generate_saldo_document(*inputs, cache=cache)
+    assert cache.info()["entries"] == 1
+
+    monkeypatch.setattr(sc, "_code_version_value", "iná verzia")
+    assert sc.document_key(template_bytes, helper_bytes, src1, src2) != key
+    sc.generate_saldo_document(*inputs, cache=cache)
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["entries"]) == (0, 2, 2)
@@ -0,0 +1,65 @@
+# tests/test_increment.py – prírastok: pripísané saldo == saldo vygenerované znova z celej histórie
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+import saldo_core as sc
+from conftest import data_rows, xlsx_bytes
+
+HDR = ("Jožko Mrkvička", "1090989", "700000001")
+SPLIT, OVERLAP = 26, 4       # prvé saldo má 26 pohybov, nový export začína 4 pohybmi skôr (prekryv)
+
+@pytest.fixture(scope="module")
+def history(source_rows):
+    r1, r2 = source_rows(40)
+    return xlsx_bytes(r1), xlsx_bytes(r1[:1 + SPLIT]), xlsx_bytes([r1[0]] + r1[1 + SPLIT - OVERLAP:]), xlsx_bytes(r2)
+
+def _styles(xlsx: bytes):
+    ws = load_workbook(BytesIO(xlsx)).worksheets[0]
+    return [[(c.number_format, c.fill.fgColor.rgb, c.border.left.style) for c in row]
+            for row in ws.iter_rows(min_row=sc.HEADER_ROW + 1)]
+
+@pytest.mark.parametrize("engine", sc.XLSX_ENGINES)
+@pytest.mark.parametrize("mode", sc.BALANCE_MODES)
+def test_appended_equals_regenerated(template_bytes, helper_bytes, history, engine, mode):
+    full_src1, first_src1, new_src1, src2 = history
+    kw = dict(outputs=("xlsx",), xlsx_engine=engine, balance_mode=mode)
+    full = sc.generate_saldo_bundle(template_bytes, helper_bytes, full_src1, src2, *HDR, **kw)["xlsx"]
+    first = sc.generate_saldo_bundle(template_bytes, helper_bytes, first_src1, src2, *HDR, **kw)["xlsx"]
+    res = sc.generate_saldo_increment(template_bytes, helper_bytes, new_src1, src2, *HDR, previous_xlsx=first, **kw)
+
+    appended = res["xlsx"]
+    assert len(data_rows(appended)) == 40
+    assert data_rows(appended, data_only=False) == data_rows(full, data_only=False)
+    if mode != "formula":
+        # uložené hodnoty zostatku (pri "formula" ich regenerované saldo nemá, pripísané riadky áno)
+        assert data_rows(appended) == data_rows(full)
+    assert _styles(appended) == _styles(full)
+    ws = load_workbook(BytesIO(appended)).worksheets[0]
+    assert ws.max_row == sc.HEADER_ROW + 40
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == \
+        [str(cf.sqref) for cf in load_workbook(BytesIO(full)).worksheets[0].conditional_formatting]
+
+    # ďalší prírastok nadväzuje rovnako, či sa snapshot číta z JSON, pripísaného alebo nového salda
+    expected = sc.snapshot_from_xlsx(full, template_bytes)
+    for snap in (sc.SaldoSnapshot.from_json(res["snapshot"]), sc.snapshot_from_xlsx(appended, template_bytes)):
+        assert (snap.rows, snap.last_doc) == (40, expected.last_doc)
+        assert snap.closing_balance == pytest.approx(expected.closing_balance)
+
+def test_increment_from_snapshot_continues_balance(template_bytes, helper_bytes, history):
+    full_src1, first_src1, new_src1, src2 = history
+    first = sc.generate_saldo_document(template_bytes, helper_bytes, first_src1, src2, *HDR)
+    base = sc.snapshot_from_xlsx(first, template_bytes)
+    res = sc.generate_saldo_increment(template_bytes, helper_bytes, new_src1, src2, *HDR,
+                                      snapshot=sc.SaldoSnapshot.from_json(base.to_json()), balance_mode="value")
+    _, ledger = sc.prepare_saldo(template_bytes, helper_bytes, full_src1, src2)
+    bal_col = sc.compile_template(template_bytes).cols["bal"] - 1
+    assert [r[bal_col] for r in data_rows(res["xlsx"])] == pytest.approx(list(ledger.bal[SPLIT:]))
+    assert res["pdf"][:4] == b"%PDF"
+
+def test_increment_needs_a_base(template_bytes, helper_bytes, history):
+    with pytest.raises(ValueError):
+        sc.generate_saldo_increment(template_bytes, helper_bytes, history[2], history[3], *HDR)
+    with pytest.raises(RuntimeError):
+        sc.append_saldo_xlsx(b"nie je zip", template_bytes, sc.Ledger())
@@ -0,0 +1,109 @@
+# tests/test_inputs.py – zdroje XLSX / CSV / Parquet (detekcia formátu, typy hodnôt, rovnaký ledger)
+import csv
+import datetime as _dt
+from io import BytesIO, StringIO
+
+import pytest
+
+import saldo_core as sc
+from conftest import xlsx_bytes
+
+COMMA, DOT = sc._CSV_NUM_COMMA, sc._CSV_NUM_DOT
+
+@pytest.mark.parametrize("text, num_re, value", [
+    ("", COMMA, None),
+    ("  ", COMMA, None),
+    ("Faktúra", COMMA, "Faktúra"),
+    ("05.03.2024", COMMA, _dt.datetime(2024, 3, 5)),
+    ("2024-03-05", DOT, _dt.datetime(2024, 3, 5)),
+    ("2024-03-05 10:20:30", DOT, _dt.datetime(2024, 3, 5, 10, 20, 30)),
+    ("31.02.2024", COMMA, "31.02.2024"),          # neplatný dátum ostane textom
+    ("1 234,50", COMMA, 1234.5),
+    ("1.234,50-", COMMA, -1234.5),                # SAP: mínus na konci
+    ("-12,5", COMMA, -12.5),
+    ("1,234.50", DOT, 1234.5),
+    ("-0.75", DOT, -0.75),
+    ("700000001", COMMA, 700000001),
+    ("007", COMMA, "007"),                        # vedúca nula = identifikátor
+    ("-5-", COMMA, "-5-"),
+    ("12,5", DOT, "12,5"),
+])
+def test_csv_value(text, num_re, value):
+    assert sc._csv_value(text, num_re) == value
+
+@pytest.mark.parametrize("data, fmt", [
+    (b"PK\x03\x04rest", "xlsx"),
+    (b"PAR1....PAR1", "parquet"),
+    (b"a;b\n1;2\n", "csv"),
+    ("a;b\n".encode("utf-16"), "csv"),
+])
+def test_source_format(data, fmt):
+    assert sc.source_format(data) == fmt
+
+@pytest.mark.parametrize("data", [b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1old", b"%PDF-1.4", b"\x89PNG", b"a\x00b"])
+def test_source_format_rejects_binary(data):
+    with pytest.raises(RuntimeError, match="Nepodporovaný"):
+        sc.source_format(data)
+
+def _csv(rows, sap: bool) -> bytes:
+    """SAP export (';', desatinná čiarka, mínus vzadu, dd.mm.rrrr, cp1250) alebo bežné CSV (',', ISO, UTF-8)."""
+    out = StringIO()
+    w = csv.writer(out, delimiter=";" if sap else ",")
+    for r in rows:
+        cells = []
+        for v in r:
+            if isinstance(v, _dt.datetime):
+                cells.append(v.strftime("%d.%m.%Y") if sap else v.date().isoformat())
+            elif isinstance(v, float):
+                s = f"{abs(v):,.2f}"
+                cells.append(s.replace(",", " ").replace(".", ",") + ("-" if v < 0 else "") if sap
+                             else ("-" if v < 0 else "") + s)
+            else:
+                cells.append("" if v is None else v)
+        w.writerow(cells)
+    return out.getvalue().encode("cp1250" if sap else "utf-8")
+
+def _parquet(rows) -> bytes:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    cols = []
+    for c in zip(*rows[1:]):
+        types = {type(v) for v in c if v is not None}
+        cols.append(list(c) if len(types) <= 1 else [None if v is None else str(v) for v in c])
+    buf = BytesIO()
+    pq.write_table(pa.table(dict(zip(rows[0], cols))), buf)
+    return buf.getvalue()
+
+@pytest.fixture(scope="module")
+def reference(template_bytes, helper_bytes, source_rows):
+    r1, r2 = source_rows(60)
+    _, ledger = sc.prepare_saldo(template_bytes, helper_bytes, xlsx_bytes(r1), xlsx_bytes(r2))
+    return r1, r2, list(ledger.rows())
+
+@pytest.mark.parametrize("encode", [lambda r: _csv(r, sap=True), lambda r: _csv(r, sap=False), _parquet],
+                         ids=["sap_csv", "csv", "parquet"])
+def test_every_format_gives_same_ledger(template_bytes, helper_bytes, reference, encode):
+    r1, r2, expected = reference
+    src1, src2 = encode(r1), encode(r2)
+    _, ledger = sc.prepare_saldo(template_bytes, helper_bytes, src1, src2)
+    assert list(ledger.rows()) == expected
+
+def test_csv_format_overrides_detection():
+    data = b"Doklad;Suma\n1;1.250\n"
+    assert list(sc._iter_source_rows(data)) == [("Doklad", "Suma"), (1, 1250)]     # ';' -> desatinná čiarka
+    assert list(sc._iter_source_rows(data, csv_format=sc.CsvFormat(decimal_comma=False)))[1] == (1, 1.25)
+    assert list(sc._iter_source_rows(data, csv_format=sc.CsvFormat(delimiter=",")))[0] == ("Doklad;Suma",)
+    assert list(sc._iter_source_rows(b"a,b\n1,5\n"))[1] == (1, 5)                 # ',' -> desatinná bodka
+    latin = "Doklad;Pôvod\n1;Faktúra\n".encode("cp1250")
+    assert list(sc._iter_source_rows(latin))[1] == (1, "Faktúra")
+
+def test_csv_tab_and_bom():
+    data = "﻿Číslo dokladu\tČiastka\n1\t1 234,5\n".encode("utf-8")
+    rows = list(sc._iter_source_rows(data))
+    assert rows == [("Číslo dokladu", "Čiastka"), (1, 1234.5)]
+
+def test_missing_src1_column_is_runtime_error(template_bytes, helper_bytes, source_rows):
+    r1, r2 = source_rows(5)
+    without_amount = [r[:-1] for r in r1]
+    with pytest.raises(RuntimeError, match="Čiastka"):
+        sc.prepare_saldo(template_bytes, helper_bytes, xlsx_bytes(without_amount), xlsx_bytes(r2))
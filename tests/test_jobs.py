@@ -0,0 +1,92 @@
+# tests/test_jobs.py – generovanie na pozadí pre Streamlit (JobRunner)
+import datetime as _dt
+import threading
+import time
+
+import pytest
+
+import saldo_jobs
+from saldo_core import STAGES
+
+def _wait(job, timeout: float = 60.0):
+    end = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < end, "úloha nedobehla"
+        time.sleep(0.01)
+    if job.error is not None:
+        raise job.error
+    return job
+
+def test_job_runs_all_stages(inputs):
+    runner = saldo_jobs.JobRunner(workers=1)
+    job = _wait(runner.submit(*inputs))
+    assert job.done == list(STAGES) and job.stage is None and job.fraction == 1.0
+    assert job.results["xlsx"][:2] == b"PK" and job.results["pdf"][:4] == b"%PDF"
+
+def test_same_request_is_served_from_cache(inputs, monkeypatch):
+    runner = saldo_jobs.JobRunner(workers=1)
+    first = _wait(runner.submit(*inputs))
+    monkeypatch.setattr(saldo_jobs, "prepare_saldo", pytest.fail)
+    monkeypatch.setattr(saldo_jobs, "render_account", pytest.fail)
+    again = _wait(runner.submit(*inputs))
+    assert again.results == first.results
+
+def test_new_theme_reuses_ledger(inputs, monkeypatch):
+    runner = saldo_jobs.JobRunner(workers=1)
+    _wait(runner.submit(*inputs))
+    monkeypatch.setattr(saldo_jobs, "prepare_saldo", pytest.fail)
+    job = _wait(runner.submit(*inputs, theme="warm"))
+    assert set(job.results) == {"xlsx", "pdf"}
+
+def test_next_day_renders_only_pdf(inputs, monkeypatch):
+    runner = saldo_jobs.JobRunner(workers=1)
+    first = _wait(runner.submit(*inputs))
+    rendered = []
+    real = saldo_jobs.render_account
+
+    def render(*a, outputs, **kw):
+        rendered.extend(outputs)
+        return real(*a, outputs=outputs, **kw)
+
+    class Tomorrow(_dt.date):
+        @classmethod
+        def today(cls):
+            return _dt.date.today() + _dt.timedelta(days=1)
+
+    monkeypatch.setattr(saldo_jobs, "render_account", render)
+    monkeypatch.setattr(saldo_jobs, "date", Tomorrow)
+    job = _wait(runner.submit(*inputs))
+    assert rendered == ["pdf"]
+    assert job.results["xlsx"] is first.results["xlsx"]
+
+def test_queue_full(inputs, monkeypatch):
+    gate = threading.Event()
+    real = saldo_jobs.prepare_saldo
+
+    def slow(*a, **kw):
+        gate.wait(30)
+        return real(*a, **kw)
+
+    monkeypatch.setattr(saldo_jobs, "prepare_saldo", slow)
+    runner = saldo_jobs.JobRunner(workers=1, max_pending=1)
+    job = runner.submit(*inputs)
+    with pytest.raises(saldo_jobs.QueueFull):
+        runner.submit(*inputs)
+    gate.set()
+    _wait(job)
+    # miesto vo fronte sa uvoľní po skončení (callback future môže dobehnúť chvíľu po job.finished)
+    end = time.monotonic() + 10
+    while True:
+        try:
+            _wait(runner.submit(*inputs))
+            break
+        except saldo_jobs.QueueFull:
+            assert time.monotonic() < end
+            time.sleep(0.01)
+
+def test_error_is_recorded_on_job(inputs):
+    runner = saldo_jobs.JobRunner(workers=1)
+    job = runner.submit(inputs[0], inputs[1], b"nie je to XLSX ani CSV\x00", *inputs[3:])
+    with pytest.raises(RuntimeError):
+        _wait(job)
+    assert job.finished and not job.results
@@ -0,0 +1,55 @@
+# tests/test_output.py – výstup do súboru, spoolu a po blokoch (ohraničená pamäť)
+import os
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+import saldo_core as sc
+from conftest import data_rows
+
+def test_write_to_path_and_file(inputs, tmp_path):
+    expected = data_rows(sc.generate_saldo_document(*inputs), data_only=False)
+    path = tmp_path / "saldo.xlsx"
+    sc.write_saldo_document(path, *inputs)
+    assert data_rows(path.read_bytes(), data_only=False) == expected
+    assert os.listdir(tmp_path) == ["saldo.xlsx"]
+    assert path.stat().st_mode & 0o777 == 0o644
+    buf = BytesIO(b"xx")
+    buf.seek(2)
+    sc.write_saldo_document(buf, *inputs)
+    assert data_rows(buf.getvalue()[2:], data_only=False) == expected
+
+def test_failed_write_leaves_no_file(inputs, tmp_path):
+    path = tmp_path / "saldo.xlsx"
+    path.write_bytes(b"old")
+    with pytest.raises(RuntimeError):
+        sc.write_saldo_document(path, inputs[0], inputs[1], b"\x00\x01binary", *inputs[3:])
+    assert os.listdir(tmp_path) == ["saldo.xlsx"] and path.read_bytes() == b"old"
+
+def test_atomic_output_replaces_only_on_success(tmp_path):
+    dest = tmp_path / "out.bin"
+    with sc.atomic_output(dest) as f:
+        f.write(b"ok")
+        assert not dest.exists()
+    assert dest.read_bytes() == b"ok"
+    with pytest.raises(KeyError), sc.atomic_output(dest) as f:
+        f.write(b"polovica")
+        raise KeyError
+    assert os.listdir(tmp_path) == ["out.bin"] and dest.read_bytes() == b"ok"
+
+@pytest.mark.parametrize("output", sc.OUTPUTS)
+def test_spool_and_chunks(inputs, output):
+    with sc.spool_saldo_document(*inputs, output=output, spool_max_size=1024) as f:
+        assert f._rolled                           # väčší výstup je na disku, nie v pamäti
+        spooled = f.read()
+    chunks = list(sc.iter_saldo_document(*inputs, output=output, chunk_size=4096))
+    assert all(len(c) <= 4096 for c in chunks)
+    if output == "pdf":
+        assert len(PdfReader(BytesIO(b"".join(chunks))).pages) == len(PdfReader(BytesIO(spooled)).pages)
+    else:
+        assert data_rows(b"".join(chunks), data_only=False) == data_rows(spooled, data_only=False)
+
+def test_iter_reports_input_errors_at_call(inputs):
+    with pytest.raises(RuntimeError):
+        sc.iter_saldo_document(inputs[0], inputs[1], b"\x00\x01binary", *inputs[3:])
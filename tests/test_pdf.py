@@ -0,0 +1,96 @@
+# tests/test_pdf.py – PDF enginy, stránkovanie, teplý kontext a reporting layout
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+import saldo_core as sc
+from reporting import saldo_pdf_layout as layout
+
+def _pages(pdf: bytes):
+    return [p.extract_text() for p in PdfReader(BytesIO(pdf)).pages]
+
+@pytest.fixture(scope="module")
+def large(template_bytes, helper_bytes, make_sources):
+    """Výpis na viac strán (pozičné argumenty API)."""
+    return (template_bytes, helper_bytes, *make_sources(300), "M", "S", "700000001")
+
+@pytest.mark.parametrize("engine", sc.PDF_ENGINES)
+def test_every_engine_writes_full_statement(large, engine):
+    pages = _pages(sc.generate_saldo_document(*large, output="pdf", pdf_engine=engine, pdf_workers=1))
+    assert len(pages) > 1
+    assert "Súčet" in pages[-1] and "Súčet" not in "".join(pages[:-1])
+    assert "100000299" in pages[-1]
+
+def test_chunked_paginates_like_platypus(large):
+    plain = _pages(sc.generate_saldo_document(*large, output="pdf", pdf_engine="platypus"))
+    chunked = _pages(sc.generate_saldo_document(*large, output="pdf", pdf_engine="chunked"))
+    assert chunked == plain
+
+def test_chunked_row_heights_match_platypus(large, monkeypatch):
+    """Vopred zmerané rowHeights sa zhodujú s tým, čo by Table nameral sám (Table._calc)."""
+    import reportlab.platypus as rp
+    table_cls, chunks = rp.Table, []
+
+    class Spy(table_cls):
+        def __init__(self, data, *a, **kw):
+            super().__init__(data, *a, **kw)
+            if kw.get("rowHeights"):
+                chunks.append((data, kw["rowHeights"]))
+
+    monkeypatch.setattr(rp, "Table", Spy)
+    sc.generate_saldo_document(*large, output="pdf", pdf_engine="chunked")
+    monkeypatch.setattr(rp, "Table", table_cls)
+    assert len(chunks) > 1
+    for data, heights in chunks:
+        t = table_cls(data, colWidths=sc.PDF_COL_WIDTHS)
+        t.setStyle(sc.pdf_context().table_style("blue"))
+        t.wrap(1e4, 1e6)
+        assert t._rowHeights == pytest.approx(heights)
+
+def test_parallel_equals_canvas(large, monkeypatch):
+    monkeypatch.setattr(sc, "PDF_PARALLEL_MIN_ROWS", 0)
+    canvas = _pages(sc.generate_saldo_document(*large, output="pdf", pdf_engine="canvas"))
+    parallel = _pages(sc.generate_saldo_document(*large, output="pdf", pdf_engine="parallel", pdf_workers=2))
+    assert parallel == canvas
+
+def test_paginate_rows():
+    assert sc.paginate_rows([10] * 5, 5, 100, 100) == [(0, 5)]
+    assert sc.paginate_rows([10] * 5, 5, 26, 36) == [(0, 2), (2, 5)]
+    # na prvú stranu sa nezmestí hlavička ani s jedným riadkom -> prvá strana bez tabuľky
+    assert sc.paginate_rows([10] * 3, 5, 12, 40) == [(0, 0), (0, 3)]
+
+def test_warm_context_is_shared_and_caches_logo(logo_bytes):
+    ctx = sc.warm_pdf_context(logo_bytes)
+    assert ctx is sc.pdf_context()
+    small = ctx.logo(logo_bytes)
+    assert ctx.logo(logo_bytes) is small
+    assert ctx.table_style("gray", False) is ctx.table_style("gray", False)
+    assert ctx.table_style("neznáma") is ctx.table_style("blue")
+
+def test_reporting_dates_same_from_xlsx_and_ledger(inputs, tmp_path):
+    xlsx = tmp_path / "saldo.xlsx"
+    xlsx.write_bytes(sc.generate_saldo_document(*inputs, balance_mode="value"))
+    _, ledger = sc.prepare_saldo(*inputs[:4])
+    hdr_x, rows_x, _ = layout._table_from_xls(str(xlsx))
+    hdr_l, rows_l, _ = layout._table_from_ledger(ledger)
+    date_x = [i for i, h in enumerate(hdr_x) if layout._is_date_col(h)]
+    date_l = [i for i, h in enumerate(hdr_l) if layout._is_date_col(h)]
+    assert len(date_x) == len(date_l) == 3
+    assert [[r[i] for i in date_x] for r in rows_x] == [[r[i] for i in date_l] for r in rows_l]
+    assert rows_l[0][2] == "01-01-23"
+
+@pytest.mark.parametrize("value, text", [("2024-03-05", "05-03-24"), ("05.03.2024", "05-03-24"),
+                                         ("2024-03-05 00:00:00", "05-03-24"), (None, ""), ("iné", "iné")])
+def test_reporting_fmt_date(value, text):
+    assert layout._fmt_date(value) == text
+
+def test_render_saldo_pdf_from_ledger(inputs, logo_bytes, tmp_path):
+    _, ledger = sc.prepare_saldo(*inputs[:4])
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(logo_bytes)
+    out = tmp_path / "out.pdf"
+    layout.render_saldo_pdf(None, str(logo), str(out), ledger=ledger, chunked=True,
+                            customer={"SAP ID": "1090989", "Meno zákazníka": "Test", "Zmluvný účet": "700000001"})
+    text = "".join(_pages(out.read_bytes()))
+    assert "1090989" in text and "01-01-23" in text
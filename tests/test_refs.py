@@ -0,0 +1,54 @@
+# tests/test_refs.py – SQLite úložisko väzieb (Doplnková referencia)
+import pytest
+
+import saldo_core as sc
+from conftest import data_rows, xlsx_bytes
+
+@pytest.fixture
+def store(tmp_path):
+    s = sc.RefStore(str(tmp_path / "vazby.sqlite3"))
+    yield s
+    s.close()
+
+def test_ingest_is_incremental_and_idempotent(store, sources, source_rows):
+    _, r2 = source_rows()
+    assert len(store) == 0 and store.revision == 0
+    assert store.ingest(sources[1]) == len(r2) - 1
+    assert store.known(sources[1]) and store.revision == 1
+    assert store.ingest(sources[1]) == 0 and store.revision == 1     # rovnaký súbor sa nespracúva
+    doc = r2[1][1]
+    changed = xlsx_bytes([r2[0], [r2[1][0], doc, "VBRK 1"]])
+    assert store.ingest(changed) == 1 and store.revision == 2
+    assert store.lookup([str(doc), "neznámy"]) == {str(doc): "1"}
+    assert store.info() == {"docs": len(r2) - 1, "sources": 2, "revision": 2}
+
+def test_statement_from_store_equals_statement_from_src2(store, inputs):
+    expected = data_rows(sc.generate_saldo_document(*inputs, balance_mode="value"))
+    template_bytes, helper_bytes, src1, src2, *hdr = inputs
+    first = sc.generate_saldo_document(template_bytes, helper_bytes, src1, src2, *hdr, balance_mode="value",
+                                       ref_store=store)
+    later = sc.generate_saldo_document(template_bytes, helper_bytes, src1, None, *hdr, balance_mode="value",
+                                       ref_store=store)
+    assert data_rows(first) == data_rows(later) == expected
+
+def test_missing_src2_without_store(inputs):
+    template_bytes, helper_bytes, src1, _, *hdr = inputs
+    with pytest.raises(RuntimeError, match="zdroj 2"):
+        sc.generate_saldo_document(template_bytes, helper_bytes, src1, None, *hdr)
+
+def test_store_shared_between_connections(store, sources):
+    store.ingest(sources[1])
+    other = sc.RefStore(store.path)
+    try:
+        assert len(other) == len(store) and other.revision == store.revision
+    finally:
+        other.close()
+
+def test_document_key_follows_store_revision(store, inputs, source_rows):
+    template_bytes, helper_bytes, src1, src2, *_ = inputs
+    store.ingest(src2)
+    key = sc.document_key(template_bytes, helper_bytes, src1, None, ref_store=store)
+    assert sc.document_key(template_bytes, helper_bytes, src1, None, ref_store=store) == key
+    _, r2 = source_rows()
+    store.ingest(xlsx_bytes([r2[0], [r2[1][0], r2[1][1], "VBRK 1"]]))
+    assert sc.document_key(template_bytes, helper_bytes, src1, None, ref_store=store) != key
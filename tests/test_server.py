@@ -0,0 +1,110 @@
+# tests/test_server.py – HTTP služba (multipart -> XLSX/PDF), backpressure a chybové kódy
+import http.client
+import json
+import threading
+import uuid
+
+import pytest
+
+import saldo_core as sc
+import saldo_server
+from conftest import data_rows
+
+def _multipart(fields: dict):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}"\r\n\r\n'
+                     .encode() + value + b"\r\n")
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+@pytest.fixture(scope="module")
+def service(template_bytes, helper_bytes):
+    svc = saldo_server.SaldoService(template_bytes, helper_bytes, None, workers=1, max_pending=1)
+    svc.warm()
+    server = saldo_server.make_server("127.0.0.1", 0, svc, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    svc.port = server.server_address[1]
+    yield svc
+    server.shutdown()
+    server.server_close()
+    svc.shutdown()
+
+def _request(service, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=60)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+def _post(service, fields):
+    body, ctype = _multipart(fields)
+    return _request(service, "POST", "/saldo", body, {"Content-Type": ctype})
+
+@pytest.fixture
+def form(sources):
+    return {"src1": sources[0], "src2": sources[1], "hdr_meno": "Jožko Mrkvička", "hdr_sap": "1090989",
+            "hdr_ucet": "700000001"}
+
+def test_parse_multipart_and_options(form):
+    body, ctype = _multipart(dict(form, output="pdf", theme="gray"))
+    fields = saldo_server.parse_multipart(body, ctype)
+    assert fields["src1"] == form["src1"] and fields["hdr_meno"] == "Jožko Mrkvička".encode()
+    opts = saldo_server.request_options(fields, {"pdf_engine": "chunked"})
+    assert (opts["output"], opts["theme"], opts["pdf_engine"], opts["xlsx_engine"]) == ("pdf", "gray", "chunked",
+                                                                                       "stream")
+    with pytest.raises(ValueError, match="src2"):
+        saldo_server.request_options({k: v for k, v in fields.items() if k != "src2"})
+    assert saldo_server.request_options({k: v for k, v in fields.items() if k != "src2"}, src2_required=False)
+    with pytest.raises(ValueError, match="theme"):
+        saldo_server.request_options(dict(fields, theme=b"zelena"))
+
+def test_post_returns_document(service, inputs, form):
+    status, headers, body = _post(service, form)
+    assert status == 200
+    assert headers["Content-Disposition"] == 'attachment; filename="saldo_700000001.xlsx"'
+    assert data_rows(body, data_only=False) == data_rows(
+        sc.generate_saldo_document(*inputs, xlsx_engine="stream"), data_only=False)
+    status, headers, body = _post(service, dict(form, output="pdf"))
+    assert status == 200 and headers["Content-Type"] == "application/pdf" and body[:4] == b"%PDF"
+
+def test_full_queue_is_429(service, form):
+    service._acquire()            # jediné miesto vo fronte je obsadené
+    try:
+        status, headers, _ = _post(service, form)
+    finally:
+        service._release()
+    assert status == 429 and headers["Retry-After"] == str(saldo_server.RETRY_AFTER_S)
+    assert _post(service, form)[0] == 200
+
+@pytest.mark.parametrize("length, status", [(None, 411), ("abc", 400), ("-5", 400),
+                                            (str(saldo_server.MAX_UPLOAD_BYTES + 1), 413)])
+def test_content_length_is_checked(service, length, status):
+    conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=30)
+    try:
+        conn.putrequest("POST", "/saldo")
+        if length is not None:
+            conn.putheader("Content-Length", length)
+        conn.putheader("Content-Type", "multipart/form-data; boundary=x")
+        conn.endheaders()
+        resp = conn.getresponse()
+        assert resp.status == status
+        assert "error" in json.loads(resp.read())
+    finally:
+        conn.close()
+
+def test_bad_requests(service, form):
+    assert _post(service, {k: v for k, v in form.items() if k != "hdr_ucet"})[0] == 400
+    assert _post(service, dict(form, output="docx"))[0] == 400
+    status, _, body = _post(service, dict(form, src1=b"\x00\x01binary"))
+    assert status == 422 and "Nepodporovaný" in json.loads(body)["error"]
+    assert _request(service, "GET", "/neznama")[0] == 404
+
+def test_health(service):
+    status, _, body = _request(service, "GET", "/health")
+    assert status == 200
+    assert json.loads(body) == {"status": "ok", "workers": 1, "max_pending": 1, "pending": 0}
@@ -0,0 +1,44 @@
+# tests/test_stats.py – meranie fáz (SaldoStats), lenivé importy a benchmark
+import json
+
+import saldo_bench
+import saldo_core as sc
+
+def test_stats_record_every_stage(inputs):
+    seen = []
+    stats = sc.SaldoStats(on_stage=seen.append)
+    sc.generate_saldo_bundle(*inputs, stats=stats)
+    stages = [r["stage"] for r in stats.records]
+    assert stages[:5] == ["template", "helper", "src1", "src2", "balance"]
+    assert {"xlsx_write", "xlsx_save", "pdf_layout", "pdf_build"} <= set(stages)
+    assert seen == stats.records
+    balance = next(r for r in stats.records if r["stage"] == "balance")
+    assert balance["rows"] == 60 and balance["wall_s"] >= 0
+    assert stats.totals()["balance"]["count"] == 1
+    assert "balance" in stats.summary()
+
+def test_stats_profile_and_memory(inputs, tmp_path):
+    stats = sc.SaldoStats(profile_dir=str(tmp_path), trace_memory=True)
+    sc.generate_saldo_document(*inputs, stats=stats)
+    assert all("alloc_peak_kb" in r for r in stats.records)
+    names = {p.name for p in tmp_path.iterdir()}
+    assert any(n.endswith("_src1.tracemalloc") for n in names)
+
+def test_without_stats_nothing_is_measured(inputs):
+    sc.generate_saldo_document(*inputs)
+    assert sc._active_stats.get() is None
+
+def test_import_does_not_load_pdf_stack():
+    assert saldo_bench.measure_import(runs=1)["loaded_lazy"] == []
+
+def test_bench_api_case_matches_stage_case(tmp_path, helper_bytes):
+    p1, p2 = saldo_bench.make_sources(50, str(tmp_path), saldo_bench._origins(helper_bytes))
+    case = dict(rows=50, src1=p1, src2=p2, template=saldo_bench.TEMPLATE_PATH, helper=saldo_bench.HELPER_PATH,
+                logo=None, xlsx_engine="template", pdf_engine="canvas", balance_mode="value", theme="blue",
+                output="xlsx")
+    core = saldo_bench._run_case(dict(case, kind="core"))
+    api = saldo_bench._run_case(dict(case, kind="api"))
+    bundle = saldo_bench._run_case(dict(case, kind="api", output="bundle"))
+    assert core["ledger_rows"] == api["ledger_rows"] == bundle["ledger_rows"] == 50
+    assert bundle["output_bytes"] > api["output_bytes"] > 0
+    json.dumps([core, api, bundle])     # výsledok ide do bench.json